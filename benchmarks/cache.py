@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2006-2013 Canonical
+#
+# This file is part of Storm Object Relational Mapper.
+#
+# Storm is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 2.1 of
+# the License, or (at your option) any later version.
+#
+# Storm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Time the cache implementations at several sizes.
+
+For each size, the cache is filled with that many entries, which are
+then added again in random order (cache hits), and finally as many new
+entries are added (each one evicting an old entry).
+
+Run with STORM_CEXTENSIONS=1 to time the C implementation of Cache.
+
+Usage: python benchmarks/cache.py [size ...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from storm.cache import Cache, GenerationalCache
+
+
+class StubObjectInfo(object):
+
+    __slots__ = ("obj",)
+
+    def __init__(self):
+        self.obj = object()
+
+    def get_obj(self):
+        return self.obj
+
+
+def time_operations(cache, obj_infos):
+    started = time.time()
+    for obj_info in obj_infos:
+        cache.add(obj_info)
+    return (time.time() - started) / len(obj_infos) * 1e9
+
+
+def main(sizes=(1000, 100000, 1000000)):
+    print "%-18s %10s %12s %12s %12s" % ("cache", "size", "fill ns/op",
+                                         "hit ns/op", "evict ns/op")
+    for size in sizes:
+        obj_infos = [StubObjectInfo() for i in xrange(size)]
+        hits = obj_infos[:]
+        random.shuffle(hits)
+        new_obj_infos = [StubObjectInfo() for i in xrange(size)]
+        for cache_class in (Cache, GenerationalCache):
+            cache = cache_class(size)
+            fill = time_operations(cache, obj_infos)
+            hit = time_operations(cache, hits)
+            evict = time_operations(cache, new_obj_infos)
+            print "%-18s %10d %12.0f %12.0f %12.0f" % (
+                cache_class.__name__, size, fill, hit, evict)
+            cache.clear()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main([int(arg) for arg in sys.argv[1:]])
+    else:
+        main()
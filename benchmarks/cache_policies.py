@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2006-2013 Canonical
+#
+# This file is part of Storm Object Relational Mapper.
+#
+# Storm is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 2.1 of
+# the License, or (at your option) any later version.
+#
+# Storm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Compare the hit ratio of the cache implementations.
+
+Rows are accessed the way a store would do it: an object is found
+alive only while the cache holds it, and otherwise a new object is
+loaded for the row and added to the cache.  Two workloads are run,
+and the ratio of hits among the accesses to the working set is shown:
+
+ - hot: rows are picked at random among a working set half as large
+   as the cache.
+ - hot+scan: the same accesses, interleaved with sequential scans over
+   rows only seen once, as when iterating over a large result set.
+
+Usage: python benchmarks/cache_policies.py [cache size]
+"""
+import os
+import random
+import sys
+import weakref
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from storm.properties import Int
+from storm.info import get_obj_info
+from storm.cache import Cache, GenerationalCache, TwoQueueCache
+
+
+class Row(object):
+
+    __storm_table__ = "row"
+
+    id = Int(primary=True)
+
+
+def get_accesses(size, scans):
+    random.seed(42)
+    hot_keys = range(size // 2)
+    scan_key = size
+    accesses = []
+    for i in xrange(100):
+        accesses.extend(random.choice(hot_keys) for j in xrange(size))
+        if scans:
+            accesses.extend(xrange(scan_key, scan_key + size * 2))
+            scan_key += size * 2
+    return accesses
+
+
+def get_hit_ratio(cache, accesses, size):
+    alive = {}
+    hot_accesses = hits = 0
+    for key in accesses:
+        ref = alive.get(key)
+        obj = ref and ref()
+        if obj is None:
+            obj = Row()
+            obj.id = key
+            alive[key] = weakref.ref(obj)
+        elif key < size:
+            hits += 1
+        if key < size:
+            hot_accesses += 1
+        cache.add(get_obj_info(obj))
+    return float(hits) / hot_accesses
+
+
+def main(size=1000):
+    workloads = [("hot", get_accesses(size, False)),
+                 ("hot+scan", get_accesses(size, True))]
+    print "%-18s %10s" % ("cache", "size"),
+    for name, accesses in workloads:
+        print "%12s" % name,
+    print
+    for cache_class in (Cache, GenerationalCache, TwoQueueCache):
+        print "%-18s %10d" % (cache_class.__name__, size),
+        for name, accesses in workloads:
+            cache = cache_class(size)
+            print "%11.1f%%" % (get_hit_ratio(cache, accesses, size) * 100),
+            cache.clear()
+        print
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
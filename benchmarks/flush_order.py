@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2006-2013 Canonical
+#
+# This file is part of Storm Object Relational Mapper.
+#
+# Storm is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 2.1 of
+# the License, or (at your option) any later version.
+#
+# Storm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Time flushing many new objects ordered by references.
+
+Nodes are added to the store in chains, and each node refers to the
+next one in its chain, so that nodes have to be inserted in the
+reverse order in which they became dirty.
+
+Usage: python benchmarks/flush_order.py [count] [chain length] [batch size]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from storm.locals import Int, Reference, Store, create_database
+
+
+class Node(object):
+    __storm_table__ = "node"
+    id = Int(primary=True)
+    parent_id = Int()
+    parent = Reference(parent_id, id)
+
+
+def main(count=100000, chain_length=1000, batch_size=1):
+    store = Store(create_database("sqlite:"))
+    store.execute("CREATE TABLE node "
+                  "(id INTEGER PRIMARY KEY, parent_id INTEGER)")
+    store.set_flush_batch_size(batch_size)
+
+    nodes = []
+    for i in xrange(count):
+        node = Node()
+        store.add(node)
+        nodes.append(node)
+    for i in xrange(count - 1):
+        if (i + 1) % chain_length:
+            nodes[i].parent = nodes[i + 1]
+
+    started = time.time()
+    store.flush()
+    elapsed = time.time() - started
+
+    for node in nodes:
+        if node.parent is not None:
+            assert node.parent.id < node.id
+    print "Flushed %d objects in %.2fs" % (count, elapsed)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
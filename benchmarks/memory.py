@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2006-2013 Canonical
+#
+# This file is part of Storm Object Relational Mapper.
+#
+# Storm is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation; either version 2.1 of
+# the License, or (at your option) any later version.
+#
+# Storm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Compare the memory used by loaded objects in both build modes.
+
+Rows of a table with five columns are loaded from an in-memory SQLite
+database and kept alive, with and without the C extensions, and with
+and without compact objects (see Store.set_compact_objects).  Each
+configuration runs in its own process, and the growth of its peak
+resident size is shown per object, along with the number of objects
+tracked by the garbage collector which each loaded object brings.
+
+Usage: python benchmarks/memory.py [rows]
+"""
+import gc
+import os
+import resource
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+def get_peak_size():
+    """Return the peak resident size of this process, in bytes."""
+    size = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return size
+    return size * 1024
+
+
+def measure(rows, compact):
+    """Load C{rows} objects and print the memory they use."""
+    from storm import has_cextensions
+    from storm.locals import Int, Unicode, Store, create_database
+
+    class Row(object):
+        __storm_table__ = "row"
+        id = Int(primary=True)
+        name = Unicode()
+        count = Int()
+        title = Unicode()
+        value = Int()
+
+    store = Store(create_database("sqlite:"))
+    store.execute("CREATE TABLE row (id INTEGER PRIMARY KEY, name TEXT, "
+                  "count INTEGER, title TEXT, value INTEGER)")
+    for i in xrange(rows):
+        store.execute("INSERT INTO row VALUES (?, ?, ?, ?, ?)",
+                      (i, u"name %d" % i, i, u"title", i * 2))
+    store.set_compact_objects(compact)
+
+    gc.collect()
+    peak_size = get_peak_size()
+    gc_objects = len(gc.get_objects())
+    objects = list(store.find(Row))
+    for obj in objects:
+        obj.name, obj.count
+    gc.collect()
+    print "%s %d %d" % (has_cextensions,
+                        (get_peak_size() - peak_size) / rows,
+                        (len(gc.get_objects()) - gc_objects) / rows)
+
+
+def main(rows=100000):
+    print "%-10s %-8s %14s %14s" % ("build", "compact", "bytes/object",
+                                    "gc objects")
+    for cextensions in ("0", "1"):
+        for compact in (False, True):
+            env = dict(os.environ, STORM_CEXTENSIONS=cextensions)
+            output = subprocess.check_output(
+                [sys.executable, __file__, "--measure", str(rows),
+                 str(int(compact))], env=env)
+            has_cextensions, size, gc_objects = output.split()
+            if has_cextensions != "True" and cextensions == "1":
+                print "C extensions aren't built."
+                return
+            print "%-10s %-8s %14s %14s" % (
+                cextensions == "1" and "C" or "Python", compact,
+                size, gc_objects)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--measure"]:
+        measure(int(sys.argv[2]), sys.argv[3] == "1")
+    elif len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
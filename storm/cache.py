@@ -1,4 +1,11 @@
+from collections import OrderedDict
+from threading import Lock
 import itertools
+import sys
+import time
+
+from storm import has_cextensions
+from storm.expr import Table
 
 
 class Cache(object):
@@ -8,17 +15,32 @@ class Cache(object):
     even if the user isn't holding any strong references to it.  It does
     that by holding strong references to the objects referenced by the
     last C{N} C{obj_info}s added to it (where C{N} is the cache size).
+
+    Entries are kept in a circular doubly linked list, so that adding,
+    refreshing and removing them take constant time.
+
+    The number of objects dropped to respect the size limit is counted
+    in the C{evictions} attribute, which may be reset by the user.
     """
 
     def __init__(self, size=1000):
         self._size = size
-        self._cache = {} # {obj_info: obj, ...}
-        self._order = [] # [obj_info, ...]
+        self.evictions = 0
+        self._cache = {} # {obj_info: [prev, next, obj_info, obj], ...}
+        # Sentinel of the linked list.  Its next link is the most recent
+        # entry, and its previous link the oldest one.
+        self._root = root = []
+        root[:] = [root, root, None, None]
 
     def clear(self):
         """Clear the entire cache at once."""
+        # Break the links, so that the objects are released right away
+        # rather than when the garbage collector finds the cycles.
+        for link in self._cache.itervalues():
+            del link[:]
         self._cache.clear()
-        del self._order[:]
+        root = self._root
+        root[:] = [root, root, None, None]
 
     def add(self, obj_info):
         """Add C{obj_info} as the most recent entry in the cache.
@@ -28,22 +50,41 @@ class Cache(object):
         (IOW, will be the last to leave).
         """
         if self._size != 0:
-            if obj_info in self._cache:
-                self._order.remove(obj_info)
+            root = self._root
+            link = self._cache.get(obj_info)
+            if link is not None:
+                if link is root[1]:
+                    return
+                prev_link, next_link = link[0], link[1]
+                prev_link[1] = next_link
+                next_link[0] = prev_link
             else:
-                self._cache[obj_info] = obj_info.get_obj()
-            self._order.insert(0, obj_info)
+                link = [None, None, obj_info, obj_info.get_obj()]
+                self._cache[obj_info] = link
+            first = root[1]
+            link[0] = root
+            link[1] = first
+            first[0] = root[1] = link
             if len(self._cache) > self._size:
-                del self._cache[self._order.pop()]
+                self._remove_link(root[0])
+                self.evictions += 1
+
+    def _remove_link(self, link):
+        """Unlink C{link} and drop its entry."""
+        prev_link, next_link = link[0], link[1]
+        prev_link[1] = next_link
+        next_link[0] = prev_link
+        del self._cache[link[2]]
+        del link[:]
 
     def remove(self, obj_info):
         """Remove C{obj_info} from the cache, if present.
 
         @return: True if C{obj_info} was cached, False otherwise.
         """
-        if obj_info in self._cache:
-            self._order.remove(obj_info)
-            del self._cache[obj_info]
+        link = self._cache.get(obj_info)
+        if link is not None:
+            self._remove_link(link)
             return True
         return False
 
@@ -57,8 +98,10 @@ class Cache(object):
             self.clear()
         else:
             # Remove all entries above the new size.
+            root = self._root
             while len(self._cache) > size:
-                del self._cache[self._order.pop()]
+                self._remove_link(root[0])
+                self.evictions += 1
         self._size = size
 
     def get_cached(self):
@@ -66,7 +109,17 @@ class Cache(object):
 
         The most recently added objects come first in the list.
         """
-        return list(self._order)
+        cached = []
+        root = self._root
+        link = root[1]
+        while link is not root:
+            cached.append(link[2])
+            link = link[1]
+        return cached
+
+
+if has_cextensions:
+    from storm.cextensions import Cache
 
 
 class GenerationalCache(object):
@@ -97,6 +150,7 @@ class GenerationalCache(object):
         self._size = size
         self._new_cache = {}
         self._old_cache = {}
+        self.evictions = 0
 
     def clear(self):
         """See `storm.store.Cache.clear`.
@@ -117,6 +171,9 @@ class GenerationalCache(object):
         would not be an appropriate way of treating older generations
         of actual people.
         """
+        for obj_info in self._old_cache:
+            if obj_info not in self._new_cache:
+                self.evictions += 1
         self._old_cache, self._new_cache = self._new_cache, self._old_cache
         self._new_cache.clear()
 
@@ -143,7 +200,12 @@ class GenerationalCache(object):
         cache = itertools.islice(itertools.chain(self._new_cache.iteritems(),
                                                  self._old_cache.iteritems()),
                                  0, size)
-        self._new_cache = dict(cache)
+        new_cache = dict(cache)
+        if size != 0:
+            cached = set(self._new_cache)
+            cached.update(self._old_cache)
+            self.evictions += len(cached) - len(new_cache)
+        self._new_cache = new_cache
         self._old_cache.clear()
 
     def get_cached(self):
@@ -160,3 +222,554 @@ class GenerationalCache(object):
         cached = self._new_cache.copy()
         cached.update(self._old_cache)
         return list(cached)
+
+
+class TwoQueueCache(object):
+    """Scan-resistant replacement for Storm's LRU cache.
+
+    This cache implements a variant of the 2Q replacement policy.
+    Objects seen for the first time enter a FIFO queue of recent
+    entries, which holds a quarter of the cache once it is full.  When
+    they're pushed out of it, they're released, but a trace of them is
+    kept in a ghost queue.  Objects added again while they're still
+    recent entries, or while their trace is in the ghost queue, are
+    moved to the main LRU queue, which takes the rest of the cache.
+
+    Objects only seen once, as when iterating over a large result set,
+    thus never push the frequently used objects out of the main queue.
+
+    Use this to replace the LRU cache when large queries would otherwise
+    evict the working set of an application.
+    """
+
+    def __init__(self, size=1000):
+        """Create a 2Q cache holding up to C{size} objects.
+
+        The ghost queue remembers half as many objects as the cache
+        holds, by their class and primary key, since the same row may
+        be loaded again into a different object.
+        """
+        self._in = OrderedDict() # {obj_info: obj}, oldest first.
+        self._main = OrderedDict() # {obj_info: obj}, least recent first.
+        self._ghosts = OrderedDict() # {ghost key: None}, oldest first.
+        self.evictions = 0
+        self.set_size(size)
+
+    def clear(self):
+        """See L{Cache.clear}.
+
+        Clears the queues of objects and the ghost queue.
+        """
+        self._in.clear()
+        self._main.clear()
+        self._ghosts.clear()
+
+    def add(self, obj_info):
+        """See L{Cache.add}."""
+        if self._size != 0:
+            main = self._main
+            if obj_info in main:
+                main[obj_info] = main.pop(obj_info)
+            elif obj_info in self._in:
+                main[obj_info] = self._in.pop(obj_info)
+            else:
+                ghost_key = self._get_ghost_key(obj_info)
+                if ghost_key in self._ghosts:
+                    del self._ghosts[ghost_key]
+                    main[obj_info] = obj_info.get_obj()
+                else:
+                    self._in[obj_info] = obj_info.get_obj()
+                self._evict()
+
+    @staticmethod
+    def _get_ghost_key(obj_info):
+        """Return the key identifying C{obj_info} in the ghost queue."""
+        primary_vars = getattr(obj_info, "primary_vars", None)
+        if primary_vars is None:
+            # Not an object info, as in tests.
+            return obj_info
+        return (obj_info.cls_info.cls,
+                tuple(variable.get(to_db=True) for variable in primary_vars))
+
+    def _evict(self):
+        """Drop objects until the size limit is respected.
+
+        The oldest recent entries are dropped first, leaving a trace in
+        the ghost queue, unless the queue of recent entries is within
+        its share of the cache.
+        """
+        while len(self._in) + len(self._main) > self._size:
+            if len(self._in) > self._in_size or not self._main:
+                obj_info, obj = self._in.popitem(last=False)
+                self._ghosts[self._get_ghost_key(obj_info)] = None
+                if len(self._ghosts) > self._ghost_size:
+                    self._ghosts.popitem(last=False)
+            else:
+                self._main.popitem(last=False)
+            self.evictions += 1
+
+    def remove(self, obj_info):
+        """See L{Cache.remove}."""
+        if obj_info in self._in:
+            del self._in[obj_info]
+            return True
+        if obj_info in self._main:
+            del self._main[obj_info]
+            return True
+        return False
+
+    def set_size(self, size):
+        """See L{Cache.set_size}.
+
+        The share of recent entries and the size of the ghost queue are
+        adjusted accordingly.
+        """
+        self._size = size
+        self._in_size = max(size // 4, 1)
+        self._ghost_size = size // 2
+        if size == 0:
+            self.clear()
+        else:
+            self._evict()
+            while len(self._ghosts) > self._ghost_size:
+                self._ghosts.popitem(last=False)
+
+    def get_cached(self):
+        """See L{Cache.get_cached}.
+
+        Objects in the main queue come first, from the most recently
+        used, followed by the recent entries, from the newest.
+        """
+        cached = list(self._main)
+        cached.reverse()
+        recent = list(self._in)
+        recent.reverse()
+        cached.extend(recent)
+        return cached
+
+
+def _get_value_size(value):
+    """Estimate the number of bytes taken by C{value} and its contents.
+
+    Lists, tuples, sets and dicts are followed, so that the contents of
+    pickled values are accounted for, while other objects are measured
+    by C{sys.getsizeof} alone.
+    """
+    size = 0
+    seen = set()
+    pending = [value]
+    while pending:
+        value = pending.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        size += sys.getsizeof(value)
+        if isinstance(value, dict):
+            pending.extend(value.iterkeys())
+            pending.extend(value.itervalues())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            pending.extend(value)
+    return size
+
+
+class MemoryCache(object):
+    """LRU cache limited by an approximate number of bytes.
+
+    The cost of each object is estimated from the values held by the
+    variables of its C{obj_info} when it enters the cache, and estimated
+    again when it's next added after any of its variables changed, so
+    that values loaded lazily or set later are counted too.  The least
+    recently used objects are dropped until the total cost fits in the
+    size limit, so that a few objects with large values take the room
+    of many small ones.  An object costing more than the whole limit
+    isn't held at all.
+
+    Use this to replace the LRU cache when the objects of an application
+    vary widely in size, as with large C{Pickle} columns.
+    """
+
+    def __init__(self, size=10 * 1024 * 1024):
+        """Create a cache holding objects worth up to C{size} bytes."""
+        self._size = size
+        self._used_size = 0
+        self._cache = OrderedDict() # {obj_info: (obj, cost)}, oldest first.
+        self._changed = set() # Cached obj_infos whose cost may be wrong.
+        self.evictions = 0
+
+    def clear(self):
+        """See L{Cache.clear}."""
+        self._cache.clear()
+        self._changed.clear()
+        self._used_size = 0
+
+    def add(self, obj_info):
+        """See L{Cache.add}.
+
+        The cost of C{obj_info} is only estimated if it isn't cached yet,
+        or if its variables changed since it was.
+        """
+        if self._size != 0:
+            entry = self._cache.pop(obj_info, None)
+            if entry is None:
+                # The hook is left behind when the object is dropped, as
+                # it's harmless and hooking again doesn't duplicate it.
+                obj_info.event.hook("changed", self._variable_changed)
+            elif obj_info in self._changed:
+                self._changed.discard(obj_info)
+                self._used_size -= entry[1]
+                entry = None
+            if entry is None:
+                cost = self._get_cost(obj_info)
+                if cost > self._size:
+                    return
+                entry = (obj_info.get_obj(), cost)
+                self._used_size += cost
+            self._cache[obj_info] = entry
+            self._evict(self._size)
+
+    def _variable_changed(self, obj_info, variable, old_value, new_value,
+                          fromdb):
+        """Note that the cost of C{obj_info} must be estimated again."""
+        if obj_info in self._cache:
+            self._changed.add(obj_info)
+
+    @staticmethod
+    def _get_cost(obj_info):
+        """Estimate the number of bytes held by the object of C{obj_info}.
+
+        Each variable is counted along with its current value, as well
+        as the row of compact objects.
+        """
+        cost = sys.getsizeof(obj_info)
+        for variable in obj_info.variables.itervalues():
+            cost += sys.getsizeof(variable) + _get_value_size(variable._value)
+        row = getattr(obj_info.variables, "row", None)
+        if row is not None:
+            cost += _get_value_size(row)
+        return cost
+
+    def _evict(self, size):
+        """Drop the least recently used objects until C{size} is respected.
+        """
+        while self._used_size > size:
+            obj_info, (obj, cost) = self._cache.popitem(last=False)
+            self._changed.discard(obj_info)
+            self._used_size -= cost
+            self.evictions += 1
+
+    def remove(self, obj_info):
+        """See L{Cache.remove}."""
+        entry = self._cache.pop(obj_info, None)
+        if entry is not None:
+            self._changed.discard(obj_info)
+            self._used_size -= entry[1]
+            return True
+        return False
+
+    def set_size(self, size):
+        """See L{Cache.set_size}.
+
+        The size is a number of bytes.
+        """
+        if size == 0:
+            self.clear()
+        else:
+            self._evict(size)
+        self._size = size
+
+    def get_used_size(self):
+        """Return the estimated number of bytes held by cached objects."""
+        return self._used_size
+
+    def get_cached(self):
+        """See L{Cache.get_cached}."""
+        cached = list(self._cache)
+        cached.reverse()
+        return cached
+
+
+class PartitionedCache(object):
+    """Cache with per-class size quotas and pinned classes.
+
+    Objects of classes given a quota with L{set_quota} are held in an
+    LRU cache of their own, so that they neither push other objects out
+    nor get pushed out by them.  Objects of classes pinned with L{pin}
+    are held until they're removed or the cache is cleared, whatever
+    their number, which suits small classes used all the time.  All
+    other objects go to the shared cache.
+
+    Note that the store clears its cache on commit and rollback, so
+    pinned objects are only held for the duration of a transaction.
+    """
+
+    def __init__(self, cache=None):
+        """
+        @param cache: The cache shared by objects of classes without a
+            quota, which defaults to a L{Cache} instance.
+        """
+        if cache is None:
+            cache = Cache()
+        self._shared = cache
+        self._quotas = {} # {cls: cache}
+        self._pinned = {} # {cls: {obj_info: obj}}
+
+    def _get_evictions(self):
+        evictions = getattr(self._shared, "evictions", 0)
+        for cache in self._quotas.itervalues():
+            evictions += cache.evictions
+        return evictions
+
+    def _set_evictions(self, evictions):
+        if hasattr(self._shared, "evictions"):
+            self._shared.evictions = evictions
+        for cache in self._quotas.itervalues():
+            cache.evictions = 0
+
+    evictions = property(_get_evictions, _set_evictions)
+
+    def set_quota(self, cls, size):
+        """Hold at most C{size} objects of C{cls}, apart from the others.
+
+        @param size: The number of objects held, or None to have the
+            objects of C{cls} go to the shared cache again.
+        """
+        obj_infos = self._take(cls)
+        if size is None:
+            self._quotas.pop(cls, None)
+        else:
+            self._quotas[cls] = Cache(size)
+        for obj_info in obj_infos:
+            self.add(obj_info)
+
+    def pin(self, cls):
+        """Hold all objects of C{cls} until they're removed."""
+        obj_infos = self._take(cls)
+        self._pinned[cls] = {}
+        for obj_info in obj_infos:
+            self.add(obj_info)
+
+    def unpin(self, cls):
+        """Stop holding all objects of C{cls}.
+
+        The objects are released, unless a quota was set for C{cls}.
+        """
+        pinned = self._pinned.pop(cls, None)
+        cache = self._quotas.get(cls)
+        if pinned and cache is not None:
+            for obj_info in pinned:
+                cache.add(obj_info)
+
+    def _take(self, cls):
+        """Remove all objects of C{cls}, returning them oldest first."""
+        pinned = self._pinned.pop(cls, None)
+        if pinned is not None:
+            return list(pinned)
+        cache = self._quotas.get(cls, self._shared)
+        obj_infos = [obj_info for obj_info in cache.get_cached()
+                     if obj_info.cls_info.cls is cls]
+        obj_infos.reverse()
+        for obj_info in obj_infos:
+            cache.remove(obj_info)
+        return obj_infos
+
+    def clear(self):
+        """See L{Cache.clear}.
+
+        Pinned objects are released too.
+        """
+        self._shared.clear()
+        for cache in self._quotas.itervalues():
+            cache.clear()
+        for pinned in self._pinned.itervalues():
+            pinned.clear()
+
+    def add(self, obj_info):
+        """See L{Cache.add}."""
+        cls = obj_info.cls_info.cls
+        pinned = self._pinned.get(cls)
+        if pinned is not None:
+            pinned[obj_info] = obj_info.get_obj()
+        else:
+            self._quotas.get(cls, self._shared).add(obj_info)
+
+    def remove(self, obj_info):
+        """See L{Cache.remove}."""
+        cls = obj_info.cls_info.cls
+        pinned = self._pinned.get(cls)
+        if pinned is not None:
+            if obj_info in pinned:
+                del pinned[obj_info]
+                return True
+            return False
+        return self._quotas.get(cls, self._shared).remove(obj_info)
+
+    def set_size(self, size):
+        """See L{Cache.set_size}.
+
+        The size applies to the shared cache only.
+        """
+        self._shared.set_size(size)
+
+    def get_cached(self):
+        """See L{Cache.get_cached}.
+
+        Pinned objects come first, then the objects held by quotas, and
+        finally those in the shared cache.
+        """
+        cached = []
+        for pinned in self._pinned.itervalues():
+            cached.extend(pinned)
+        for cache in self._quotas.itervalues():
+            cached.extend(cache.get_cached())
+        cached.extend(self._shared.get_cached())
+        return cached
+
+
+class RowCache(object):
+    """Second-level cache of rows, shared by stores of the same database.
+
+    Rows are kept as immutable tuples of the values loaded for the
+    eager columns of a class, keyed by table name and primary key, so
+    that any store, in any thread, may build objects from them without
+    querying the database.  Stores given the same row cache invalidate
+    the rows they write when flushing, and again when committing.
+
+    Changes made with raw SQL statements aren't noticed, so rows should
+    be given a time to live unless the tables are only changed through
+    Storm objects.
+
+    Rows hold the values as converted by the variables of their
+    columns, in the form kept as variable state, so objects are built
+    from a cached row without parsing its values again.  Values of
+    mutable columns are held serialized, and each object gets its own
+    copy.
+
+    A store in a transaction which started before a row was last
+    invalidated may still see the row as it was, so it doesn't put the
+    row in the cache again.  Stores tell when their transaction started
+    with a L{get_clock} value given to L{set}.
+    """
+
+    def __init__(self, size=10000, ttl=None):
+        """
+        @param size: The maximum number of rows held.
+        @param ttl: The default number of seconds rows are held for, or
+            None to hold them until they're invalidated or dropped.
+        """
+        self._size = size
+        self._ttl = ttl
+        self._ttls = {} # {cls: ttl}
+        # {(table name, primary_values): (columns, values, expiration)},
+        # least recently used first.
+        self._rows = OrderedDict()
+        self._lock = Lock()
+        # Bumped on every invalidation.
+        self._clock = 0
+        # {(table name, primary_values) or table name: clock} of the
+        # latest invalidations, oldest first.  Rows filled since a clock
+        # older than the floor are refused, as their stamp was dropped.
+        self._invalidated = OrderedDict()
+        self._floor = 0
+
+    def set_ttl(self, cls, ttl):
+        """Set the number of seconds the rows of C{cls} are held for.
+
+        @param ttl: A number of seconds, None to hold rows until they're
+            invalidated, or 0 to not cache rows of C{cls} at all.
+        """
+        self._ttls[cls] = ttl
+
+    def _get_key(self, cls_info, primary_values):
+        if not isinstance(cls_info.table, Table):
+            return None
+        return (cls_info.table.name, primary_values)
+
+    def get(self, cls_info, primary_values):
+        """Return the values of the eager columns of a cached row.
+
+        @return: A tuple of values for C{cls_info.eager_columns}, as
+            loaded from the database, or None if the row isn't cached.
+        """
+        key = self._get_key(cls_info, primary_values)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._rows.pop(key, None)
+            if entry is None:
+                return None
+            columns, values, expiration = entry
+            if expiration is not None and expiration < time.time():
+                return None
+            self._rows[key] = entry
+        if columns is not cls_info.eager_columns:
+            # Another class maps the same table.
+            return None
+        return values
+
+    def get_clock(self):
+        """Return the current clock, to be given to L{set} later.
+
+        Rows filled with a clock taken before they're invalidated are
+        not cached.
+        """
+        return self._clock
+
+    def set(self, cls_info, primary_values, values, since=None):
+        """Cache the values loaded for the eager columns of a row.
+
+        @param since: The L{get_clock} value taken when the transaction
+            which loaded the row started, or None if it can't be stale.
+        """
+        key = self._get_key(cls_info, primary_values)
+        if key is None:
+            return
+        ttl = self._ttls.get(cls_info.cls, self._ttl)
+        if ttl == 0 or self._size == 0:
+            return
+        if ttl is None:
+            expiration = None
+        else:
+            expiration = time.time() + ttl
+        entry = (cls_info.eager_columns, tuple(values), expiration)
+        with self._lock:
+            if since is not None and (
+                since < self._floor or
+                since < self._invalidated.get(key, 0) or
+                since < self._invalidated.get(key[0], 0)):
+                # The row may have been loaded as it was before.
+                return
+            self._rows.pop(key, None)
+            self._rows[key] = entry
+            while len(self._rows) > self._size:
+                self._rows.popitem(last=False)
+
+    def _stamp(self, key):
+        """Note that C{key} was invalidated.  Called with the lock held."""
+        self._clock += 1
+        self._invalidated.pop(key, None)
+        self._invalidated[key] = self._clock
+        while len(self._invalidated) > max(self._size, 100):
+            self._floor = self._invalidated.popitem(last=False)[1]
+
+    def invalidate(self, table, primary_values):
+        """Forget the row of C{table} with the given primary key values."""
+        key = (table, primary_values)
+        with self._lock:
+            self._rows.pop(key, None)
+            self._stamp(key)
+
+    def invalidate_table(self, table):
+        """Forget all rows of C{table}."""
+        with self._lock:
+            for key in list(self._rows):
+                if key[0] == table:
+                    del self._rows[key]
+            self._stamp(table)
+
+    def clear(self):
+        """Forget all rows."""
+        with self._lock:
+            self._rows.clear()
+            self._invalidated.clear()
+            self._clock += 1
+            self._floor = self._clock
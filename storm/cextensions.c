@@ -101,6 +101,7 @@ static PyObject *Undef = NULL;
 static PyObject *LazyValue = NULL;
 static PyObject *raise_none_error = NULL;
 static PyObject *get_cls_info = NULL;
+static PyObject *LazyVariables = NULL;
 static PyObject *EventSystem = NULL;
 static PyObject *SQLRaw = NULL;
 static PyObject *SQLToken = NULL;
@@ -211,6 +212,10 @@ initialize_globals(void)
     if (!get_cls_info)
         return 0;
 
+    LazyVariables = PyObject_GetAttrString(module, "LazyVariables");
+    if (!LazyVariables)
+        return 0;
+
     Py_DECREF(module);
 
     /* Import objects from storm.event module */
@@ -1845,6 +1850,8 @@ ObjectInfo_init(ObjectInfoObject *self, PyObject *args)
     PyObject *columns = NULL;
     PyObject *primary_key = NULL;
     PyObject *obj;
+    PyObject *row = Py_None;
+    PyObject *converters = Py_None;
     Py_ssize_t i;
 
     empty_args = PyTuple_New(0);
@@ -1853,7 +1860,7 @@ ObjectInfo_init(ObjectInfoObject *self, PyObject *args)
 
     CATCH(0, initialize_globals());
 
-    if (!PyArg_ParseTuple(args, "O", &obj))
+    if (!PyArg_ParseTuple(args, "O|OO", &obj, &row, &converters))
         goto error;
 
     /* self.cls_info = get_cls_info(type(obj)) */
@@ -1873,6 +1880,14 @@ ObjectInfo_init(ObjectInfoObject *self, PyObject *args)
     CATCH(NULL,
           self->event = PyObject_CallFunctionObjArgs(EventSystem, self, NULL));
 
+    if (row != Py_None) {
+        /* self.variables = variables = LazyVariables(self, row, converters) */
+        CATCH(NULL, self->variables =
+                        PyObject_CallFunctionObjArgs(LazyVariables, self, row,
+                                                     converters, NULL));
+        goto primary_vars;
+    }
+
     /* self->variables = variables = {} */
     CATCH(NULL, self->variables = PyDict_New());
 
@@ -1907,6 +1922,7 @@ ObjectInfo_init(ObjectInfoObject *self, PyObject *args)
         Py_DECREF(variable);
     }
 
+primary_vars:
     /* self.primary_vars = tuple(variables[column]
                                  for column in self.cls_info.primary_key) */
     CATCH(NULL, primary_key = PyObject_GetAttrString((PyObject *)self->cls_info,
@@ -1917,15 +1933,16 @@ ObjectInfo_init(ObjectInfoObject *self, PyObject *args)
           self->primary_vars = PyTuple_New(PyTuple_GET_SIZE(primary_key)));
     for (i = 0; i != PyTuple_GET_SIZE(primary_key); i++) {
         PyObject *column = PyTuple_GET_ITEM(primary_key, i);
-        PyObject *variable = PyDict_GetItem(self->variables, column);
-        Py_INCREF(variable);
+        PyObject *variable;
+        /* Lazy variables of the primary key are created here. */
+        CATCH(NULL, variable = PyObject_GetItem(self->variables, column));
         PyTuple_SET_ITEM(self->primary_vars, i, variable);
     }
 
-    Py_DECREF(self_get_obj);
+    Py_XDECREF(self_get_obj);
     Py_DECREF(empty_args);
-    Py_DECREF(factory_kwargs);
-    Py_DECREF(columns);
+    Py_XDECREF(factory_kwargs);
+    Py_XDECREF(columns);
     Py_DECREF(primary_key);
     return 0;
 
@@ -2151,6 +2168,298 @@ get_obj_info(PyObject *self, PyObject *obj)
 }
 
 
+typedef struct _CacheLink {
+    struct _CacheLink *prev;
+    struct _CacheLink *next;
+    PyObject *obj_info; /* Borrowed, owned by the _cache dict as a key. */
+    PyObject *obj;
+} CacheLink;
+
+typedef struct {
+    PyObject_HEAD
+    Py_ssize_t _size;
+    Py_ssize_t evictions;
+    PyObject *_cache; /* {obj_info: capsule of its CacheLink, ...} */
+    /* Sentinel of the linked list.  Its next link is the most recent
+       entry, and its previous link the oldest one. */
+    CacheLink _root;
+} CacheObject;
+
+static PyObject *
+Cache_new(PyTypeObject *type, PyObject *args, PyObject *kwargs)
+{
+    CacheObject *self = (CacheObject *)type->tp_alloc(type, 0);
+    if (!self)
+        return NULL;
+    self->_size = 1000;
+    self->_root.prev = self->_root.next = &self->_root;
+    self->_cache = PyDict_New();
+    if (!self->_cache) {
+        Py_DECREF(self);
+        return NULL;
+    }
+    return (PyObject *)self;
+}
+
+static int
+Cache_init(CacheObject *self, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"size", NULL};
+    Py_ssize_t size = 1000;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|n", kwlist, &size))
+        return -1;
+
+    self->_size = size;
+    return 0;
+}
+
+static int
+Cache__clear_links(CacheObject *self)
+{
+    CacheLink *link, *next;
+
+    /* Detach all links before releasing anything, since releasing
+       objects may run arbitrary code. */
+    link = self->_root.next;
+    self->_root.prev->next = NULL;
+    self->_root.prev = self->_root.next = &self->_root;
+    if (self->_cache)
+        PyDict_Clear(self->_cache);
+    while (link != &self->_root && link != NULL) {
+        next = link->next;
+        Py_DECREF(link->obj);
+        PyMem_Free(link);
+        link = next;
+    }
+    return 0;
+}
+
+static int
+Cache_traverse(CacheObject *self, visitproc visit, void *arg)
+{
+    CacheLink *link;
+
+    Py_VISIT(self->_cache);
+    for (link = self->_root.next; link != &self->_root; link = link->next) {
+        Py_VISIT(link->obj);
+    }
+    return 0;
+}
+
+static int
+Cache_clear(CacheObject *self)
+{
+    /* The dict is kept, but emptied. */
+    return Cache__clear_links(self);
+}
+
+static void
+Cache_dealloc(CacheObject *self)
+{
+    PyObject_GC_UnTrack(self);
+    Cache__clear_links(self);
+    Py_XDECREF(self->_cache);
+    self->ob_type->tp_free((PyObject *)self);
+}
+
+static void
+Cache__unlink(CacheLink *link)
+{
+    link->prev->next = link->next;
+    link->next->prev = link->prev;
+}
+
+static int
+Cache__remove_link(CacheObject *self, CacheLink *link)
+{
+    /* Unlink C{link} and drop its entry. */
+    PyObject *obj_info = link->obj_info;
+    PyObject *obj = link->obj;
+    int result;
+
+    Cache__unlink(link);
+    PyMem_Free(link);
+    Py_INCREF(obj_info);
+    result = PyDict_DelItem(self->_cache, obj_info);
+    Py_DECREF(obj_info);
+    Py_DECREF(obj);
+    return result;
+}
+
+static PyObject *
+Cache_clear_method(CacheObject *self, PyObject *args)
+{
+    Cache__clear_links(self);
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+Cache_add(CacheObject *self, PyObject *obj_info)
+{
+    PyObject *capsule;
+    CacheLink *link;
+
+    if (self->_size == 0)
+        Py_RETURN_NONE;
+
+    capsule = PyDict_GetItem(self->_cache, obj_info);
+    if (capsule) {
+        link = (CacheLink *)PyCapsule_GetPointer(capsule, NULL);
+        if (link == self->_root.next)
+            Py_RETURN_NONE;
+        Cache__unlink(link);
+    } else {
+        /* link = [None, None, obj_info, obj_info.get_obj()] */
+        PyObject *obj = PyObject_CallMethod(obj_info, "get_obj", NULL);
+        if (!obj)
+            return NULL;
+        link = PyMem_Malloc(sizeof(CacheLink));
+        if (!link) {
+            Py_DECREF(obj);
+            return PyErr_NoMemory();
+        }
+        capsule = PyCapsule_New(link, NULL, NULL);
+        if (!capsule || PyDict_SetItem(self->_cache, obj_info, capsule) == -1) {
+            Py_XDECREF(capsule);
+            PyMem_Free(link);
+            Py_DECREF(obj);
+            return NULL;
+        }
+        Py_DECREF(capsule);
+        link->obj_info = obj_info;
+        link->obj = obj;
+    }
+
+    link->prev = &self->_root;
+    link->next = self->_root.next;
+    self->_root.next->prev = link;
+    self->_root.next = link;
+
+    if (PyDict_Size(self->_cache) > self->_size) {
+        if (Cache__remove_link(self, self->_root.prev) == -1)
+            return NULL;
+        self->evictions++;
+    }
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+Cache_remove(CacheObject *self, PyObject *obj_info)
+{
+    PyObject *capsule = PyDict_GetItem(self->_cache, obj_info);
+
+    if (capsule) {
+        CacheLink *link = (CacheLink *)PyCapsule_GetPointer(capsule, NULL);
+        if (Cache__remove_link(self, link) == -1)
+            return NULL;
+        Py_RETURN_TRUE;
+    }
+    Py_RETURN_FALSE;
+}
+
+static PyObject *
+Cache_set_size(CacheObject *self, PyObject *args)
+{
+    Py_ssize_t size;
+
+    if (!PyArg_ParseTuple(args, "n", &size))
+        return NULL;
+
+    if (size == 0) {
+        Cache__clear_links(self);
+    } else {
+        /* Remove all entries above the new size. */
+        while (PyDict_Size(self->_cache) > size) {
+            if (Cache__remove_link(self, self->_root.prev) == -1)
+                return NULL;
+            self->evictions++;
+        }
+    }
+    self->_size = size;
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+Cache_get_cached(CacheObject *self, PyObject *args)
+{
+    PyObject *cached = PyList_New(0);
+    CacheLink *link;
+
+    if (!cached)
+        return NULL;
+    for (link = self->_root.next; link != &self->_root; link = link->next) {
+        if (PyList_Append(cached, link->obj_info) == -1) {
+            Py_DECREF(cached);
+            return NULL;
+        }
+    }
+    return cached;
+}
+
+
+static PyMethodDef Cache_methods[] = {
+    {"clear", (PyCFunction)Cache_clear_method, METH_NOARGS, NULL},
+    {"add", (PyCFunction)Cache_add, METH_O, NULL},
+    {"remove", (PyCFunction)Cache_remove, METH_O, NULL},
+    {"set_size", (PyCFunction)Cache_set_size, METH_VARARGS, NULL},
+    {"get_cached", (PyCFunction)Cache_get_cached, METH_NOARGS, NULL},
+    {NULL, NULL}
+};
+
+#define OFFSETOF(x) offsetof(CacheObject, x)
+static PyMemberDef Cache_members[] = {
+    {"_size", T_PYSSIZET, OFFSETOF(_size), READONLY, 0},
+    {"evictions", T_PYSSIZET, OFFSETOF(evictions), 0, 0},
+    {NULL}
+};
+#undef OFFSETOF
+
+statichere PyTypeObject Cache_Type = {
+    PyObject_HEAD_INIT(NULL)
+    0,            /*ob_size*/
+    "storm.cache.Cache",    /*tp_name*/
+    sizeof(CacheObject), /*tp_basicsize*/
+    0,            /*tp_itemsize*/
+    (destructor)Cache_dealloc, /*tp_dealloc*/
+    0,            /*tp_print*/
+    0,            /*tp_getattr*/
+    0,            /*tp_setattr*/
+    0,            /*tp_compare*/
+    0,          /*tp_repr*/
+    0,            /*tp_as_number*/
+    0,            /*tp_as_sequence*/
+    0,            /*tp_as_mapping*/
+    0,                      /*tp_hash*/
+    0,                      /*tp_call*/
+    0,                      /*tp_str*/
+    0,                      /*tp_getattro*/
+    0,                      /*tp_setattro*/
+    0,                      /*tp_as_buffer*/
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE | Py_TPFLAGS_HAVE_GC, /*tp_flags*/
+    0,                      /*tp_doc*/
+    (traverseproc)Cache_traverse,  /*tp_traverse*/
+    (inquiry)Cache_clear,          /*tp_clear*/
+    0,                      /*tp_richcompare*/
+    0,                      /*tp_weaklistoffset*/
+    0,                      /*tp_iter*/
+    0,                      /*tp_iternext*/
+    Cache_methods,        /*tp_methods*/
+    Cache_members,        /*tp_members*/
+    0,                      /*tp_getset*/
+    0,                      /*tp_base*/
+    0,                      /*tp_dict*/
+    0,                      /*tp_descr_get*/
+    0,                      /*tp_descr_set*/
+    0,                      /*tp_dictoffset*/
+    (initproc)Cache_init, /*tp_init*/
+    0,                      /*tp_alloc*/
+    Cache_new,              /*tp_new*/
+    0,                      /*tp_free*/
+    0,                      /*tp_is_gc*/
+};
+
+
 static PyMethodDef cextensions_methods[] = {
     {"get_obj_info", (PyCFunction)get_obj_info, METH_O, NULL},
     {NULL, NULL}
@@ -2187,6 +2496,7 @@ initcextensions(void)
     ObjectInfo_Type.tp_hash = (hashfunc)_Py_HashPointer;
     prepare_type(&ObjectInfo_Type);
     prepare_type(&Variable_Type);
+    prepare_type(&Cache_Type);
 
     module = Py_InitModule3("cextensions", cextensions_methods, "");
     Py_INCREF(&Variable_Type);
@@ -2201,6 +2511,7 @@ initcextensions(void)
     REGISTER_TYPE(ObjectInfo);
     REGISTER_TYPE(Compile);
     REGISTER_TYPE(EventSystem);
+    REGISTER_TYPE(Cache);
 }
 
 /* vim:ts=4:sw=4:et
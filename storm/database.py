@@ -25,7 +25,7 @@ This is the common code for database support; specific databases are
 supported in modules in L{storm.databases}.
 """
 
-from storm.expr import Expr, State, compile
+from storm.expr import Expr, Insert, State, compile
 # Circular import: imported at the end of the module.
 # from storm.tracer import trace
 from storm.variables import Variable
@@ -244,6 +244,35 @@ class Connection(object):
             return None
         return self.result_factory(self, raw_cursor)
 
+    def execute_many(self, statement, params_list):
+        """Execute a compiled statement once for each list of parameters.
+
+        All executions are sent at once with the DB-API C{executemany}
+        method, so that a statement which must be run for many rows is
+        compiled only once.
+
+        @type statement: C{str}
+        @param statement: The statement to execute, as returned by
+            L{compile}.  Parameter marks must be C{?}.
+        @param params_list: A sequence with the parameters for each
+            execution of the statement.
+
+        @raise ConnectionBlockedError: Raised if access to the connection
+            has been blocked with L{block_access}.
+        @raise DisconnectionError: Raised when the connection is lost.
+            Reconnection happens automatically on rollback.
+        """
+        if self._closed:
+            raise ClosedError("Connection is closed")
+        if self._blocked:
+            raise ConnectionBlockedError("Access to connection is blocked")
+        if self._event:
+            self._event.emit("register-transaction")
+        self._ensure_connected()
+        statement = convert_param_marks(statement, "?", self.param_mark)
+        raw_cursor = self.raw_execute_many(statement, params_list)
+        self._check_disconnect(raw_cursor.close)
+
     def close(self):
         """Close the connection if it is not already closed."""
         if not self._closed:
@@ -374,6 +403,37 @@ class Connection(object):
         self._run_execution(raw_cursor, args, params, statement)
         return raw_cursor
 
+    def raw_execute_many(self, statement, params_list):
+        """Execute a raw statement once for each list of parameters.
+
+        It's acceptable to override this method in subclasses, but it
+        is not intended to be called externally.
+
+        Tracers see one execution for each list of parameters, all of
+        them started before the statement is run and finished after it.
+
+        @return: The dbapi cursor object, as fetched from L{build_raw_cursor}.
+        """
+        raw_cursor = self._check_disconnect(self.build_raw_cursor)
+        for params in params_list:
+            self._prepare_execution(raw_cursor, params, statement)
+        args = (statement, [tuple(self.to_database(params))
+                            for params in params_list])
+        try:
+            self._check_disconnect(raw_cursor.executemany, *args)
+        except Exception, error:
+            for params in params_list:
+                self._check_disconnect(
+                    trace, "connection_raw_execute_error", self, raw_cursor,
+                    statement, params, error)
+            raise
+        else:
+            for params in params_list:
+                self._check_disconnect(
+                    trace, "connection_raw_execute_success", self,
+                    raw_cursor, statement, params)
+        return raw_cursor
+
     def _execution_args(self, params, statement):
         """Get the appropriate statement execution arguments."""
         if params:
@@ -467,6 +527,39 @@ class Connection(object):
         changes in primary variables before an insert happens.
         """
 
+    def insert_many(self, insert, primary_variables):
+        """Insert several rows, filling in their primary variables if possible.
+
+        If the primary key of every row is already known, all rows are
+        sent in a single multi-row C{INSERT}.  Otherwise, rows are
+        inserted one at a time, so that the identity of each one may
+        be retrieved afterwards.  Backends which are able to find out
+        the identity of all rows inserted by a single statement should
+        override this method.
+
+        @param insert: An L{Insert} expression with a sequence of columns
+            as its C{map}, and one tuple of values per row in C{values}.
+        @param primary_variables: A sequence with one tuple of primary
+            variables per row, in the same order as C{insert.values}.
+
+        @return: A list with one item per row.  Each item is either
+            C{None} or the L{Result} of the statement which inserted the
+            row, to be used for retrieving the row identity if the
+            primary variables are still undefined.
+        """
+        undefined = [variable for variables in primary_variables
+                     for variable in variables if not variable.is_defined()]
+        if not undefined:
+            self.execute(insert, noresult=True)
+            return [None] * len(primary_variables)
+        results = []
+        for values, variables in zip(insert.values, primary_variables):
+            row_insert = Insert(dict(zip(insert.map, values)), insert.table,
+                                insert.default_table, insert.primary_columns,
+                                variables)
+            results.append(self.execute(row_insert))
+        return results
+
 
 class Database(object):
     """A database that can be connected to.
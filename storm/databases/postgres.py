@@ -40,9 +40,9 @@ except ImportError:
 
 from storm.expr import (
     Undef, Expr, SetExpr, Select, Insert, Alias, And, Eq, FuncExpr, SQLRaw,
-    Sequence, Like, SQLToken, COLUMN, COLUMN_NAME, COLUMN_PREFIX, TABLE,
-    compile, compile_select, compile_insert, compile_set_expr, compile_like,
-    compile_sql_token)
+    Sequence, Like, SQLToken, State, COLUMN, COLUMN_NAME, COLUMN_PREFIX,
+    TABLE, compile, compile_select, compile_insert, compile_set_expr,
+    compile_like, compile_sql_token)
 from storm.variables import Variable, ListVariable
 from storm.database import Database, Connection, Result
 from storm.exceptions import (
@@ -265,6 +265,47 @@ class PostgresConnection(Connection):
 
         return Connection.execute(self, statement, params, noresult)
 
+    def insert_many(self, insert, primary_variables):
+        """
+        Like L{Connection.insert_many}, but insert all rows at once when
+        their primary key is a single column with a sequence, as with
+        C{SERIAL} columns.
+
+        The rows returned by C{RETURNING} for a multi-row C{INSERT} aren't
+        guaranteed to be in the order of its values, so instead the keys
+        are taken from the sequence with a single query beforehand, and
+        sent along with the rows.
+        """
+        primary_columns = insert.primary_columns
+        if (primary_columns is Undef or len(primary_columns) != 1 or
+            insert.table is Undef or len(primary_variables) < 2):
+            return Connection.insert_many(self, insert, primary_variables)
+        for variables in primary_variables:
+            if variables[0].is_defined():
+                return Connection.insert_many(self, insert,
+                                              primary_variables)
+        column = primary_columns[0]
+        state = State()
+        state.context = TABLE
+        table = self.compile(insert.table, state, token=True)
+        result = self.execute(
+            "SELECT nextval(pg_get_serial_sequence(?, ?)) "
+            "FROM generate_series(1, ?)",
+            (table, column.name, len(primary_variables)))
+        keys = [values[0] for values in result.get_all()]
+        if None in keys:
+            # There's no sequence owned by the column.
+            return Connection.insert_many(self, insert, primary_variables)
+        for (variable,), key in zip(primary_variables, keys):
+            result.set_variable(variable, key)
+        values = [tuple(row) + tuple(variables)
+                  for row, variables in zip(insert.values, primary_variables)]
+        self.execute(Insert(tuple(insert.map) + (column,), insert.table,
+                            insert.default_table, primary_columns,
+                            values=values),
+                     noresult=True)
+        return [None] * len(primary_variables)
+
     def raw_execute(self, statement, params):
         """
         Like L{Connection.raw_execute}, but encode the statement to
@@ -275,6 +316,15 @@ class PostgresConnection(Connection):
             statement = statement.encode("UTF-8")
         return Connection.raw_execute(self, statement, params)
 
+    def raw_execute_many(self, statement, params_list):
+        """
+        Like L{Connection.raw_execute_many}, but encode the statement to
+        UTF-8 if it is unicode.
+        """
+        if type(statement) is unicode:
+            statement = statement.encode("UTF-8")
+        return Connection.raw_execute_many(self, statement, params_list)
+
     def to_database(self, params):
         """
         Like L{Connection.to_database}, but this converts datetime
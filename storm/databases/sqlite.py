@@ -124,6 +124,36 @@ class SQLiteConnection(Connection):
             else:
                 yield param
 
+    def insert_many(self, insert, primary_variables):
+        """
+        Like L{Connection.insert_many}, but insert all rows at once even
+        when their primary key is unknown.
+
+        SQLite assigns consecutive OIDs to the rows inserted by a single
+        statement while holding the database lock, so the primary keys
+        may be retrieved afterwards with a single query on the range of
+        OIDs ending at the last inserted one.
+        """
+        undefined = [variable for variables in primary_variables
+                     for variable in variables if not variable.is_defined()]
+        if (not undefined or insert.primary_columns is Undef or
+            len(primary_variables) < 2):
+            return Connection.insert_many(self, insert, primary_variables)
+        result = self.execute(insert)
+        last_oid = result._raw_cursor.lastrowid
+        first_oid = last_oid - len(primary_variables) + 1
+        where = SQLRaw("OID BETWEEN %d AND %d" % (first_oid, last_oid))
+        select = Select(insert.primary_columns, where, tables=insert.table,
+                        order_by=SQLRaw("OID"))
+        result = self.execute(select)
+        for variables, values in zip(primary_variables, result.get_all()):
+            for variable, value in zip(variables, values):
+                if value is None:
+                    variable.set(value, from_db=True)
+                else:
+                    result.set_variable(variable, value)
+        return [None] * len(primary_variables)
+
     def commit(self):
         self._ensure_connected()
         # See story at the end to understand why we do COMMIT manually.
@@ -143,6 +173,23 @@ class SQLiteConnection(Connection):
         versions < 2.3.4, so we make sure the timeout is respected
         here.
         """
+        return self._execute_with_retry(Connection.raw_execute,
+                                        statement, params, _end)
+
+    def raw_execute_many(self, statement, params_list):
+        """Execute a raw statement once for each list of parameters.
+
+        Like L{raw_execute}, this retries on locked database errors.
+        """
+        return self._execute_with_retry(Connection.raw_execute_many,
+                                        statement, params_list)
+
+    def _execute_with_retry(self, method, statement, params, _end=False):
+        """Run the given raw execution method within a transaction.
+
+        The execution is retried while the database is locked, until
+        the timeout expires.
+        """
         if _end:
             self._in_transaction = False
         elif not self._in_transaction:
@@ -156,7 +203,7 @@ class SQLiteConnection(Connection):
         started = now()
         while True:
             try:
-                return Connection.raw_execute(self, statement, params)
+                return method(self, statement, params)
             except sqlite.OperationalError, e:
                 if str(e) != "database is locked":
                     raise
@@ -28,6 +28,8 @@ __all__ = ["EventSystem"]
 
 class EventSystem(object):
 
+    __slots__ = ("_owner_ref", "_hooks")
+
     def __init__(self, owner):
         self._owner_ref = weakref.ref(owner)
         self._hooks = {}
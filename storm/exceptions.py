@@ -63,6 +63,9 @@ class StoreError(StormError):
 class NoStoreError(StormError):
     pass
 
+class ReadOnlyError(StormError):
+    pass
+
 class WrongStoreError(StoreError):
     pass
 
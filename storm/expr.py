@@ -238,6 +238,9 @@ class State(object):
         a blacklist against auto_tables when compiling Joins, because
         the generated statements should not refer to the table twice.
 
+    @ivar seen_tables: If not None, the names of all tables compiled
+        are added to this set, including the ones used by subselects.
+
     @ivar context: an instance of L{Context}, specifying the context
         of the expression currently being compiled.
 
@@ -253,6 +256,7 @@ class State(object):
         self.parameters = []
         self.auto_tables = []
         self.join_tables = None
+        self.seen_tables = None
         self.context = None
         self.aliases = None
 
@@ -904,6 +908,8 @@ class Table(FromExpr):
 
 @compile.when(Table)
 def compile_table(compile, table, state):
+    if state.seen_tables is not None:
+        state.seen_tables.add(table.name)
     if table.compile_id != id(compile):
         table.compile_cache = compile(table.name, state, token=True)
         table.compile_id = id(compile)
@@ -1339,6 +1345,23 @@ class Row(NamedFunc):
     name = "ROW"
 
 
+class Tuple(ComparableExpr):
+    """A parenthesized list of expressions, such as C{(a, b)}.
+
+    This is the row value syntax accepted in comparisons such as
+    C{(a, b) IN ((1, 2), (3, 4))}.
+    """
+    __slots__ = ("exprs",)
+
+    def __init__(self, *exprs):
+        self.exprs = exprs
+
+@compile.when(Tuple)
+def compile_tuple(compile, expr, state):
+    state.precedence = 0
+    return "(%s)" % compile(expr.exprs, state)
+
+
 class Cast(FuncExpr):
     """A representation of C{CAST} clauses. e.g., C{CAST(bar AS TEXT)}."""
     __slots__ = ("column", "type")
@@ -1505,6 +1528,31 @@ def compare_columns(columns, values):
         return And(*equals)
 
 
+def compare_columns_in(columns, values_list):
+    """Build an expression matching rows with any of the given key values.
+
+    @param columns: The columns to compare.
+    @param values_list: A sequence with one sequence of values per row,
+        each holding one value per column.
+
+    @return: An L{In} expression, using row values when there is more
+        than one column, or C{False} if C{values_list} is empty.
+    """
+    if not values_list:
+        return False
+    if len(columns) == 1:
+        return columns[0].is_in(values[0] for values in values_list)
+    rows = []
+    for values in values_list:
+        row = []
+        for column, value in zip(columns, values):
+            if not isinstance(value, (Expr, Variable)) and value is not None:
+                value = column.variable_factory(value=value)
+            row.append(value)
+        rows.append(Tuple(*row))
+    return In(Tuple(*columns), rows)
+
+
 # --------------------------------------------------------------------
 # Auto table
 
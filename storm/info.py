@@ -64,6 +64,16 @@ class ClassInfo(dict):
     @ivar columns: Tuple of column properties found in the class.
     @ivar primary_key: Tuple of column properties used to form the primary key
     @ivar primary_key_pos: Position of primary_key items in the columns tuple.
+    @ivar lazy_groups: Dictionary mapping the id of each lazy column to
+        its lazy group.
+    @ivar eager_columns: Tuple of columns loaded along with objects,
+        which are all columns but the lazy ones.
+    @ivar eager_primary_key_pos: Position of primary_key items in the
+        eager_columns tuple.
+    @ivar eager_column_idx: Dictionary mapping the id of each eager
+        column to its position in the eager_columns tuple.
+    @ivar unique_columns: Tuple of columns declared as unique, other
+        than the primary key.
     """
 
     def __init__(self, cls):
@@ -123,6 +133,33 @@ class ClassInfo(dict):
         self.primary_key_pos = tuple(id_positions[id(column)]
                                      for column in self.primary_key)
 
+        self.lazy_groups = {}
+        for column in self.columns:
+            lazy_group = getattr(column, "lazy_group", None)
+            if lazy_group is not None:
+                if id(column) in self.primary_key_idx:
+                    raise ClassInfoError("%s has a lazy primary key column"
+                                         % repr(cls))
+                self.lazy_groups[id(column)] = lazy_group
+
+        if self.lazy_groups:
+            self.eager_columns = tuple(column for column in self.columns
+                                       if id(column) not in self.lazy_groups)
+            self.eager_column_idx = dict((id(column), i) for i, column in
+                                         enumerate(self.eager_columns))
+            self.eager_primary_key_pos = tuple(
+                self.eager_column_idx[id(column)]
+                for column in self.primary_key)
+        else:
+            self.eager_columns = self.columns
+            self.eager_column_idx = id_positions
+            self.eager_primary_key_pos = self.primary_key_pos
+
+        self.unique_columns = tuple(
+            column for column in self.columns
+            if getattr(column, "unique", False) and
+               id(column) not in self.primary_key_idx)
+
         __order__ = getattr(cls, "__storm_order__", None)
         if __order__ is None:
             self.default_order = Undef
@@ -149,12 +186,15 @@ class ClassInfo(dict):
 
 class ObjectInfo(dict):
 
+    __slots__ = ("cls_info", "event", "variables", "primary_vars", "_ref",
+                 "__weakref__")
+
     __hash__ = object.__hash__
 
     # For get_obj_info(), an ObjectInfo is its own obj_info.
     __storm_object_info__ = property(lambda self: self)
 
-    def __init__(self, obj):
+    def __init__(self, obj, row=None, converters=None):
         # FASTPATH This method is part of the fast path.  Be careful when
         #          changing it (try to profile any changes).
 
@@ -165,13 +205,17 @@ class ObjectInfo(dict):
         self.set_obj(obj)
 
         self.event = event = EventSystem(self)
-        self.variables = variables = {}
 
-        for column in self.cls_info.columns:
-            variables[column] = \
-                column.variable_factory(column=column,
-                                        event=event,
-                                        validator_object_factory=self.get_obj)
+        if row is not None:
+            self.variables = variables = LazyVariables(self, row, converters)
+        else:
+            self.variables = variables = {}
+
+            for column in self.cls_info.columns:
+                variables[column] = \
+                    column.variable_factory(
+                        column=column, event=event,
+                        validator_object_factory=self.get_obj)
 
         self.primary_vars = tuple(variables[column]
                                   for column in self.cls_info.primary_key)
@@ -196,6 +240,59 @@ class ObjectInfo(dict):
             variable.checkpoint()
 
 
+class LazyVariables(dict):
+    """The variables of a compact L{ObjectInfo}, created when needed.
+
+    Values of the eager columns are kept in a row, as they're held
+    internally by variables, and a variable is only created when
+    looked up, e.g. to be changed or resolved.  Values which weren't
+    made into variables yet are the ones last loaded from the database.
+    Columns whose variables are created along with the object are
+    left undefined in the row.
+    """
+
+    __slots__ = ("_obj_info", "row", "_converters")
+
+    def __init__(self, obj_info, row, converters):
+        """
+        @param obj_info: The L{ObjectInfo} owning the variables.
+        @param row: Tuple of values of the eager columns of the class.
+        @param converters: Variables of the eager columns, used to get
+            values out of the row.  They're left untouched.
+        """
+        self._obj_info = obj_info
+        self.row = row
+        self._converters = converters
+
+    def __missing__(self, column):
+        obj_info = self._obj_info
+        cls_info = obj_info.cls_info
+        pos = cls_info.eager_column_idx.get(id(column))
+        if pos is None and id(column) not in cls_info.lazy_groups:
+            raise KeyError(column)
+        variable = column.variable_factory(
+            column=column, event=obj_info.event,
+            validator_object_factory=obj_info.get_obj)
+        if pos is not None and self.row[pos] is not Undef:
+            variable.set_state((Undef, self.row[pos]))
+            variable.checkpoint()
+        self[column] = variable
+        return variable
+
+    def get_value(self, column):
+        """Get the value of C{column}, without creating a variable."""
+        variable = self.get(column)
+        if variable is not None:
+            return variable.get()
+        pos = self._obj_info.cls_info.eager_column_idx.get(id(column))
+        if pos is None:
+            return self[column].get()
+        value = self.row[pos]
+        if value is None:
+            return None
+        return self._converters[pos].parse_get(value, False)
+
+
 if has_cextensions:
     from storm.cextensions import ObjectInfo, get_obj_info
 
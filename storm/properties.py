@@ -22,7 +22,7 @@ from bisect import insort_left, bisect_left
 import weakref
 import sys
 
-from storm.exceptions import PropertyPathError
+from storm.exceptions import PropertyPathError, ReadOnlyError
 from storm.info import get_obj_info, get_cls_info
 from storm.expr import Column, Undef
 from storm.variables import (
@@ -32,12 +32,31 @@ from storm.variables import (
     PickleVariable, JSONVariable, ListVariable, EnumVariable)
 
 
-__all__ = ["Property", "SimpleProperty",
+__all__ = ["Property", "SimpleProperty", "LazyGroup",
            "Bool", "Int", "Float", "Decimal", "RawStr", "Unicode",
            "DateTime", "Date", "Time", "TimeDelta", "UUID", "Enum",
            "Pickle", "JSON", "List", "PropertyRegistry"]
 
 
+class LazyGroup(object):
+    """Group of lazy properties which are loaded together.
+
+    Properties created with C{lazy=True} aren't loaded along with the
+    rest of the object, but only when one of them is first touched.
+    By default each lazy property is loaded on its own, but properties
+    sharing a group are all loaded at once::
+
+        class Document(object):
+            ...
+            contents = LazyGroup()
+            body = Unicode(lazy_group=contents)
+            attachment = RawStr(lazy_group=contents)
+
+    Any other hashable value, such as an integer, may be used as a
+    group as well.
+    """
+
+
 class Property(object):
     creation_counter = 0
 
@@ -59,13 +78,26 @@ class Property(object):
             # (might be proxied or whatever).
             cls = obj_info.cls_info.cls
         column = self._get_column(cls)
-        return obj_info.variables[column].get()
+        epoch = obj_info.get("epoch")
+        if epoch is not None and epoch.expired:
+            epoch.store._check_epoch(obj_info)
+        variables = obj_info.variables
+        variable = variables.get(column)
+        if variable is None:
+            # Compact objects are read without creating variables.
+            return variables.get_value(column)
+        return variable.get()
 
     def __set__(self, obj, value):
         obj_info = get_obj_info(obj)
         # Don't get obj.__class__ because we don't trust it
         # (might be proxied or whatever).
         column = self._get_column(obj_info.cls_info.cls)
+        epoch = obj_info.get("epoch")
+        if epoch is not None and epoch.expired:
+            epoch.store._check_epoch(obj_info)
+        if "read_only" in obj_info:
+            raise ReadOnlyError("Can't change %r, which is read-only" % obj)
         obj_info.variables[column].set(value)
 
     def __delete__(self, obj):
@@ -73,6 +105,11 @@ class Property(object):
         # Don't get obj.__class__ because we don't trust it
         # (might be proxied or whatever).
         column = self._get_column(obj_info.cls_info.cls)
+        epoch = obj_info.get("epoch")
+        if epoch is not None and epoch.expired:
+            epoch.store._check_epoch(obj_info)
+        if "read_only" in obj_info:
+            raise ReadOnlyError("Can't change %r, which is read-only" % obj)
         obj_info.variables[column].delete()
 
     def _detect_attr_name(self, used_cls):
@@ -112,12 +149,19 @@ class PropertyColumn(Column):
 
     def __init__(self, prop, cls, attr, name, primary,
                  variable_class, variable_kwargs):
+        # The same property may build columns for several classes
+        # (e.g. subclasses and aliases), so don't consume its arguments.
+        variable_kwargs = variable_kwargs.copy()
         self.size = variable_kwargs.pop('size', Undef)
         self.unsigned = variable_kwargs.pop('unsigned', False)
         self.index = variable_kwargs.pop('index', False)
         self.unique = variable_kwargs.pop('unique', False)
         self.auto_increment = variable_kwargs.pop('auto_increment', False)
         self.array = variable_kwargs.pop('array', None)
+        self.lazy_group = variable_kwargs.pop('lazy_group', None)
+        if variable_kwargs.pop('lazy', False) and self.lazy_group is None:
+            # A lazy property without a group is loaded on its own.
+            self.lazy_group = prop
 
         Column.__init__(self, name, cls, primary,
                         VariableFactory(variable_class, column=self,
@@ -21,12 +21,14 @@
 import weakref
 
 from storm.exceptions import (
-    ClassInfoError, FeatureError, NoStoreError, WrongStoreError)
+    ClassInfoError, FeatureError, NoStoreError, ReadOnlyError,
+    WrongStoreError)
 from storm.store import Store, get_where_for_args, LostObjectError
 from storm.variables import LazyValue
+from storm.expr import Undef
 from storm.expr import (
     Select, Column, Exists, ComparableExpr, SuffixExpr, LeftJoin, Not, SQLRaw,
-    compare_columns, compile)
+    compare_columns, compare_columns_in, compile)
 from storm.info import get_cls_info, get_obj_info
 
 
@@ -150,6 +152,10 @@ class Reference(object):
 
         store = Store.of(local)
         if store is None:
+            if "read_only" in get_obj_info(local):
+                # Returning None would look like a NULL reference.
+                raise NoStoreError("Can't resolve references of %r, which "
+                                   "is untracked" % local)
             return None
 
         if self._relation.remote_key_is_primary:
@@ -166,8 +172,11 @@ class Reference(object):
         return remote
 
     def __set__(self, local, remote):
+        local_info = get_obj_info(local)
+        if "read_only" in local_info:
+            raise ReadOnlyError("Can't change %r, which is read-only" % local)
         # Don't use local here, as it might be security proxied or something.
-        local = get_obj_info(local).get_obj()
+        local = local_info.get_obj()
 
         if self._cls is None:
             self._cls = _find_descriptor_class(local.__class__, self)
@@ -193,6 +202,61 @@ class Reference(object):
                 pass # It might fail when remote is a tuple or a raw value.
             self._relation.link(local, remote, True)
 
+    def _prefetch(self, store, local_objects):
+        """Load and link the remote objects of all the given objects.
+
+        Objects which are already linked are left alone.  The others
+        get their remote objects with L{Store.get_many} when the remote
+        key is the primary key, or with a single query otherwise.
+
+        @return: The distinct remote objects of the given objects.
+        """
+        relation = self._relation
+        remotes = []
+        missing = []
+        for local in local_objects:
+            remote = relation.get_remote(local)
+            if remote is not None:
+                remotes.append(remote)
+            elif not relation.local_variables_are_none(local):
+                missing.append(local)
+
+        if missing and relation.remote_key_is_primary:
+            keys = [relation.get_local_variables(local) for local in missing]
+            found = store.get_many(relation.remote_cls, keys)
+            for local, remote in zip(missing, found):
+                if remote is not None:
+                    relation.link(local, remote)
+                    remotes.append(remote)
+        elif missing:
+            keys = [relation.get_local_variables(local) for local in missing]
+            where = compare_columns_in(relation.remote_key, keys)
+            found = {}
+            for remote in store.find(relation.remote_cls, where):
+                key = tuple(variable.get() for variable in
+                            relation.get_remote_variables(remote))
+                if key in found:
+                    # Leave keys with several remote objects to __get__,
+                    # which will complain about them.
+                    found[key] = None
+                else:
+                    found[key] = remote
+            for local in missing:
+                key = tuple(variable.get() for variable in
+                            relation.get_local_variables(local))
+                remote = found.get(key)
+                if remote is not None:
+                    relation.link(local, remote)
+                    remotes.append(remote)
+
+        unique_remotes = []
+        seen = set()
+        for remote in remotes:
+            if id(remote) not in seen:
+                seen.add(id(remote))
+                unique_remotes.append(remote)
+        return unique_remotes
+
     def _build_relation(self):
         resolver = PropertyResolver(self, self._cls)
         self._local_key = resolver.resolve(self._local_key)
@@ -271,9 +335,99 @@ class ReferenceSet(object):
         else:
             self._relation2 = None
 
+    def _prefetch(self, store, local_objects):
+        """Load the members of the sets of all the given objects at once.
+
+        The members of each set are stored in its local object, and
+        used by the bound reference set until it is changed, until an
+        object of the classes of its members becomes dirty, or until
+        anything is flushed or invalidated in the store.
+
+        @return: The distinct members of all sets.
+        """
+        relation1 = self._relation1
+        locals_by_key = {}
+        for local in local_objects:
+            key = tuple(variable.get() for variable in
+                        relation1.get_local_variables(local))
+            locals_by_key.setdefault(key, []).append(local)
+        if not locals_by_key:
+            return []
+
+        where = compare_columns_in(relation1.remote_key, locals_by_key.keys())
+        if self._relation2 is None:
+            result = store.find(relation1.remote_cls, where)
+        else:
+            where &= self._relation2.get_where_for_join()
+            result = store.find((self._relation2.local_cls,) +
+                                relation1.remote_key, where)
+        if self._order_by is not None:
+            result.order_by(*self._order_by)
+        elif self._relation2 is not None:
+            # Unlike the find of the bound set, a tuple find doesn't use
+            # the default order of the target class.
+            target_info = get_cls_info(self._relation2.local_cls)
+            if target_info.default_order is not Undef:
+                result.order_by(*target_info.default_order)
+
+        members = {}
+        remotes = []
+        seen = set()
+        for item in result:
+            if self._relation2 is None:
+                remote = item
+                key = tuple(variable.get() for variable in
+                            relation1.get_remote_variables(remote))
+            else:
+                remote = item[0]
+                key = item[1:]
+            members.setdefault(key, []).append(remote)
+            if id(remote) not in seen:
+                seen.add(id(remote))
+                remotes.append(remote)
+
+        prefetch_key = ("prefetched", relation1)
+        if self._relation2 is None:
+            member_classes = (relation1.remote_cls,)
+        else:
+            member_classes = (relation1.remote_cls, self._relation2.local_cls)
+        dirty_version = store._get_dirty_version(member_classes)
+        for key, key_locals in locals_by_key.iteritems():
+            for local in key_locals:
+                get_obj_info(local)[prefetch_key] = (
+                    store._generation, dirty_version, members.get(key, []))
+        return remotes
+
 
 class BoundReferenceSetBase(object):
 
+    def _get_prefetched(self):
+        """Return the prefetched members of this set, if still valid.
+
+        @return: A list with the members of the set, or None if they
+            weren't prefetched, or if they may have become stale.
+        """
+        local_info = get_obj_info(self._local)
+        prefetched = local_info.get(self._prefetch_key)
+        if prefetched is None:
+            return None
+        store = Store.of(self._local)
+        if store is not None and store._implicit_flush_block_count == 0:
+            # Rather than flushing everything, leave the members to be
+            # flushed by find() when any of them may have changed.
+            if (store._get_dirty_version(self._member_classes) !=
+                prefetched[1]):
+                del local_info[self._prefetch_key]
+                return None
+            store.flush(self._local)
+        if store is None or prefetched[0] != store._generation:
+            del local_info[self._prefetch_key]
+            return None
+        return prefetched[2]
+
+    def _forget_prefetched(self):
+        get_obj_info(self._local).pop(self._prefetch_key, None)
+
     def find(self, *args, **kwargs):
         store = Store.of(self._local)
         if store is None:
@@ -285,6 +439,9 @@ class BoundReferenceSetBase(object):
         return result
 
     def __iter__(self):
+        prefetched = self._get_prefetched()
+        if prefetched is not None:
+            return iter(list(prefetched))
         return self.find().__iter__()
 
     def __contains__(self, item):
@@ -297,6 +454,12 @@ class BoundReferenceSetBase(object):
         return self.find(*args, **kwargs).last()
 
     def any(self, *args, **kwargs):
+        if not (args or kwargs):
+            prefetched = self._get_prefetched()
+            if prefetched is not None:
+                if not prefetched:
+                    return None
+                return prefetched[0]
         return self.find(*args, **kwargs).any()
 
     def one(self, *args, **kwargs):
@@ -309,6 +472,9 @@ class BoundReferenceSetBase(object):
         return self.find().order_by(*args)
 
     def count(self):
+        prefetched = self._get_prefetched()
+        if prefetched is not None:
+            return len(prefetched)
         return self.find().count()
 
 
@@ -317,13 +483,16 @@ class BoundReferenceSet(BoundReferenceSetBase):
     def __init__(self, relation, local, order_by):
         self._relation = relation
         self._local = local
+        self._prefetch_key = ("prefetched", relation)
         self._target_cls = self._relation.remote_cls
+        self._member_classes = (self._target_cls,)
         self._order_by = order_by
 
     def _get_where_clause(self):
         return self._relation.get_where_for_remote(self._local)
 
     def clear(self, *args, **kwargs):
+        self._forget_prefetched()
         set_kwargs = {}
         for remote_column in self._relation.remote_key:
             set_kwargs[remote_column.name] = None
@@ -334,9 +503,11 @@ class BoundReferenceSet(BoundReferenceSetBase):
         store.find(self._target_cls, where, *args, **kwargs).set(**set_kwargs)
 
     def add(self, remote):
+        self._forget_prefetched()
         self._relation.link(self._local, remote, True)
 
     def remove(self, remote):
+        self._forget_prefetched()
         self._relation.unlink(get_obj_info(self._local),
                               get_obj_info(remote), True)
 
@@ -346,17 +517,20 @@ class BoundIndirectReferenceSet(BoundReferenceSetBase):
     def __init__(self, relation1, relation2, local, order_by):
         self._relation1 = relation1
         self._relation2 = relation2
+        self._prefetch_key = ("prefetched", relation1)
         self._local = local
         self._order_by = order_by
 
         self._target_cls = relation2.local_cls
         self._link_cls = relation1.remote_cls
+        self._member_classes = (self._link_cls, self._target_cls)
 
     def _get_where_clause(self):
         return (self._relation1.get_where_for_remote(self._local) &
                 self._relation2.get_where_for_join())
 
     def clear(self, *args, **kwargs):
+        self._forget_prefetched()
         store = Store.of(self._local)
         if store is None:
             raise NoStoreError("Can't perform operation without a store")
@@ -369,6 +543,7 @@ class BoundIndirectReferenceSet(BoundReferenceSetBase):
         store.find(self._link_cls, where).remove()
 
     def add(self, remote):
+        self._forget_prefetched()
         link = self._link_cls()
         self._relation1.link(self._local, link, True)
         # Don't use remote here, as it might be security proxied or something.
@@ -376,6 +551,7 @@ class BoundIndirectReferenceSet(BoundReferenceSetBase):
         self._relation2.link(remote, link, True)
 
     def remove(self, remote):
+        self._forget_prefetched()
         store = Store.of(self._local)
         if store is None:
             raise NoStoreError("Can't perform operation without a store")
@@ -483,11 +659,14 @@ class Relation(object):
         check if it's still in the database.
         """
         local_info = get_obj_info(local)
+        # Invalidating the local object may unlink the remote one.
+        _check_epoch(local_info)
         try:
             obj = local_info[self]["remote"]
         except KeyError:
             return None
         remote_info = get_obj_info(obj)
+        _check_epoch(remote_info)
         if remote_info.get("invalidated"):
             try:
                 Store.of(obj)._validate_alive(remote_info)
@@ -504,7 +683,7 @@ class Relation(object):
         local_variables = self.get_local_variables(local)
         for variable in local_variables:
             if not variable.is_defined():
-                Store.of(local).flush()
+                Store.of(local).flush(local)
                 break
         return compare_columns(self.remote_key, local_variables)
 
@@ -541,12 +720,14 @@ class Relation(object):
 
     def get_local_variables(self, local):
         local_info = get_obj_info(local)
+        _check_epoch(local_info)
         return tuple(local_info.variables[column]
                      for column in self._get_local_columns(local.__class__))
 
     def local_variables_are_none(self, local):
         """Return true if all variables of the local key have None values."""
         local_info = get_obj_info(local)
+        _check_epoch(local_info)
         for column in self._get_local_columns(local.__class__):
             if local_info.variables[column].get() is not None:
                 return False
@@ -554,6 +735,7 @@ class Relation(object):
 
     def get_remote_variables(self, remote):
         remote_info = get_obj_info(remote)
+        _check_epoch(remote_info)
         return tuple(remote_info.variables[column]
                      for column in self._get_remote_columns(remote.__class__))
 
@@ -949,3 +1131,9 @@ def _find_descriptor_obj(used_cls, descr):
             if _descr is descr:
                 return getattr(cls, attr)
     raise RuntimeError("Reference used in an unknown class")
+
+def _check_epoch(obj_info):
+    """Invalidate C{obj_info} first if its store invalidated all objects."""
+    epoch = obj_info.get("epoch")
+    if epoch is not None and epoch.expired:
+        epoch.store._check_epoch(obj_info)
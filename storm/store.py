@@ -26,17 +26,21 @@ This module contains the highest-level ORM interface in Storm.
 
 from copy import copy
 from weakref import WeakValueDictionary
-from operator import itemgetter
+from collections import OrderedDict
+from heapq import heapify, heappop, heappush
+import time
 
-from storm.info import get_cls_info, get_obj_info, set_obj_info
-from storm.variables import Variable, LazyValue
+from storm.info import get_cls_info, get_obj_info, set_obj_info, ObjectInfo
+from storm.variables import Variable, LazyValue, MutableValueVariable
 from storm.expr import (
     Expr, Select, Insert, Update, Delete, Column, Count, Max, Min,
-    Avg, Sum, Eq, And, Asc, Desc, compile_python, compare_columns, SQLRaw,
-    Union, Except, Intersect, Alias, SetExpr)
+    Avg, Sum, Eq, And, Asc, Desc, compile_python, compare_columns,
+    compare_columns_in, SQLRaw, Union, Except, Intersect, Alias, SetExpr,
+    State, Table)
 from storm.exceptions import (
-    WrongStoreError, NotFlushedError, OrderLoopError, UnorderedError,
-    NotOneError, FeatureError, CompileError, LostObjectError, ClassInfoError)
+    StoreError, WrongStoreError, NotFlushedError, OrderLoopError,
+    UnorderedError, NotOneError, FeatureError, CompileError, LostObjectError,
+    ClassInfoError)
 from storm import Undef
 from storm.cache import Cache
 from storm.event import EventSystem
@@ -63,23 +67,78 @@ class Store(object):
 
     _result_set_factory = None
 
-    def __init__(self, database, cache=None):
+    # Maximum number of parameters used by each query of get_many() and
+    # of batched flushes, so that statements stay under limits such as
+    # SQLite's 999.
+    _get_many_max_parameters = 500
+
+    # Names of the counters kept for get_stats().
+    _stat_names = ("get_hits", "get_misses", "load_hits", "load_misses",
+                   "invalidations", "lazy_resolutions")
+
+    # Maximum number of results kept for ResultSet.cache_results().
+    _result_cache_size = 1000
+
+    def __init__(self, database, cache=None, row_cache=None):
         """
         @param database: The L{storm.database.Database} instance to use.
         @param cache: The cache to use.  Defaults to a L{Cache} instance.
+        @param row_cache: Optionally, a L{RowCache} shared with other
+            stores of the same database, which L{get} looks rows up in
+            before querying the database.
         """
         self._database = database
         self._event = EventSystem(self)
         self._connection = database.connect(self._event)
         self._alive = WeakValueDictionary()
+        # {cls: WeakValueDictionary({primary_values: obj_info})}, holding
+        # the same objects as _alive, to go through the ones of a class.
+        self._alive_by_class = {}
+        # Alive objects whose class has an __storm_invalidated__ hook,
+        # with the same keys as _alive.
+        self._hooked_alive = WeakValueDictionary()
+        # Alive objects record the epoch in which they were last known
+        # to be valid.  See _check_epoch().
+        self._epoch = Epoch(self)
+        # (cls, unique column, value) -> obj_info
+        self._unique_alive = WeakValueDictionary()
         self._dirty = {}
+        # {table name: count}, bumped whenever an object becomes dirty.
+        self._dirty_versions = {}
         self._order = {} # (info, info) = count
         if cache is None:
             self._cache = Cache()
         else:
             self._cache = cache
         self._implicit_flush_block_count = 0
+        self._flush_batch_size = 1
+        self._scoped_implicit_flush = False
         self._sequence = 0 # Advisory ordering.
+        # Bumped whenever data loaded before may have become stale.
+        self._generation = 0
+        # {primary_values: set(classes)} of keys known to be missing,
+        # or None if the negative cache is disabled.
+        self._negative_cache = None
+        self._compact_objects = False
+        # {cls: variables of the eager columns}, for compact objects.
+        self._row_converters = {}
+        self._stats = dict.fromkeys(self._stat_names, 0)
+        self._row_cache = row_cache
+        # Rows written in the current transaction, as (table name,
+        # primary_values), and tables changed by bulk updates, which
+        # aren't put in the row cache until the transaction ends.
+        self._written_rows = set()
+        self._written_tables = set()
+        # Row cache clock when the current transaction started, at the
+        # latest.  Rows invalidated since then aren't cached again.
+        self._row_cache_clock = None
+        if row_cache is not None:
+            self._row_cache_clock = row_cache.get_clock()
+        # {table name: version}, bumped whenever rows of the table are
+        # written, with None standing for any table.
+        self._table_versions = {}
+        # {(statement, params): (versions, expiration, results)}
+        self._result_cache = OrderedDict()
 
     def get_database(self):
         """Return this Store's Database object."""
@@ -105,6 +164,27 @@ class Store(object):
         """
         if self._implicit_flush_block_count == 0:
             self.flush()
+        if isinstance(statement, (Insert, Update, Delete)):
+            table = statement.table
+            if table is Undef and not isinstance(statement, Delete):
+                # The table is the default one of the columns set.
+                for column in statement.map:
+                    table = column.table
+                    break
+            if isinstance(table, type):
+                table = get_cls_info(table).table
+            self._generation += 1
+            self._bump_table_version(table)
+            if not isinstance(statement, Delete):
+                # Rows may now exist with keys known to be missing.
+                self._forget_missing(table)
+        elif not (isinstance(statement, (Select, SetExpr)) or
+                  isinstance(statement, basestring) and
+                  statement.lstrip()[:6].upper() == "SELECT"):
+            # We can't tell what else the statement changes.
+            self._generation += 1
+            self._bump_table_version(None)
+            self._forget_missing(None)
         return self._connection.execute(statement, params, noresult)
 
     def close(self):
@@ -136,6 +216,16 @@ class Store(object):
         self.flush()
         self.invalidate()
         self._connection.commit()
+        if self._row_cache is not None:
+            # Other stores may have cached these rows again since they
+            # were flushed, as they were in their previous state.
+            for table, primary_values in self._written_rows:
+                self._row_cache.invalidate(table, primary_values)
+            for table in self._written_tables:
+                self._row_cache.invalidate_table(table)
+            self._row_cache_clock = self._row_cache.get_clock()
+        self._written_rows.clear()
+        self._written_tables.clear()
 
     def rollback(self):
         """Roll back all outstanding changes, reverting to database state."""
@@ -152,51 +242,291 @@ class Store(object):
         self._dirty.clear()
         self.invalidate()
         self._connection.rollback()
-
-    def get(self, cls, key):
+        if self._row_cache is not None:
+            self._row_cache_clock = self._row_cache.get_clock()
+        self._written_rows.clear()
+        self._written_tables.clear()
+        # Results may have been cached after changes now rolled back.
+        self._result_cache.clear()
+
+    def get(self, cls, key, attribute=None):
         """Get object of type cls with the given primary key from the database.
 
         If the object is alive the database won't be touched.
 
+        Objects may also be looked up by the value of a column declared
+        as unique, such as C{store.get(Person, u"joe@example.com",
+        attribute=Person.email)}.  Alive objects are found by such
+        lookups as well.
+
         @param cls: Class of the object to be retrieved.
         @param key: Primary key of object. May be a tuple for composed keys.
+            When C{attribute} is given, the value of that attribute.
+        @param attribute: Optionally, a column of C{cls} declared with
+            C{unique=True}, to look the object up by.
 
         @return: The object found with the given primary key, or None
             if no object is found.
         """
-
-        if self._implicit_flush_block_count == 0:
-            self.flush()
-
-        if type(key) != tuple:
-            key = (key,)
-
         cls_info = get_cls_info(cls)
 
-        assert len(key) == len(cls_info.primary_key)
+        self._implicit_flush(lambda: Select(cls_info.eager_columns,
+                                            default_tables=cls_info.table))
 
-        primary_vars = []
-        for column, variable in zip(cls_info.primary_key, key):
-            if not isinstance(variable, Variable):
-                variable = column.variable_factory(value=variable)
-            primary_vars.append(variable)
+        if attribute is not None:
+            return self._get_by_unique(cls_info, attribute, key)
+
+        primary_vars = self._get_key_variables(cls_info, key)
 
         primary_values = tuple(var.get(to_db=True) for var in primary_vars)
         obj_info = self._alive.get((cls_info.cls, primary_values))
-        if obj_info is not None and not obj_info.get("invalidated"):
-            return self._get_object(obj_info)
+        if obj_info is not None:
+            self._check_epoch(obj_info)
+            if not obj_info.get("invalidated"):
+                self._stats["get_hits"] += 1
+                return self._get_object(obj_info)
+
+        if self._is_known_missing(cls_info, primary_values):
+            self._stats["get_hits"] += 1
+            return None
+
+        if (self._row_cache is not None and
+            not self._is_row_written(cls_info, primary_values)):
+            values = self._row_cache.get(cls_info, primary_values)
+            if values is not None:
+                self._stats["get_hits"] += 1
+                return self._load_object(cls_info, _RowCacheResult,
+                                         values, cache_row=False)
 
+        self._stats["get_misses"] += 1
         where = compare_columns(cls_info.primary_key, primary_vars)
 
-        select = Select(cls_info.columns, where,
+        select = Select(cls_info.eager_columns, where,
                         default_tables=cls_info.table, limit=1)
 
         result = self._connection.execute(select)
         values = result.get_one()
         if values is None:
+            self._set_known_missing(cls_info, primary_values)
             return None
         return self._load_object(cls_info, result, values)
 
+    def get_many(self, cls, keys):
+        """Get objects of type cls with the given primary keys.
+
+        Objects which are alive are taken from memory, and all the
+        others are retrieved from the database with as few queries as
+        possible, each matching a chunk of the missing keys with an
+        C{IN} comparison.
+
+        @param cls: Class of the objects to be retrieved.
+        @param keys: Sequence of primary keys. Each key may be a tuple
+            for composed keys.
+
+        @return: A list with the object found for each of the given
+            keys, in the same order, and None for keys which weren't
+            found.
+        """
+        cls_info = get_cls_info(cls)
+
+        self._implicit_flush(lambda: Select(cls_info.eager_columns,
+                                            default_tables=cls_info.table))
+
+        objects = []
+        missing = {}
+        missing_vars = []
+        for i, key in enumerate(keys):
+            primary_vars = self._get_key_variables(cls_info, key)
+            primary_values = tuple(var.get(to_db=True) for var in primary_vars)
+            obj_info = self._alive.get((cls_info.cls, primary_values))
+            if obj_info is not None:
+                self._check_epoch(obj_info)
+                if not obj_info.get("invalidated"):
+                    self._stats["get_hits"] += 1
+                    objects.append(self._get_object(obj_info))
+                    continue
+            objects.append(None)
+            if self._is_known_missing(cls_info, primary_values):
+                self._stats["get_hits"] += 1
+                continue
+            self._stats["get_misses"] += 1
+            positions = missing.get(primary_values)
+            if positions is None:
+                positions = missing[primary_values] = []
+                missing_vars.append(primary_vars)
+            positions.append(i)
+
+        chunk_size = max(1, self._get_many_max_parameters //
+                            len(cls_info.primary_key))
+        for start in range(0, len(missing_vars), chunk_size):
+            where = compare_columns_in(cls_info.primary_key,
+                                       missing_vars[start:start+chunk_size])
+            select = Select(cls_info.eager_columns, where,
+                            default_tables=cls_info.table)
+            result = self._connection.execute(select)
+            for values in result:
+                obj = self._load_object(cls_info, result, values)
+                primary_values = tuple(var.get(to_db=True) for var in
+                                       get_obj_info(obj)["primary_vars"])
+                missing_values = missing.pop(primary_values, ())
+                for i in missing_values:
+                    objects[i] = obj
+        for primary_values in missing:
+            self._set_known_missing(cls_info, primary_values)
+        return objects
+
+    def _get_by_unique(self, cls_info, column, value):
+        """Get the object with the given value in a unique column."""
+        for unique_column in cls_info.unique_columns:
+            if unique_column is column:
+                break
+        else:
+            raise FeatureError("%r is not a unique column of %r"
+                               % (column, cls_info.cls))
+
+        if isinstance(value, Variable):
+            variable = value
+        else:
+            variable = column.variable_factory(value=value)
+
+        value = variable.get(to_db=True)
+        obj_info = self._unique_alive.get((cls_info.cls, column, value))
+        if obj_info is not None:
+            self._check_epoch(obj_info)
+        if (obj_info is not None and not obj_info.get("invalidated") and
+            obj_info.variables[column].get(to_db=True) == value):
+            # The value may have been changed in memory without being
+            # flushed yet, if implicit flushes are blocked.
+            self._stats["get_hits"] += 1
+            return self._get_object(obj_info)
+
+        self._stats["get_misses"] += 1
+        select = Select(cls_info.eager_columns, Eq(column, variable),
+                        default_tables=cls_info.table, limit=1)
+        result = self._connection.execute(select)
+        values = result.get_one()
+        if values is None:
+            return None
+        obj = self._load_object(cls_info, result, values)
+        self._index_unique_column(get_obj_info(obj), column)
+        return obj
+
+    def get_stats(self, reset=False):
+        """Return counters of how objects were found by this store.
+
+        These help tuning the size of the cache.  The returned dict
+        maps the following names to counts:
+
+          - C{get_hits}: keys looked up by L{get} or L{get_many} and
+            answered from memory, without querying the database.
+          - C{get_misses}: keys looked up in the database instead.
+          - C{load_hits}: rows loaded for objects which were still
+            alive in the store.
+          - C{load_misses}: rows loaded into new objects.
+          - C{cache_evictions}: objects dropped by the cache to respect
+            its size, if it counts them in an C{evictions} attribute,
+            as the caches in L{storm.cache} do.
+          - C{invalidations}: objects invalidated.  After commit and
+            rollback, alive objects are only counted when next used.
+          - C{lazy_resolutions}: queries made to load lazy values, such
+            as lazy columns and AutoReload values, when touched.
+
+        @param reset: If True, set all the counters back to zero.
+        """
+        stats = self._stats.copy()
+        stats["cache_evictions"] = getattr(self._cache, "evictions", 0)
+        if reset:
+            self._stats = dict.fromkeys(self._stat_names, 0)
+            if hasattr(self._cache, "evictions"):
+                self._cache.evictions = 0
+        return stats
+
+    def set_negative_cache(self, enabled):
+        """Enable or disable caching of keys missing from the database.
+
+        When enabled, L{get} and L{get_many} remember the keys which
+        weren't found in the database, and won't look them up again
+        until an object with the same key is flushed, until an insert or
+        update of their table, or raw SQL other than a C{SELECT}, is run
+        with L{execute}, or until the cache is invalidated with
+        L{invalidate}, L{commit} or L{rollback}.
+
+        Note that within a transaction running at the I{read committed}
+        isolation level rows committed by other transactions become
+        visible, but keys remembered as missing won't be looked up
+        again before the end of the transaction.
+
+        @param enabled: Whether the negative cache should be used.
+        """
+        if not enabled:
+            self._negative_cache = None
+        elif self._negative_cache is None:
+            self._negative_cache = {}
+
+    def set_compact_objects(self, enabled):
+        """Enable or disable the compact representation of loaded objects.
+
+        When enabled, objects loaded from the database keep the values
+        of their columns in a single tuple, and a variable is only
+        created for a column when it's needed: for the primary key and
+        columns holding mutable values, such as pickles, when the
+        attribute is set, or when its value has to be reloaded.  Reading
+        attributes creates nothing, so loading many objects of which only
+        a few attributes are read uses far less memory and time.
+
+        @param enabled: Whether objects should be loaded in the compact
+            representation.
+        """
+        self._compact_objects = enabled
+
+    def _is_known_missing(self, cls_info, primary_values):
+        """Return True if the key is in the negative cache."""
+        if self._negative_cache is None:
+            return False
+        return cls_info.cls in self._negative_cache.get(primary_values, ())
+
+    def _set_known_missing(self, cls_info, primary_values):
+        """Add the key to the negative cache, if it's enabled."""
+        if self._negative_cache is not None:
+            self._negative_cache.setdefault(primary_values,
+                                            set()).add(cls_info.cls)
+
+    def _forget_missing(self, table):
+        """Drop the keys of C{table} from the negative cache.
+
+        Keys of all tables are dropped if C{table} isn't known by name.
+        """
+        if not self._negative_cache:
+            return
+        if isinstance(table, Table):
+            name = table.name
+        elif isinstance(table, basestring):
+            name = table
+        else:
+            self._negative_cache.clear()
+            return
+        for primary_values, classes in self._negative_cache.items():
+            for cls in list(classes):
+                cls_table = get_cls_info(cls).table
+                if isinstance(cls_table, Table) and cls_table.name == name:
+                    classes.discard(cls)
+            if not classes:
+                del self._negative_cache[primary_values]
+
+    def _get_key_variables(self, cls_info, key):
+        """Return the primary variables for the given primary key."""
+        if type(key) != tuple:
+            key = (key,)
+
+        assert len(key) == len(cls_info.primary_key)
+
+        primary_vars = []
+        for column, variable in zip(cls_info.primary_key, key):
+            if not isinstance(variable, Variable):
+                variable = column.variable_factory(value=variable)
+            primary_vars.append(variable)
+        return primary_vars
+
     def find(self, cls_spec, *args, **kwargs):
         """Perform a query.
 
@@ -217,11 +547,11 @@ class Store(object):
         @return: A L{ResultSet} of instances C{cls_spec}. If C{cls_spec}
             was a tuple, then an iterator of tuples of such instances.
         """
-        if self._implicit_flush_block_count == 0:
-            self.flush()
         find_spec = FindSpec(cls_spec)
         where = get_where_for_args(args, kwargs, find_spec.default_cls)
-        return self._result_set_factory(self, find_spec, where)
+        result_set = self._result_set_factory(self, find_spec, where)
+        self._implicit_flush(result_set._get_select)
+        return result_set
 
     def using(self, *tables):
         """Specify tables to use explicitly.
@@ -320,6 +650,7 @@ class Store(object):
         if "primary_vars" not in obj_info:
             raise NotFlushedError("Can't reload an object if it was "
                                   "never flushed")
+        self._check_epoch(obj_info)
         where = compare_columns(cls_info.primary_key, obj_info["primary_vars"])
         select = Select(cls_info.columns, where,
                         default_tables=cls_info.table, limit=1)
@@ -341,6 +672,22 @@ class Store(object):
         """
         self._mark_autoreload(obj, False)
 
+    def invalidate_class(self, cls):
+        """Set all alive objects of C{cls} to be invalidated.
+
+        This is like L{invalidate}, but only goes through the objects of
+        the given class.
+        """
+        cls = get_cls_info(cls).cls
+        obj_infos = self._iter_alive(cls)
+        for obj_info in obj_infos:
+            self._cache.remove(obj_info)
+            obj_info["epoch"] = self._epoch
+        if self._negative_cache:
+            self._negative_cache.clear()
+        self._generation += 1
+        self._mark_infos_autoreload(obj_infos, True)
+
     def invalidate(self, obj=None):
         """Set an object or all objects to be invalidated.
 
@@ -360,7 +707,61 @@ class Store(object):
             self._cache.clear()
         else:
             self._cache.remove(get_obj_info(obj))
-        self._mark_autoreload(obj, True)
+            if self._row_cache is not None:
+                self._forget_row(get_obj_info(obj), written=False)
+        if self._negative_cache:
+            self._negative_cache.clear()
+        self._generation += 1
+        if obj is not None:
+            self._mark_autoreload(obj, True)
+        else:
+            # Rather than going through all alive objects, start a new
+            # epoch, so that objects are invalidated when next used.
+            # Objects with unflushed changes or an invalidation hook are
+            # still invalidated right away.
+            self._epoch.expired = True
+            self._epoch = Epoch(self)
+            obj_infos = set(self._hooked_alive.values())
+            obj_infos.update(obj_info for obj_info in self._dirty
+                             if "epoch" in obj_info)
+            for obj_info in obj_infos:
+                obj_info["epoch"] = self._epoch
+            self._mark_infos_autoreload(obj_infos, True)
+
+    def evict(self, obj):
+        """Drop an object from this store, without changing the database.
+
+        The object is released by the store and its cache, and won't be
+        returned by later queries, which build a new object for the same
+        row instead.  This helps keeping memory usage down when going
+        through many objects, as in long batch jobs.
+
+        The evicted object shouldn't be used with the store anymore.
+
+        @raise WrongStoreError: If the object isn't in this store.
+        @raise StoreError: If the object has changes not flushed yet.
+        """
+        obj_info = get_obj_info(obj)
+        if obj_info.get("store") is not self:
+            raise WrongStoreError("%s is not in this store" % repr(obj))
+        if obj_info in self._dirty:
+            raise StoreError("%s has unflushed changes" % repr(obj))
+        self._evict(obj_info)
+
+    def evict_class(self, cls):
+        """Drop all the objects of C{cls} without unflushed changes.
+
+        See L{evict}.
+        """
+        for obj_info in self._iter_alive(get_cls_info(cls).cls):
+            if obj_info not in self._dirty:
+                self._evict(obj_info)
+
+    def _evict(self, obj_info):
+        self._remove_from_alive(obj_info)
+        self._disable_change_notification(obj_info)
+        self._disable_lazy_resolving(obj_info)
+        del obj_info["store"]
 
     def reset(self):
         """Reset this store, causing all future queries to return new objects.
@@ -376,9 +777,15 @@ class Store(object):
         for obj_info in self._iter_alive():
             if "store" in obj_info:
                 del obj_info["store"]
+            obj_info.pop("epoch", None)
         self._alive.clear()
+        self._alive_by_class.clear()
+        self._hooked_alive.clear()
+        self._unique_alive.clear()
         self._dirty.clear()
         self._cache.clear()
+        if self._negative_cache:
+            self._negative_cache.clear()
         # The following line is untested, but then, I can't really find a way
         # to test it without whitebox.
         self._order.clear()
@@ -389,18 +796,11 @@ class Store(object):
             obj_infos = self._iter_alive()
         else:
             obj_infos = (get_obj_info(obj),)
+        self._mark_infos_autoreload(obj_infos, invalidate)
+
+    def _mark_infos_autoreload(self, obj_infos, invalidate):
         for obj_info in obj_infos:
-            cls_info = obj_info.cls_info
-            for column in cls_info.columns:
-                if id(column) not in cls_info.primary_key_idx:
-                    obj_info.variables[column].set(AutoReload)
-            if invalidate:
-                # Marking an object with 'invalidated' means that we're
-                # not sure if the object is actually in the database
-                # anymore, so before the object is returned from the cache
-                # (e.g. by a get()), the database should be queried to see
-                # if the object's still there.
-                obj_info["invalidated"] = True
+            self._set_autoreload(obj_info, invalidate)
         # We want to make sure we've marked all objects as invalidated and set
         # up their autoreloads before calling the invalidated hook on *any* of
         # them, because an invalidated hook might use other objects and we want
@@ -409,6 +809,32 @@ class Store(object):
             for obj_info in obj_infos:
                 self._run_hook(obj_info, "__storm_invalidated__")
 
+    def _set_autoreload(self, obj_info, invalidate):
+        cls_info = obj_info.cls_info
+        for column in cls_info.columns:
+            if id(column) not in cls_info.primary_key_idx:
+                obj_info.variables[column].set(AutoReload)
+        if invalidate:
+            # Marking an object with 'invalidated' means that we're
+            # not sure if the object is actually in the database
+            # anymore, so before the object is returned from the cache
+            # (e.g. by a get()), the database should be queried to see
+            # if the object's still there.
+            obj_info["invalidated"] = True
+            self._stats["invalidations"] += 1
+
+    def _check_epoch(self, obj_info):
+        """Invalidate C{obj_info} if it missed an invalidation of all objects.
+
+        Invalidating all objects only starts a new epoch, which takes
+        constant time however many objects are alive.  Objects from an
+        earlier epoch are invalidated when they're next used, by this
+        method, before their values are looked at.
+        """
+        if obj_info["epoch"] is not self._epoch:
+            obj_info["epoch"] = self._epoch
+            self._set_autoreload(obj_info, True)
+
     def add_flush_order(self, before, after):
         """Explicitly specify the order of flushing two objects.
 
@@ -435,7 +861,34 @@ class Store(object):
         pair = (get_obj_info(before), get_obj_info(after))
         self._order[pair] -= 1
 
-    def flush(self):
+    def set_flush_batch_size(self, size):
+        """Set the maximum number of objects flushed by a single statement.
+
+        When the size is greater than 1, objects of the same class
+        which don't have to wait for any other dirty object are flushed
+        together, up to C{size} objects at a time:
+
+          - Objects pending to be added are grouped by the set of
+            columns they define, and inserted by multi-row C{INSERT}
+            statements.
+          - Objects pending to be removed are deleted by a single
+            C{DELETE} statement matching all of their primary keys.
+          - Changed objects are grouped by the set of columns changed,
+            and the C{UPDATE} statement of each group is compiled once
+            and run for all of its objects with L{Connection.execute_many}.
+
+        The order requested with L{add_flush_order} and by references
+        is still respected.
+
+        The default size of 1 flushes every object on its own.
+
+        @param size: The maximum number of objects per statement.
+        """
+        if size < 1:
+            raise ValueError("Flush batch size must be at least 1")
+        self._flush_batch_size = size
+
+    def flush(self, *objs):
         """Flush all dirty objects in cache to database.
 
         This method will first call the __storm_pre_flush__ hook of all dirty
@@ -449,25 +902,93 @@ class Store(object):
         and if changes are made to the object it will get back to the
         dirty list, and be flushed again.
 
+        Objects to flush may be given, in which case only these objects
+        are flushed, along with the dirty objects which must be flushed
+        before them, as requested with L{add_flush_order} and by
+        references.  Other dirty objects are left untouched.
+
         Note that Storm will flush objects for you automatically, so you'll
         only need to call this method explicitly in very rare cases where
         normal flushing times are insufficient, such as when you want to
         make sure a database trigger gets run at a particular time.
+
+        @param objs: Optionally, the objects to flush.
         """
         self._event.emit("flush")
+        if objs:
+            self._flush(set(get_obj_info(obj) for obj in objs))
+        else:
+            self._flush(None)
 
+    def _flush(self, targets):
+        """Flush the given obj_infos, or all dirty ones if C{None}.
+
+        See L{flush}, which emits the C{"flush"} event before calling
+        this method.
+        """
         # The _dirty list may change under us while we're running
         # the flush hooks, so we cannot just simply loop over it
         # once.  To prevent infinite looping we keep track of which
         # objects we've called the hook for using a `flushing` dict.
-        flushing = {}
-        while self._dirty:
-            (obj_info, obj) = self._dirty.popitem()
-            if obj_info not in flushing:
-                flushing[obj_info] = obj
-                self._run_hook(obj_info, "__storm_pre_flush__")
-        self._dirty = flushing
+        if targets is None:
+            flushing = {}
+            while self._dirty:
+                (obj_info, obj) = self._dirty.popitem()
+                if obj_info not in flushing:
+                    flushing[obj_info] = obj
+                    self._run_hook(obj_info, "__storm_pre_flush__")
+            self._dirty = flushing
+        else:
+            hooked = set()
+            while True:
+                dirty = self._get_flush_closure(
+                    targets, self._get_flush_predecessors())
+                dirty.difference_update(hooked)
+                if not dirty:
+                    break
+                for obj_info in dirty:
+                    hooked.add(obj_info)
+                    self._run_hook(obj_info, "__storm_pre_flush__")
+
+        predecessors = self._get_flush_predecessors()
+
+        if targets is None:
+            dirty = self._dirty
+        else:
+            dirty = self._get_flush_closure(targets, predecessors)
+
+        if dirty:
+            self._generation += 1
 
+        flushed = set()
+
+        # The external loop is important because items can get into the dirty
+        # state while we're flushing objects.  If no objects become dirty
+        # during flush, this will clean self._dirty and the loop will exit.
+        while dirty:
+            dirty = list(dirty)
+            if targets is not None:
+                flushed.update(dirty)
+            self._flush_in_order(dirty, predecessors)
+            if targets is None:
+                dirty = self._dirty
+            else:
+                dirty = self._get_flush_closure(targets, predecessors)
+
+        if targets is None:
+            self._order.clear()
+        else:
+            # The order requested for flushed objects has been respected.
+            for pair in self._order.keys():
+                if pair[0] in flushed or pair[1] in flushed:
+                    del self._order[pair]
+
+        if not self._dirty:
+            # That's not stricly necessary, but prevents getting into bigints.
+            self._sequence = 0
+
+    def _get_flush_predecessors(self):
+        """Map objects to the ones which must be flushed before them."""
         predecessors = {}
         for (before_info, after_info), n in self._order.iteritems():
             if n > 0:
@@ -476,38 +997,32 @@ class Store(object):
                     predecessors[after_info] = set((before_info,))
                 else:
                     before_set.add(before_info)
+        return predecessors
 
-        key_func = itemgetter("sequence")
-
-        # The external loop is important because items can get into the dirty
-        # state while we're flushing objects, ...
-        while self._dirty:
-            # ... but we don't have to resort everytime an object is flushed,
-            # so we have an internal loop too.  If no objects become dirty
-            # during flush, this will clean self._dirty and the external loop
-            # will exit too.
-            sorted_dirty = sorted(self._dirty, key=key_func)
-            while sorted_dirty:
-                for i, obj_info in enumerate(sorted_dirty):
-                    for before_info in predecessors.get(obj_info, ()):
-                        if before_info in self._dirty:
-                            break # A predecessor is still dirty.
-                    else:
-                        break # Found an item without dirty predecessors.
-                else:
-                    raise OrderLoopError("Can't flush due to ordering loop")
-                del sorted_dirty[i]
-                self._dirty.pop(obj_info, None)
-                self._flush_one(obj_info)
-
-        self._order.clear()
+    def _get_flush_closure(self, targets, predecessors):
+        """Return the dirty objects needed to flush the given ones.
 
-        # That's not stricly necessary, but prevents getting into bigints.
-        self._sequence = 0
+        @param targets: The obj_infos of the objects to flush.
+        @param predecessors: The mapping from L{_get_flush_predecessors}.
+        @return: A set with the dirty obj_infos among the targets and
+            all of their (direct or indirect) predecessors.
+        """
+        seen = set(targets)
+        stack = list(targets)
+        while stack:
+            for before_info in predecessors.get(stack.pop(), ()):
+                if before_info not in seen:
+                    seen.add(before_info)
+                    stack.append(before_info)
+        return set(obj_info for obj_info in seen if obj_info in self._dirty)
 
     def _flush_one(self, obj_info):
         cls_info = obj_info.cls_info
 
+        if self._row_cache is not None:
+            # The primary key may change, so do it before and after.
+            self._forget_row(obj_info)
+
         pending = obj_info.pop("pending", None)
 
         if pending is PENDING_REMOVE:
@@ -515,6 +1030,7 @@ class Store(object):
                                           obj_info["primary_vars"]),
                           cls_info.table)
             self._connection.execute(expr, noresult=True)
+            self._bump_table_version(cls_info.table)
 
             # We're sure the cache is valid at this point.
             obj_info.pop("invalidated", None)
@@ -524,46 +1040,327 @@ class Store(object):
             del obj_info["store"]
 
         elif pending is PENDING_ADD:
+            self._flush_add(obj_info)
+            self._bump_table_version(cls_info.table)
+        else:
+            changes = self._get_changes_map(obj_info)
+            if changes:
+                self._flush_update(obj_info, changes)
+                self._bump_table_version(cls_info.table)
 
-            # Give a chance to the backend to process primary variables.
-            self._connection.preset_primary_key(cls_info.primary_key,
-                                                obj_info.primary_vars)
+        if self._row_cache is not None:
+            self._forget_row(obj_info)
 
-            changes = self._get_changes_map(obj_info, True)
+        self._run_hook(obj_info, "__storm_flushed__")
 
-            expr = Insert(changes, cls_info.table,
-                          primary_columns=cls_info.primary_key,
-                          primary_variables=obj_info.primary_vars)
+        obj_info.event.emit("flushed")
 
-            result = self._connection.execute(expr)
+    def _flush_update(self, obj_info, changes):
+        """Update a single object with the given changes map."""
+        cls_info = obj_info.cls_info
+        expr = Update(changes,
+                      compare_columns(cls_info.primary_key,
+                                      obj_info["primary_vars"]),
+                      cls_info.table)
+        self._connection.execute(expr, noresult=True)
 
-            # We're sure the cache is valid at this point. We just added
-            # the object.
-            obj_info.pop("invalidated", None)
+        self._fill_missing_values(obj_info, obj_info.primary_vars,
+                                  columns=changes)
 
-            self._fill_missing_values(obj_info, obj_info.primary_vars, result)
+        self._add_to_alive(obj_info)
 
-            self._enable_change_notification(obj_info)
-            self._add_to_alive(obj_info)
+    def _flush_add(self, obj_info):
+        """Insert a single object which was pending to be added."""
+        cls_info = obj_info.cls_info
+
+        # Give a chance to the backend to process primary variables.
+        self._connection.preset_primary_key(cls_info.primary_key,
+                                            obj_info.primary_vars)
+
+        changes = self._get_changes_map(obj_info, True)
+
+        expr = Insert(changes, cls_info.table,
+                      primary_columns=cls_info.primary_key,
+                      primary_variables=obj_info.primary_vars)
+
+        result = self._connection.execute(expr)
+
+        # We're sure the cache is valid at this point. We just added
+        # the object.
+        obj_info.pop("invalidated", None)
+
+        self._fill_missing_values(obj_info, obj_info.primary_vars, result)
+
+        self._enable_change_notification(obj_info)
+        self._add_to_alive(obj_info)
+
+    def _flush_in_order(self, obj_infos, predecessors):
+        """Flush the given obj_infos, respecting the requested order.
+
+        Objects are scheduled incrementally: each one counts how many of
+        its predecessors among C{obj_infos} are still to be flushed, and
+        is ready once that count drops to zero.  Ready objects are taken
+        from a heap in the order they got dirty.
+
+        With a flush batch size greater than one, ready objects of the
+        same class and in the same pending state are flushed together.
+        Since they're all ready, none of them waits on another.
+
+        @param obj_infos: The list of obj_infos to flush.
+        @param predecessors: The mapping from L{_get_flush_predecessors}.
+        @raise OrderLoopError: If the requested order has a loop.
+        """
+        waiting = dict.fromkeys(obj_infos, 0)
+        successors = {}
+        ready = []
+        for obj_info in obj_infos:
+            count = 0
+            for before_info in predecessors.get(obj_info, ()):
+                if before_info in waiting:
+                    count += 1
+                    after_infos = successors.get(before_info)
+                    if after_infos is None:
+                        successors[before_info] = [obj_info]
+                    else:
+                        after_infos.append(obj_info)
+            if count:
+                waiting[obj_info] = count
+            else:
+                ready.append((obj_info["sequence"], obj_info))
+        heapify(ready)
+
+        batching = self._flush_batch_size > 1
+        # {(cls, pending): heap} of ready objects, for batching.
+        ready_groups = {}
+        if batching:
+            for entry in ready:
+                self._add_ready_to_group(ready_groups, entry)
+        remaining = len(obj_infos)
+        while ready:
+            sequence, obj_info = heappop(ready)
+            if obj_info not in waiting:
+                continue # Already flushed as part of a batch.
+            if batching:
+                batch = self._pop_flush_batch(obj_info, ready_groups, waiting)
+            else:
+                batch = [obj_info]
+            for batch_info in batch:
+                del waiting[batch_info]
+                self._dirty.pop(batch_info, None)
+            remaining -= len(batch)
+            if batching:
+                self._flush_batch(batch)
+            else:
+                self._flush_one(obj_info)
+            for batch_info in batch:
+                for after_info in successors.get(batch_info, ()):
+                    count = waiting[after_info] - 1
+                    waiting[after_info] = count
+                    if not count:
+                        entry = (after_info["sequence"], after_info)
+                        heappush(ready, entry)
+                        if batching:
+                            self._add_ready_to_group(ready_groups, entry)
+        if remaining:
+            raise OrderLoopError("Can't flush due to ordering loop")
+
+    @staticmethod
+    def _add_ready_to_group(ready_groups, entry):
+        """Add a C{(sequence, obj_info)} entry to the heap of its group."""
+        obj_info = entry[1]
+        key = (obj_info.cls_info.cls, obj_info.get("pending"))
+        group = ready_groups.get(key)
+        if group is None:
+            ready_groups[key] = [entry]
         else:
-            cached_primary_vars = obj_info["primary_vars"]
+            heappush(group, entry)
 
-            changes = self._get_changes_map(obj_info)
+    def _pop_flush_batch(self, obj_info, ready_groups, waiting):
+        """Return the objects which may be flushed with C{obj_info}.
 
-            if changes:
-                expr = Update(changes,
-                              compare_columns(cls_info.primary_key,
-                                              cached_primary_vars),
-                              cls_info.table)
-                self._connection.execute(expr, noresult=True)
+        Only ready objects of the same class and in the same pending
+        state are part of the batch, taken in the order they got dirty.
+        """
+        batch = [obj_info]
+        cls_info = obj_info.cls_info
+        pending = obj_info.get("pending")
+        group = ready_groups.get((cls_info.cls, pending))
+        if group is not None:
+            while group and len(batch) < self._flush_batch_size:
+                other_info = heappop(group)[1]
+                if (other_info is not obj_info and other_info in waiting and
+                    other_info.cls_info is cls_info and
+                    other_info.get("pending") is pending):
+                    batch.append(other_info)
+        return batch
+
+    def _flush_batch(self, obj_infos):
+        """Flush objects of the same class and in the same pending state."""
+        if self._row_cache is not None:
+            for obj_info in obj_infos:
+                self._forget_row(obj_info)
+
+        pending = obj_infos[0].get("pending")
+        if pending is PENDING_REMOVE:
+            self._flush_remove_batch(obj_infos)
+        elif pending is PENDING_ADD:
+            self._flush_add_batch(obj_infos)
+        else:
+            self._flush_update_batch(obj_infos)
+        self._bump_table_version(obj_infos[0].cls_info.table)
+
+        for obj_info in obj_infos:
+            if self._row_cache is not None:
+                self._forget_row(obj_info)
+            self._run_hook(obj_info, "__storm_flushed__")
+            obj_info.event.emit("flushed")
+
+    def _flush_remove_batch(self, obj_infos):
+        """Delete the given objects, with as few statements as possible.
+
+        Each statement binds at most as many parameters as queries of
+        L{get_many}.
+        """
+        cls_info = obj_infos[0].cls_info
+        chunk_size = max(1, self._get_many_max_parameters //
+                            len(cls_info.primary_key))
+        for start in range(0, len(obj_infos), chunk_size):
+            where = compare_columns_in(cls_info.primary_key,
+                                       [obj_info["primary_vars"] for obj_info
+                                        in obj_infos[start:start+chunk_size]])
+            self._connection.execute(Delete(where, cls_info.table),
+                                     noresult=True)
+
+        for obj_info in obj_infos:
+            del obj_info["pending"]
+
+            # We're sure the cache is valid at this point.
+            obj_info.pop("invalidated", None)
+
+            self._disable_change_notification(obj_info)
+            self._remove_from_alive(obj_info)
+            del obj_info["store"]
 
-                self._fill_missing_values(obj_info, obj_info.primary_vars)
+    def _flush_update_batch(self, obj_infos):
+        """Update the given objects, with one statement per set of columns.
 
+        Objects with changes which are expressions rather than plain
+        values are updated one at a time.
+        """
+        cls_info = obj_infos[0].cls_info
+        columns = cls_info.columns
+        groups = {}
+        for obj_info in obj_infos:
+            changes = self._get_changes_map(obj_info)
+            if not changes:
+                continue
+            for variable in changes.itervalues():
+                if not isinstance(variable, Variable):
+                    self._flush_update(obj_info, changes)
+                    break
+            else:
+                # None values may compile differently from other values
+                # (e.g. a None list on PostgreSQL becomes a literal NULL),
+                # so they're part of the key too.
+                key = tuple((i, changes[column].get() is None)
+                            for i, column in enumerate(columns)
+                            if column in changes)
+                groups.setdefault(key, []).append((obj_info, changes))
+
+        for key, group in groups.iteritems():
+            if len(group) == 1:
+                self._flush_update(*group[0])
+                continue
+
+            # Compile the statement for the first object, and then find
+            # the position of each of its variables in the parameters,
+            # so that the same positions may be filled by the variables
+            # of all other objects.
+            update_columns = tuple(columns[i] for i, is_none in key)
+            obj_info, changes = group[0]
+            expr = Update(changes,
+                          compare_columns(cls_info.primary_key,
+                                          obj_info["primary_vars"]),
+                          cls_info.table)
+            state = State()
+            statement = self._connection.compile(expr, state)
+            variables = [changes[column] for column in update_columns]
+            variables.extend(obj_info["primary_vars"])
+            positions = dict((id(variable), i)
+                             for i, variable in enumerate(variables))
+            try:
+                parameter_map = tuple(positions[id(param)]
+                                      for param in state.parameters)
+            except KeyError:
+                # Some variables are bound through variables of their own
+                # (e.g. list elements on PostgreSQL), so the parameters of
+                # other objects can't be found from the same positions.
+                for obj_info, changes in group:
+                    self._flush_update(obj_info, changes)
+                continue
+
+            params_list = []
+            for obj_info, changes in group:
+                variables = [changes[column] for column in update_columns]
+                variables.extend(obj_info["primary_vars"])
+                params_list.append([variables[i] for i in parameter_map])
+            self._connection.execute_many(statement, params_list)
+
+            for obj_info, changes in group:
+                self._fill_missing_values(obj_info, obj_info.primary_vars,
+                                          columns=changes)
                 self._add_to_alive(obj_info)
 
-        self._run_hook(obj_info, "__storm_flushed__")
+    def _flush_add_batch(self, obj_infos):
+        """Insert the given objects, with one statement per set of columns."""
+        cls_info = obj_infos[0].cls_info
+        columns = cls_info.columns
+        groups = {}
+        for obj_info in obj_infos:
+            # Give a chance to the backend to process primary variables.
+            self._connection.preset_primary_key(cls_info.primary_key,
+                                                obj_info.primary_vars)
+            changes = self._get_changes_map(obj_info, True)
+            key = tuple(i for i, column in enumerate(columns)
+                        if column in changes)
+            groups.setdefault(key, []).append((obj_info, changes))
+
+        for key, group in groups.iteritems():
+            if not key:
+                # Nothing to insert but the defaults, which multi-row
+                # inserts can't express portably.
+                for obj_info, changes in group:
+                    del obj_info["pending"]
+                    self._flush_add(obj_info)
+                continue
+            insert_columns = tuple(columns[i] for i in key)
+            chunk_size = max(1, self._get_many_max_parameters //
+                                len(insert_columns))
+            for start in range(0, len(group), chunk_size):
+                self._flush_add_chunk(cls_info, insert_columns,
+                                      group[start:start+chunk_size])
+
+    def _flush_add_chunk(self, cls_info, insert_columns, group):
+        """Insert objects setting the same columns with one statement."""
+        values = [tuple(changes[column] for column in insert_columns)
+                  for obj_info, changes in group]
+        expr = Insert(insert_columns, cls_info.table,
+                      primary_columns=cls_info.primary_key, values=values)
+        results = self._connection.insert_many(
+            expr, [obj_info.primary_vars for obj_info, changes in group])
+
+        for (obj_info, changes), result in zip(group, results):
+            del obj_info["pending"]
 
-        obj_info.event.emit("flushed")
+            # We're sure the cache is valid at this point. We just added
+            # the object.
+            obj_info.pop("invalidated", None)
+
+            self._fill_missing_values(obj_info, obj_info.primary_vars,
+                                      result)
+
+            self._enable_change_notification(obj_info)
+            self._add_to_alive(obj_info)
 
     def block_implicit_flushes(self):
         """Block implicit flushes from operations like execute()."""
@@ -574,6 +1371,54 @@ class Store(object):
         assert self._implicit_flush_block_count > 0
         self._implicit_flush_block_count -= 1
 
+    def set_scoped_implicit_flush(self, enabled):
+        """Enable or disable table-scoped implicit flushes.
+
+        By default, L{find} and L{get} flush all dirty objects before
+        querying the database.  When scoped implicit flushes are
+        enabled, they only flush the dirty objects stored in the tables
+        used by the query, along with the objects which must be flushed
+        before them, as requested with L{add_flush_order} and by
+        references.
+
+        Tables referred to only by raw SQL strings can't be found,
+        so changes to them must be flushed explicitly in this mode.
+
+        @param enabled: Whether implicit flushes should be scoped.
+        """
+        self._scoped_implicit_flush = enabled
+
+    def _implicit_flush(self, get_select):
+        """Flush before running a select, unless blocked.
+
+        In the scoped mode, only the dirty objects stored in tables
+        used by the select returned by C{get_select()} are flushed.
+        """
+        if self._implicit_flush_block_count != 0:
+            return
+        if not self._scoped_implicit_flush:
+            self.flush()
+            return
+        self._event.emit("flush")
+        if not self._dirty:
+            return
+        state = State()
+        state.seen_tables = set()
+        try:
+            self._connection.compile(get_select(), state)
+        except CompileError:
+            # Let the error surface when the query is actually run.
+            self._flush(None)
+            return
+        tables = state.seen_tables
+        targets = set()
+        for obj_info in self._dirty:
+            table = obj_info.cls_info.table
+            if not isinstance(table, Table) or table.name in tables:
+                targets.add(obj_info)
+        if targets:
+            self._flush(targets)
+
     def block_access(self):
         """Block access to the underlying database connection."""
         self._connection.block_access()
@@ -585,6 +1430,9 @@ class Store(object):
     def _get_changes_map(self, obj_info, adding=False):
         """Return a {column: variable} dictionary suitable for inserts/updates.
 
+        Unless adding, only the columns changed since the object was
+        last flushed are inspected.
+
         @param obj_info: ObjectInfo to inspect for changes.
         @param adding: If true, any defined variables will be considered
                        a change and included in the returned map.
@@ -592,7 +1440,11 @@ class Store(object):
         cls_info = obj_info.cls_info
         changes = {}
         select_variables = []
-        for column in cls_info.columns:
+        if adding:
+            columns = cls_info.columns
+        else:
+            columns = obj_info.get("changed_columns", ())
+        for column in columns:
             variable = obj_info.variables[column]
             if adding or variable.has_changed():
                 if variable.is_defined():
@@ -618,12 +1470,14 @@ class Store(object):
 
         return changes
 
-    def _fill_missing_values(self, obj_info, primary_vars, result=None):
+    def _fill_missing_values(self, obj_info, primary_vars, result=None,
+                             columns=None):
         """Fill missing values in variables of the given obj_info.
 
         This method will verify which values are unset in obj_info,
         and set them to AutoReload, or if it's part of the primary
-        key, query the database for the actual values.
+        key, query the database for the actual values.  The columns
+        changed since the last flush are forgotten afterwards.
 
         @param obj_info: ObjectInfo to have its values filled.
         @param primary_vars: Variables composing the primary key with
@@ -633,13 +1487,17 @@ class Store(object):
             isn't defined, it must be retrieved from the database
             using database-dependent logic, which is provided by the
             backend in the result of the query which inserted the object.
+        @param columns: The columns to fill, by default all columns.  After
+            an update, only the updated ones have to be filled.
         """
         cls_info = obj_info.cls_info
+        if columns is None:
+            columns = cls_info.columns
 
         cached_primary_vars = obj_info.get("primary_vars")
         primary_key_idx = cls_info.primary_key_idx
         missing_columns = []
-        for column in cls_info.columns:
+        for column in columns:
             variable = obj_info.variables[column]
             if not variable.is_defined():
                 idx = primary_key_idx.get(id(column))
@@ -666,8 +1524,12 @@ class Store(object):
             self._set_values(obj_info, missing_columns,
                              result, result.get_one())
 
+        obj_info.pop("changed_columns", None)
+
     def _validate_alive(self, obj_info):
         """Perform cache validation for the given obj_info."""
+        if self._implicit_flush_block_count == 0:
+            self.flush(obj_info)
         where = compare_columns(obj_info.cls_info.primary_key,
                                 obj_info["primary_vars"])
         result = self._connection.execute(Select(SQLRaw("1"), where))
@@ -675,15 +1537,16 @@ class Store(object):
             raise LostObjectError("Object is not in the database anymore")
         obj_info.pop("invalidated", None)
 
-    def _load_object(self, cls_info, result, values):
+    def _load_object(self, cls_info, result, values, cache_row=True):
         # _set_values() need the cls_info columns for the class of the
         # actual object, not from a possible wrapper (e.g. an alias).
         cls = cls_info.cls
         cls_info = get_cls_info(cls)
 
-        # Prepare cache key.
+        # Prepare cache key.  Values are only given for eager columns,
+        # since lazy ones aren't selected.
         primary_vars = []
-        columns = cls_info.columns
+        columns = cls_info.eager_columns
 
         for value in values:
             if value is not None:
@@ -694,23 +1557,33 @@ class Store(object):
             # rows are represented like that.
             return None
 
-        for i in cls_info.primary_key_pos:
+        for i in cls_info.eager_primary_key_pos:
             value = values[i]
-            variable = columns[i].variable_factory(value=value, from_db=True)
+            if value is None:
+                variable = columns[i].variable_factory(value=None,
+                                                       from_db=True)
+            else:
+                variable = columns[i].variable_factory()
+                result.set_variable(variable, value)
             primary_vars.append(variable)
 
         # Lookup cache.
         primary_values = tuple(var.get(to_db=True) for var in primary_vars)
         obj_info = self._alive.get((cls, primary_values))
 
+        if self._row_cache is not None and cache_row:
+            self._cache_row(cls_info, primary_values, result, values)
+
         if obj_info is not None:
+            self._stats["load_hits"] += 1
+            self._check_epoch(obj_info)
             # Found object in cache, and it must be valid since the
             # primary key was extracted from result values.
             obj_info.pop("invalidated", None)
 
             # Take that chance and fill up any undefined variables
             # with fresh data, since we got it anyway.
-            self._set_values(obj_info, cls_info.columns, result,
+            self._set_values(obj_info, columns, result,
                              values, keep_defined=True)
 
             # We're not sure if the obj is still in memory at this
@@ -718,13 +1591,24 @@ class Store(object):
             obj = self._get_object(obj_info)
         else:
             # Nothing found in the cache. Build everything from the ground.
+            self._stats["load_misses"] += 1
             obj = cls.__new__(cls)
 
-            obj_info = get_obj_info(obj)
-            obj_info["store"] = self
+            if self._compact_objects:
+                obj_info = self._build_compact_obj_info(obj, cls_info,
+                                                        result, values)
+                obj_info["store"] = self
+            else:
+                obj_info = get_obj_info(obj)
+                obj_info["store"] = self
 
-            self._set_values(obj_info, cls_info.columns, result, values,
-                             replace_unknown_lazy=True)
+                self._set_values(obj_info, columns, result, values,
+                                 replace_unknown_lazy=True)
+
+            # Lazy columns are loaded when first touched.
+            for column in cls_info.columns:
+                if id(column) in cls_info.lazy_groups:
+                    obj_info.variables[column].set(AutoReload)
 
             self._add_to_alive(obj_info)
             self._enable_change_notification(obj_info)
@@ -734,6 +1618,167 @@ class Store(object):
 
         return obj
 
+    def _load_untracked_object(self, cls_info, result, values):
+        """Build a detached, read-only object from C{values}.
+
+        The object isn't added to the store, and gets a compact
+        L{ObjectInfo} with no events hooked.
+        """
+        cls = cls_info.cls
+        cls_info = get_cls_info(cls)
+        if cls_info.lazy_groups:
+            raise FeatureError("Untracked results can't have lazy columns")
+
+        for value in values:
+            if value is not None:
+                break
+        else:
+            # A row full of NULLs, as in _load_object().
+            return None
+
+        obj = cls.__new__(cls)
+        obj_info = self._build_compact_obj_info(obj, cls_info, result, values)
+        obj_info["read_only"] = True
+        self._run_hook(obj_info, "__storm_loaded__")
+        return obj
+
+    def _build_compact_obj_info(self, obj, cls_info, result, values):
+        """Build a compact L{ObjectInfo} for C{obj}, loaded with C{values}.
+
+        The values of the eager columns are converted as they'd be by
+        their variables, and kept in a row.  Variables are created right
+        away only for columns with mutable values, whose changes must be
+        tracked.
+        """
+        converters = self._get_row_converters(cls_info)
+        row = []
+        mutable_columns = []
+        mutable_values = []
+        for column, converter, value in zip(cls_info.eager_columns,
+                                            converters, values):
+            if isinstance(converter, MutableValueVariable):
+                mutable_columns.append(column)
+                mutable_values.append(value)
+                value = Undef
+            elif value is not None:
+                result.set_variable(converter, value)
+                value = converter.get_state()[1]
+            row.append(value)
+        obj_info = ObjectInfo(obj, tuple(row), converters)
+        set_obj_info(obj, obj_info)
+        if mutable_columns:
+            self._set_values(obj_info, mutable_columns, result,
+                             mutable_values)
+        return obj_info
+
+    def _get_row_converters(self, cls_info):
+        """Return variables of the eager columns of C{cls_info}.
+
+        They're used to convert values loaded from the database, without
+        creating variables for every row.
+        """
+        converters = self._row_converters.get(cls_info.cls)
+        if converters is None:
+            converters = tuple(column.variable_factory()
+                               for column in cls_info.eager_columns)
+            self._row_converters[cls_info.cls] = converters
+        return converters
+
+    def _cache_row(self, cls_info, primary_values, result, values):
+        """Put a row in the row cache, unless it was written lately.
+
+        Rows written in the current transaction may not be seen by other
+        stores yet.  Values are converted by the variables of their
+        columns, and cached in the form kept as variable state.
+        """
+        if self._is_row_written(cls_info, primary_values):
+            return
+        row = []
+        for converter, value in zip(self._get_row_converters(cls_info),
+                                    values):
+            if value is not None:
+                result.set_variable(converter, value)
+                value = converter.get_state()[1]
+            row.append(value)
+        self._row_cache.set(cls_info, primary_values, row,
+                            since=self._row_cache_clock)
+
+    def _is_row_written(self, cls_info, primary_values):
+        """Tell if a row was written in the current transaction.
+
+        Such rows are neither taken from nor put in the row cache, which
+        holds them as committed, until the transaction ends.
+        """
+        table = cls_info.table
+        return (not isinstance(table, Table) or
+                table.name in self._written_tables or
+                (table.name, primary_values) in self._written_rows)
+
+    def _forget_row(self, obj_info, written=True):
+        """Drop the row of C{obj_info} from the row cache.
+
+        @param written: Whether the row is being written, in which case
+            it's not cached again until the transaction ends.
+        """
+        table = obj_info.cls_info.table
+        primary_vars = obj_info.get("primary_vars")
+        if primary_vars is not None and isinstance(table, Table):
+            primary_values = tuple(var.get(to_db=True)
+                                   for var in primary_vars)
+            if written:
+                self._written_rows.add((table.name, primary_values))
+            self._row_cache.invalidate(table.name, primary_values)
+
+    def _forget_table(self, table):
+        """Drop all rows of C{table} from the row cache, when bulk updated.
+        """
+        if self._row_cache is not None and isinstance(table, Table):
+            self._written_tables.add(table.name)
+            self._row_cache.invalidate_table(table.name)
+
+    def _bump_table_version(self, table):
+        """Note that rows of C{table} were inserted, updated or deleted.
+
+        Results cached with L{ResultSet.cache_results} which depend on
+        the table are discarded when next looked up.  Tables which
+        aren't known by name invalidate all results.
+        """
+        if isinstance(table, Table):
+            name = table.name
+        elif isinstance(table, basestring):
+            name = table
+        else:
+            name = None
+        self._table_versions[name] = self._table_versions.get(name, 0) + 1
+
+    def _get_cached_results(self, key):
+        """Return the results cached for C{key}, or None if stale."""
+        entry = self._result_cache.get(key)
+        if entry is None:
+            return None
+        versions, expiration, results = entry
+        stale = expiration is not None and expiration < time.time()
+        for name, version in versions:
+            if self._table_versions.get(name, 0) != version:
+                stale = True
+        if stale:
+            del self._result_cache[key]
+            return None
+        return results
+
+    def _set_cached_results(self, key, tables, ttl, results):
+        """Cache C{results} for C{key}, until any of C{tables} changes."""
+        versions = tuple((name, self._table_versions.get(name, 0))
+                         for name in list(tables) + [None])
+        if ttl is None:
+            expiration = None
+        else:
+            expiration = time.time() + ttl
+        self._result_cache.pop(key, None)
+        self._result_cache[key] = (versions, expiration, results)
+        while len(self._result_cache) > self._result_cache_size:
+            self._result_cache.popitem(last=False)
+
     def _get_object(self, obj_info):
         """Return object for obj_info, rebuilding it if it's dead."""
         obj = obj_info.get_obj()
@@ -762,8 +1807,13 @@ class Store(object):
             raise LostObjectError("Can't obtain values from the database "
                                   "(object got removed?)")
         obj_info.pop("invalidated", None)
+        variables = obj_info.variables
         for column, value in zip(columns, values):
-            variable = obj_info.variables[column]
+            if keep_defined and column not in variables:
+                # Values of compact objects without a variable are
+                # always defined.
+                continue
+            variable = variables[column]
             lazy_value = variable.get_lazy()
             is_unknown_lazy = not (lazy_value is None or
                                    lazy_value is AutoReload)
@@ -794,6 +1844,18 @@ class Store(object):
         if obj_info not in self._dirty:
             self._dirty[obj_info] = obj_info.get_obj()
             obj_info["sequence"] = self._sequence = self._sequence + 1
+            name = getattr(obj_info.cls_info.table, "name", None)
+            self._dirty_versions[name] = self._dirty_versions.get(name, 0) + 1
+
+    def _get_dirty_version(self, classes):
+        """Return a value which changes when objects of C{classes} are dirtied.
+
+        Objects of other classes sharing the same tables count too.
+        """
+        return tuple(
+            self._dirty_versions.get(
+                getattr(get_cls_info(cls).table, "name", None), 0)
+            for cls in classes)
 
     def _set_clean(self, obj_info):
         self._dirty.pop(obj_info, None)
@@ -820,35 +1882,88 @@ class Store(object):
         objects.
         """
         cls_info = obj_info.cls_info
+        alive = self._alive_by_class.get(cls_info.cls)
+        if alive is None:
+            alive = self._alive_by_class[cls_info.cls] = WeakValueDictionary()
         old_primary_vars = obj_info.get("primary_vars")
         if old_primary_vars is not None:
             old_primary_values = tuple(
                 var.get(to_db=True) for var in old_primary_vars)
             self._alive.pop((cls_info.cls, old_primary_values), None)
+            alive.pop(old_primary_values, None)
         new_primary_vars = tuple(variable.copy()
                                  for variable in obj_info.primary_vars)
         new_primary_values = tuple(
             var.get(to_db=True) for var in new_primary_vars)
+        if self._negative_cache:
+            # Classes sharing the same table may find this object now.
+            self._negative_cache.pop(new_primary_values, None)
         self._alive[cls_info.cls, new_primary_values] = obj_info
+        alive[new_primary_values] = obj_info
+        if hasattr(cls_info.cls, "__storm_invalidated__"):
+            if old_primary_vars is not None:
+                self._hooked_alive.pop((cls_info.cls, old_primary_values),
+                                       None)
+            self._hooked_alive[cls_info.cls, new_primary_values] = obj_info
         obj_info["primary_vars"] = new_primary_vars
+        obj_info["epoch"] = self._epoch
+        for column in cls_info.unique_columns:
+            self._index_unique_column(obj_info, column)
         self._cache.add(obj_info)
 
     def _remove_from_alive(self, obj_info):
         """Remove an object from the cache.
 
         This method is only called for objects that were explicitly
-        deleted and flushed.  Objects that are unused will get removed
-        from the cache dictionary automatically by their weakref callbacks.
+        deleted and flushed, or evicted.  Objects that are unused will get
+        removed from the cache dictionary automatically by their weakref
+        callbacks.
         """
         primary_vars = obj_info.get("primary_vars")
         if primary_vars is not None:
             self._cache.remove(obj_info)
             primary_values = tuple(var.get(to_db=True) for var in primary_vars)
             del self._alive[obj_info.cls_info.cls, primary_values]
+            del self._alive_by_class[obj_info.cls_info.cls][primary_values]
+            self._hooked_alive.pop((obj_info.cls_info.cls, primary_values),
+                                   None)
             del obj_info["primary_vars"]
+            del obj_info["epoch"]
+            unique_keys = obj_info.pop("unique_keys", None)
+            if unique_keys:
+                for key in unique_keys.itervalues():
+                    if self._unique_alive.get(key) is obj_info:
+                        del self._unique_alive[key]
+
+    def _index_unique_column(self, obj_info, column):
+        """Update the unique index with the current value of C{column}.
+
+        The object is indexed by the values of its unique columns as
+        last seen in the database, kept in the C{"unique_keys"} item of
+        C{obj_info}.  Undefined and None values aren't indexed.
+        """
+        unique_keys = obj_info.get("unique_keys")
+        if unique_keys is None:
+            unique_keys = obj_info["unique_keys"] = {}
+        old_key = unique_keys.pop(column, None)
+        if old_key is not None and self._unique_alive.get(old_key) is obj_info:
+            del self._unique_alive[old_key]
+        variable = obj_info.variables[column]
+        if variable.is_defined():
+            value = variable.get(to_db=True)
+            if value is not None:
+                key = (obj_info.cls_info.cls, column, value)
+                self._unique_alive[key] = obj_info
+                unique_keys[column] = key
 
-    def _iter_alive(self):
-        return self._alive.values()
+    def _iter_alive(self, cls=None):
+        """Return alive objects, only those of C{cls} if it's given."""
+        if cls is None:
+            return self._alive.values()
+        alive = self._alive_by_class.get(cls)
+        if alive is None:
+            return []
+        return alive.values()
 
     def _enable_change_notification(self, obj_info):
         obj_info.event.emit("start-tracking-changes", self._event)
@@ -860,10 +1975,27 @@ class Store(object):
 
     def _variable_changed(self, obj_info, variable,
                           old_value, new_value, fromdb):
+        if fromdb and obj_info.cls_info.unique_columns:
+            # Values coming from the database keep the unique index
+            # up-to-date, while others get there when flushed.
+            column = variable.column
+            for unique_column in obj_info.cls_info.unique_columns:
+                if unique_column is column:
+                    if "primary_vars" in obj_info:
+                        self._index_unique_column(obj_info, column)
+                    break
+
         # The fromdb check makes sure that values coming from the
         # database don't mark the object as dirty again.
         # XXX The fromdb check is untested. How to test it?
         if not fromdb:
+            # Remember the changed columns, so that flushing doesn't
+            # have to look at every variable of the object.
+            changed_columns = obj_info.get("changed_columns")
+            if changed_columns is None:
+                obj_info["changed_columns"] = set((variable.column,))
+            else:
+                changed_columns.add(variable.column)
             if new_value is not Undef and new_value is not AutoReload:
                 if obj_info.get("invalidated"):
                     # This might be a previously alive object being
@@ -886,24 +2018,28 @@ class Store(object):
         set to lazy values when they're accessed.  It will first flush
         the store, and then set all variables set to AutoReload to
         their database values.
+
+        Variables of lazy columns are only loaded along with the other
+        ones in the same lazy group, and variables of eager columns are
+        never loaded along with lazy ones.
         """
         if lazy_value is not AutoReload and not isinstance(lazy_value, Expr):
             # It's not something we handle.
             return
 
-        # XXX This will do it for now, but it should really flush
-        #     just this single object and ones that it depends on.
-        #     _flush_one() doesn't consider dependencies, so it may
-        #     not be used directly.  Maybe allow flush(obj)?
         if self._implicit_flush_block_count == 0:
-            self.flush()
+            self.flush(obj_info)
 
+        lazy_groups = obj_info.cls_info.lazy_groups
+        lazy_group = lazy_groups.get(id(variable.column))
         autoreload_columns = []
         for column in obj_info.cls_info.columns:
-            if obj_info.variables[column].get_lazy() is AutoReload:
+            if (obj_info.variables[column].get_lazy() is AutoReload and
+                lazy_groups.get(id(column)) == lazy_group):
                 autoreload_columns.append(column)
 
         if autoreload_columns:
+            self._stats["lazy_resolutions"] += 1
             where = compare_columns(obj_info.cls_info.primary_key,
                                     obj_info["primary_vars"])
             result = self._connection.execute(
@@ -912,6 +2048,37 @@ class Store(object):
                              result, result.get_one())
 
 
+class _RowCacheResult(object):
+    """Stand-in for a result class, for rows taken from the row cache.
+
+    Cached values were already converted by the variables of their
+    columns, so they're restored as variable state, not parsed again.
+    """
+
+    @staticmethod
+    def set_variable(variable, value):
+        variable.set_state((Undef, value))
+        # Emit what Variable.set() would, and let mutable variables
+        # detect changes of the value got.
+        value = variable.get()
+        if variable.event is not None:
+            variable.event.emit("changed", variable, None, value, True)
+
+
+class Epoch(object):
+    """Period between two invalidations of all the objects in a store.
+
+    Alive objects record the epoch in which they were last known to be
+    valid, and are invalidated when found to belong to an expired one.
+    """
+
+    __slots__ = ("store", "expired")
+
+    def __init__(self, store):
+        self.store = store
+        self.expired = False
+
+
 class ResultSet(object):
     """The representation of the results of a query.
 
@@ -936,6 +2103,10 @@ class ResultSet(object):
         self._distinct = False
         self._group_by = Undef
         self._having = Undef
+        self._prefetch = ()
+        self._cache_results = False
+        self._cache_ttl = None
+        self._track = True
 
     def copy(self):
         """Return a copy of this ResultSet object, with the same configuration.
@@ -948,7 +2119,7 @@ class ResultSet(object):
             result_set._select = copy(self._select)
         return result_set
 
-    def config(self, distinct=None, offset=None, limit=None):
+    def config(self, distinct=None, offset=None, limit=None, track=None):
         """Configure this result object in-place. All parameters are optional.
 
         @param distinct: If True, enables usage of the DISTINCT keyword in
@@ -958,6 +2129,13 @@ class ResultSet(object):
             from the result set.
         @param limit: Limit the number of objects retrieved from the
             result set.
+        @param track: If False, objects found are built detached from
+            the store and read-only: they aren't kept in the store nor
+            in its cache, and setting their attributes raises
+            L{storm.exceptions.ReadOnlyError}.  This saves time and memory when many
+            objects are only read.  Their references aren't followed,
+            and they can't be prefetched, memoized with
+            L{cache_results}, or have lazy columns.
 
         @return: self (not a copy).
         """
@@ -968,8 +2146,111 @@ class ResultSet(object):
             self._offset = offset
         if limit is not None:
             self._limit = limit
+        if track is not None:
+            self._track = track
+        return self
+
+    def prefetch(self, *paths):
+        """Load referenced objects of all results when iterating.
+
+        Without prefetching, touching a reference of each object in
+        the result set runs one query per object.  With it, after the
+        main query runs the referenced objects are loaded at once, with
+        one query per reference, and linked to the objects referring
+        to them.  For example::
+
+            for employee in store.find(Employee).prefetch(Employee.company):
+                print employee.company.name # No query here.
+
+        L{ReferenceSet}s may be prefetched as well, in which case their
+        members are loaded with a single query for all results, and
+        iterating, counting or calling C{any()} on the bound reference
+        set of each result won't run a query until the set is changed,
+        or anything is flushed or invalidated in the store.
+
+        @param paths: L{Reference}s or L{ReferenceSet}s of the classes
+            being found, or tuples of them to be followed in order from
+            them, such as C{(Employee.company, Company.owner)}.
+
+        @return: self (not a copy).
+        """
+        for path in paths:
+            if type(path) is not tuple:
+                path = (path,)
+            self._prefetch += (path,)
+        return self
+
+    def cache_results(self, ttl=None):
+        """Memoize the results of the query in the store.
+
+        Iterating over the result set or calling L{values} on it runs
+        the query once, and then takes the results from memory until
+        the store writes to any of the tables used by the query, or
+        the time to live expires.  Only the primary keys of the objects
+        found are kept, so iterating takes the objects from memory too
+        while they're alive, and loads the others at once with
+        L{Store.get_many}.
+
+        Changes made to the database by other connections aren't seen
+        until the cached results expire.
+
+        @param ttl: Number of seconds for which results are kept, or
+            None to keep them until the tables change.
+        @raise FeatureError: Raised for tuple or expression finds.
+
+        @return: self (not a copy).
+        """
+        if self._find_spec.default_cls_info is None:
+            raise FeatureError("cache_results() can't be used with tuple "
+                               "or expression finds")
+        self._cache_results = True
+        self._cache_ttl = ttl
         return self
 
+    def _get_results(self, select, run):
+        """Return the results of C{select}, from the cache if possible.
+
+        @param run: Function called with the select when it has to be
+            run, returning the list of results to be cached.
+        """
+        store = self._store
+        state = State()
+        state.seen_tables = set()
+        statement = store._connection.compile(select, state)
+        params = tuple(param.get(to_db=True)
+                       if isinstance(param, Variable) else param
+                       for param in state.parameters)
+        key = (statement, params)
+        try:
+            hash(key)
+        except TypeError:
+            # Some parameters, such as lists, can't be cache keys.
+            return run(select)
+        results = store._get_cached_results(key)
+        if results is None:
+            results = run(select)
+            store._set_cached_results(key, state.seen_tables,
+                                      self._cache_ttl, results)
+        return results
+
+    def _prefetch_paths(self, items):
+        """Prefetch the configured reference paths for the given items."""
+        objects = []
+        for item in items:
+            if type(item) is tuple:
+                objects.extend(item)
+            else:
+                objects.append(item)
+        for path in self._prefetch:
+            path_objects = objects
+            for reference in path:
+                cls = reference._cls
+                path_objects = [obj for obj in path_objects
+                                if isinstance(obj, cls)]
+                if not path_objects:
+                    break
+                path_objects = reference._prefetch(self._store, path_objects)
+
     def _get_select(self):
         if self._select is not Undef:
             if self._order_by is not Undef:
@@ -986,14 +2267,47 @@ class ResultSet(object):
                       having=self._having)
 
     def _load_objects(self, result, values):
-        return self._find_spec.load_objects(self._store, result, values)
+        return self._find_spec.load_objects(self._store, result, values,
+                                            self._track)
 
     def __iter__(self):
         """Iterate the results of the query.
         """
+        if not self._track and (self._prefetch or self._cache_results):
+            raise FeatureError("Untracked results can't be prefetched "
+                               "or cached")
+        if self._cache_results:
+            for item in self._iter_cached():
+                yield item
+            return
         result = self._store._connection.execute(self._get_select())
-        for values in result:
-            yield self._load_objects(result, values)
+        if not self._prefetch:
+            for values in result:
+                yield self._load_objects(result, values)
+            return
+        items = [self._load_objects(result, values) for values in result]
+        self._prefetch_paths(items)
+        for item in items:
+            yield item
+
+    def _iter_cached(self):
+        """Iterate the results, memoizing their primary keys."""
+        items = []
+        def run(select):
+            result = self._store._connection.execute(select)
+            items.extend(self._load_objects(result, values)
+                         for values in result)
+            return [tuple(variable.get()
+                          for variable in get_obj_info(obj)["primary_vars"])
+                    for obj in items]
+        keys = self._get_results(self._get_select(), run)
+        if not items and keys:
+            cls = self._find_spec.default_cls_info.cls
+            items = [obj for obj in self._store.get_many(cls, keys)
+                     if obj is not None]
+        if self._prefetch:
+            self._prefetch_paths(items)
+        return items
 
     def __getitem__(self, index):
         """Get an individual item by offset, or a range of items by slice.
@@ -1195,6 +2509,10 @@ class ResultSet(object):
         if self._select is not Undef:
             raise FeatureError("Removing isn't supported with "
                                "set expressions (unions, etc)")
+        self._store._generation += 1
+        self._store._forget_table(self._find_spec.default_cls_info.table)
+        self._store._bump_table_version(
+            self._find_spec.default_cls_info.table)
         result = self._store._connection.execute(
             Delete(self._where, self._find_spec.default_cls_info.table))
         return result.rowcount
@@ -1322,6 +2640,17 @@ class ResultSet(object):
             raise FeatureError("values() can't be used with set expressions")
         select = self._get_select()
         select.columns = columns
+        if self._cache_results:
+            run = lambda select: list(self._iter_values(select))
+            for values in self._get_results(select, run):
+                yield values
+            return
+        for values in self._iter_values(select):
+            yield values
+
+    def _iter_values(self, select):
+        """Run C{select} and iterate the values of its columns."""
+        columns = select.columns
         result = self._store._connection.execute(select)
         if len(columns) == 1:
             variable = columns[0].variable_factory()
@@ -1388,18 +2717,17 @@ class ResultSet(object):
         expr = Update(changes, self._where,
                       self._find_spec.default_cls_info.table)
         self._store.execute(expr, noresult=True)
+        self._store._forget_table(self._find_spec.default_cls_info.table)
 
         try:
             cached = self.cached()
         except CompileError:
-            # We are iterating through all objects in memory here, so
-            # check if the object type matches to avoid trying to
-            # invalidate a column that does not exist, on an unrelated
-            # object.
-            for obj_info in self._store._iter_alive():
-                if obj_info.cls_info is self._find_spec.default_cls_info:
-                    for column in changes:
-                        obj_info.variables[column].set(AutoReload)
+            # We are iterating through all objects of the class in
+            # memory here.
+            cls = self._find_spec.default_cls_info.cls
+            for obj_info in self._store._iter_alive(cls):
+                for column in changes:
+                    obj_info.variables[column].set(AutoReload)
         else:
             changes = changes.items()
             for obj in cached:
@@ -1436,10 +2764,11 @@ class ResultSet(object):
                 return obj_info.variables[column].get()
 
         objects = []
-        for obj_info in self._store._iter_alive():
+        cls = self._find_spec.default_cls_info.cls
+        for obj_info in self._store._iter_alive(cls):
             try:
-                if (obj_info.cls_info is self._find_spec.default_cls_info and
-                    (match is None or match(get_column))):
+                self._store._check_epoch(obj_info)
+                if match is None or match(get_column):
                     objects.append(self._store._get_object(obj_info))
             except LostObjectError:
                 pass # This may happen when resolving lazy values
@@ -1536,9 +2865,15 @@ class EmptyResultSet(object):
         result = EmptyResultSet(self._order_by)
         return result
 
-    def config(self, distinct=None, offset=None, limit=None):
+    def config(self, distinct=None, offset=None, limit=None, track=None):
         pass
 
+    def prefetch(self, *paths):
+        return self
+
+    def cache_results(self, ttl=None):
+        return self
+
     def __iter__(self):
         return
         yield None
@@ -1654,12 +2989,12 @@ class TableSet(object):
 
         @return: A L{ResultSet}.
         """
-        if self._store._implicit_flush_block_count == 0:
-            self._store.flush()
         find_spec = FindSpec(cls_spec)
         where = get_where_for_args(args, kwargs, find_spec.default_cls)
-        return self._store._result_set_factory(self._store, find_spec,
-                                               where, self._tables)
+        result_set = self._store._result_set_factory(self._store, find_spec,
+                                                     where, self._tables)
+        self._store._implicit_flush(result_set._get_select)
+        return result_set
 
 
 Store._result_set_factory = ResultSet
@@ -1701,7 +3036,7 @@ class FindSpec(object):
                 if isinstance(info, Column):
                     default_tables.append(info.table)
             else:
-                columns.extend(info.columns)
+                columns.extend(info.eager_columns)
                 default_tables.append(info.table)
         return columns, default_tables
 
@@ -1719,7 +3054,7 @@ class FindSpec(object):
                 return False
         return True
 
-    def load_objects(self, store, result, values):
+    def load_objects(self, store, result, values, track=True):
         objects = []
         values_start = values_end = 0
         for is_expr, info in self._cls_spec_info:
@@ -1729,9 +3064,13 @@ class FindSpec(object):
                     value=values[values_start], from_db=True)
                 objects.append(variable.get())
             else:
-                values_end += len(info.columns)
-                obj = store._load_object(info, result,
-                                         values[values_start:values_end])
+                values_end += len(info.eager_columns)
+                if track:
+                    obj = store._load_object(info, result,
+                                             values[values_start:values_end])
+                else:
+                    obj = store._load_untracked_object(
+                        info, result, values[values_start:values_end])
                 objects.append(obj)
             values_start = values_end
         if self.is_tuple:
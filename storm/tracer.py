@@ -195,6 +195,9 @@ class TimelineTracer(BaseStatementTracer):
     The timeline to use is obtained by calling the timeline_factory supplied to
     the constructor. This simple function takes no parameters and returns a
     timeline to use. If it returns None, the tracer is bypassed.
+
+    Statements run at once with L{Connection.execute_many} start one
+    action per list of parameters, and all of them are finished together.
     """
 
     def __init__(self, timeline_factory, prefix='SQL-'):
@@ -210,7 +213,7 @@ class TimelineTracer(BaseStatementTracer):
         super(TimelineTracer, self).__init__()
         self.timeline_factory = timeline_factory
         self.prefix = prefix
-        # Stores the action in progress in a given thread.
+        # Stores the actions in progress in a given thread.
         self.threadinfo = threading.local()
 
     def _expanded_raw_execute(self, connection, raw_cursor, statement):
@@ -219,16 +222,20 @@ class TimelineTracer(BaseStatementTracer):
             return
         connection_name = getattr(connection, 'name', '<unknown>')
         action = timeline.start(self.prefix + connection_name, statement)
-        self.threadinfo.action = action
+        if getattr(self.threadinfo, 'actions', None) is None:
+            self.threadinfo.actions = []
+        self.threadinfo.actions.append(action)
 
     def connection_raw_execute_success(self, connection, raw_cursor,
                                        statement, params):
 
-        # action may be None if the tracer was installed after the statement
-        # was submitted.
-        action = getattr(self.threadinfo, 'action', None)
-        if action is not None:
-            action.finish()
+        # actions may be missing if the tracer was installed after the
+        # statement was submitted.
+        actions = getattr(self.threadinfo, 'actions', None)
+        if actions:
+            for action in actions:
+                action.finish()
+            del actions[:]
 
     def connection_raw_execute_error(self, connection, raw_cursor,
                                      statement, params, error):
@@ -103,16 +103,9 @@ class Variable(object):
         None, no events will be emitted.
     """
 
-    _value = Undef
-    _lazy_value = Undef
-    _checkpoint_state = Undef
-    _allow_none = True
-    _validator = None
-    _validator_object_factory = None
-    _validator_attribute = None
-
-    column = None
-    event = None
+    __slots__ = ("_value", "_lazy_value", "_checkpoint_state", "_allow_none",
+                 "_validator", "_validator_object_factory",
+                 "_validator_attribute", "column", "event")
 
     def __init__(self, value=Undef, value_factory=Undef, from_db=False,
                  allow_none=True, column=None, event=None, validator=None,
@@ -143,8 +136,15 @@ class Variable(object):
         @param event: The event system to broadcast messages with. If
             not specified, then no events will be broadcast.
         """
-        if not allow_none:
-            self._allow_none = False
+        self._value = Undef
+        self._lazy_value = Undef
+        self._checkpoint_state = Undef
+        self._allow_none = bool(allow_none)
+        self._validator = None
+        self._validator_object_factory = None
+        self._validator_attribute = None
+        self.column = None
+        self.event = None
         if value is not Undef:
             self.set(value, from_db)
         elif value_factory is not Undef:
@@ -290,6 +290,7 @@ class Variable(object):
     def copy(self):
         """Make a new copy of this Variable with the same internal state."""
         variable = self.__class__.__new__(self.__class__)
+        Variable.__init__(variable)
         variable.set_state(self.get_state())
         return variable
 
@@ -546,7 +547,7 @@ class MutableValueVariable(Variable):
     we have to synchronize the content of the variable when the store is
     flushing current objects, to check if the state has changed.
     """
-    __slots__ = ("_event_system")
+    __slots__ = ("_event_system",)
 
     def __init__(self, *args, **kwargs):
         self._event_system = None
@@ -614,6 +615,7 @@ class EncodedValueVariable(MutableValueVariable):
 
 
 class PickleVariable(EncodedValueVariable):
+    __slots__ = ()
 
     def _loads(self, value):
         return pickle.loads(value)
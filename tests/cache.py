@@ -1,8 +1,12 @@
 from unittest import defaultTestLoader
+import weakref
 
-from storm.properties import Int
-from storm.info import get_obj_info
-from storm.cache import Cache, GenerationalCache
+from storm.properties import Int, Pickle
+from storm.info import get_cls_info, get_obj_info
+from storm.cache import (
+    Cache, GenerationalCache, TwoQueueCache, MemoryCache, PartitionedCache,
+    RowCache)
+from storm import cache as cache_module
 
 from tests.helper import TestHelper
 
@@ -128,6 +132,26 @@ class BaseCacheTest(TestHelper):
         cache.set_size(0)
         self.assertEquals(cache.get_cached(), [])
 
+    def test_evictions(self):
+        """Objects dropped to respect the size limit are counted."""
+        cache = self.Cache(5)
+        self.assertEquals(cache.evictions, 0)
+        for obj_info in self.obj_infos:
+            cache.add(obj_info)
+        self.assertEquals(cache.evictions, 10 - len(cache.get_cached()))
+        cache.evictions = 0
+        cached = len(cache.get_cached())
+        cache.set_size(2)
+        self.assertEquals(cache.evictions, cached - len(cache.get_cached()))
+
+    def test_remove_isnt_eviction(self):
+        cache = self.Cache(5)
+        cache.add(self.obj1)
+        cache.remove(self.obj1)
+        cache.add(self.obj2)
+        cache.clear()
+        self.assertEquals(cache.evictions, 0)
+
     def test_fit_size(self):
         """
         A cache of size n can hold at least n objects.
@@ -190,6 +214,53 @@ class CacheTest(BaseCacheTest):
                           [5, 4, 3, 2, 1, 0, 9, 8, 7, 6])
 
 
+    def test_add_existing_becomes_most_recent(self):
+        cache = Cache(5)
+        for obj_info in self.obj_infos[:5]:
+            cache.add(obj_info)
+        cache.add(self.obj_infos[2])
+        cache.add(self.obj_infos[0])
+        self.assertEquals([obj_info.id for obj_info in cache.get_cached()],
+                          [0, 2, 4, 3, 1])
+
+        # The least recently used entry is dropped first.
+        cache.add(self.obj_infos[5])
+        self.assertEquals([obj_info.id for obj_info in cache.get_cached()],
+                          [5, 0, 2, 4, 3])
+
+    def test_remove_keeps_order(self):
+        cache = Cache(5)
+        for obj_info in self.obj_infos[:5]:
+            cache.add(obj_info)
+        self.assertEquals(cache.remove(self.obj_infos[2]), True)
+        self.assertEquals(cache.remove(self.obj_infos[2]), False)
+        self.assertEquals([obj_info.id for obj_info in cache.get_cached()],
+                          [4, 3, 1, 0])
+        cache.add(self.obj_infos[2])
+        self.assertEquals([obj_info.id for obj_info in cache.get_cached()],
+                          [2, 4, 3, 1, 0])
+
+    def test_clear_releases_objects(self):
+        obj = StubClass()
+        obj_info = get_obj_info(obj)
+        cache = Cache(5)
+        cache.add(obj_info)
+        obj_ref = weakref.ref(obj)
+        del obj
+        self.assertNotEquals(obj_ref(), None)
+        cache.clear()
+        self.assertEquals(obj_ref(), None)
+
+    def test_eviction_releases_objects(self):
+        obj = StubClass()
+        cache = Cache(1)
+        cache.add(get_obj_info(obj))
+        obj_ref = weakref.ref(obj)
+        del obj
+        cache.add(self.obj1)
+        self.assertEquals(obj_ref(), None)
+
+
 class TestGenerationalCache(BaseCacheTest):
 
     Cache = GenerationalCache
@@ -381,5 +452,509 @@ class TestGenerationalCache(BaseCacheTest):
         self.assertEqual(sorted(cache.get_cached()), [self.obj1, self.obj3])
 
 
+class TwoQueueCacheTest(BaseCacheTest):
+
+    Cache = TwoQueueCache
+
+    def test_size_and_fifo_behaviour(self):
+        cache = TwoQueueCache(5)
+        for obj_info in self.obj_infos:
+            cache.add(obj_info)
+        self.assertEquals([obj_info.id for obj_info in cache.get_cached()],
+                          [9, 8, 7, 6, 5])
+
+    def test_readded_object_is_promoted(self):
+        cache = TwoQueueCache(4)
+        for obj_info in self.obj_infos[:5]:
+            cache.add(obj_info)
+        # obj_infos[0] was dropped, but is remembered in the ghost queue.
+        cache.add(self.obj_infos[0])
+        self.assertEquals([obj_info.id for obj_info in cache.get_cached()],
+                          [0, 4, 3, 2])
+
+    def test_recent_object_is_promoted_when_used_again(self):
+        cache = TwoQueueCache(4)
+        cache.add(self.obj_infos[0])
+        cache.add(self.obj_infos[0])
+        for obj_info in self.obj_infos[1:5]:
+            cache.add(obj_info)
+        self.assertEquals([obj_info.id for obj_info in cache.get_cached()],
+                          [0, 4, 3, 2])
+
+    def test_objects_seen_once_arent_promoted(self):
+        cache = TwoQueueCache(4)
+        cache.add(self.obj_infos[0])
+        cache.add(self.obj_infos[0])
+        for obj_info in self.obj_infos[1:9]:
+            cache.add(obj_info)
+        # Only the object used twice remains, besides the newest entries.
+        self.assertEquals([obj_info.id for obj_info in cache.get_cached()],
+                          [0, 8, 7, 6])
+
+    def test_scan_resistance(self):
+        cache = TwoQueueCache(8)
+        hot = self.obj_infos[:4]
+        for obj_info in hot:
+            cache.add(obj_info)
+        for i in range(8):
+            cache.add(StubObjectInfo(50 + i))
+        # The hot objects got pushed out of the recent entries, and
+        # are promoted to the main queue when used again.
+        for obj_info in hot:
+            cache.add(obj_info)
+        # A scan of many objects only seen once.
+        for i in range(100):
+            cache.add(StubObjectInfo(100 + i))
+        cached = cache.get_cached()
+        for obj_info in hot:
+            self.assertTrue(obj_info in cached)
+
+    def test_main_queue_is_lru(self):
+        cache = TwoQueueCache(4)
+        for obj_info in self.obj_infos[:5]:
+            cache.add(obj_info)
+        cache.add(self.obj_infos[0]) # main=[0]
+        for obj_info in self.obj_infos[5:8]:
+            cache.add(obj_info)
+        cache.add(self.obj_infos[1]) # main=[1, 0]
+        cache.add(self.obj_infos[0]) # main=[0, 1]
+        self.assertEquals([obj_info.id for obj_info in cache.get_cached()][:2],
+                          [0, 1])
+
+    def test_reduce_max_size(self):
+        cache = TwoQueueCache(5)
+        for obj_info in self.obj_infos:
+            cache.add(obj_info)
+        cache.set_size(3)
+        self.assertEquals([obj_info.id for obj_info in cache.get_cached()],
+                          [9, 8, 7])
+
+    def test_clear_forgets_ghosts(self):
+        cache = TwoQueueCache(4)
+        for obj_info in self.obj_infos[:5]:
+            cache.add(obj_info)
+        cache.clear()
+        # obj_infos[0] is a recent entry again, rather than promoted.
+        cache.add(self.obj_infos[0])
+        for obj_info in self.obj_infos[5:9]:
+            cache.add(obj_info)
+        self.assertEquals([obj_info.id for obj_info in cache.get_cached()],
+                          [8, 7, 6, 5])
+
+    def test_ghosts_are_remembered_by_primary_key(self):
+        cache = TwoQueueCache(4)
+        obj = StubClass()
+        obj.id = 1
+        cache.add(get_obj_info(obj))
+        for obj_info in self.obj_infos[:4]:
+            cache.add(obj_info)
+        # The same row loaded again into a new object is promoted.
+        new_obj = StubClass()
+        new_obj.id = 1
+        cache.add(get_obj_info(new_obj))
+        self.assertEquals(cache.get_cached()[0].get_obj(), new_obj)
+
+
+class PickleClass(object):
+
+    __storm_table__ = "pickle_class"
+
+    id = Int(primary=True)
+    data = Pickle()
+
+
+class MemoryCacheTest(TestHelper):
+
+    def setUp(self):
+        super(MemoryCacheTest, self).setUp()
+        self.objs = []
+        self.obj_infos = []
+        for i in range(10):
+            obj = PickleClass()
+            obj.id = i
+            obj.data = []
+            self.objs.append(obj)
+            self.obj_infos.append(get_obj_info(obj))
+        self.cost = MemoryCache._get_cost(self.obj_infos[0])
+
+    def test_initially_empty(self):
+        cache = MemoryCache()
+        self.assertEquals(cache.get_cached(), [])
+        self.assertEquals(cache.get_used_size(), 0)
+
+    def test_add(self):
+        cache = MemoryCache()
+        cache.add(self.obj_infos[0])
+        cache.add(self.obj_infos[1])
+        cache.add(self.obj_infos[0])
+        self.assertEquals(cache.get_cached(),
+                          [self.obj_infos[0], self.obj_infos[1]])
+        self.assertEquals(cache.get_used_size(), self.cost * 2)
+
+    def test_cost_accounts_for_values(self):
+        obj = self.objs[0]
+        obj.data = ["x" * 1000 for i in range(100)]
+        self.assertTrue(MemoryCache._get_cost(self.obj_infos[0]) >
+                        self.cost + 100000)
+
+    def test_add_again_estimates_cost_again(self):
+        cache = MemoryCache()
+        cache.add(self.obj_infos[0])
+        self.objs[0].data = ["x" * 1000 for i in range(100)]
+        cache.add(self.obj_infos[0])
+        self.assertEquals(cache.get_used_size(),
+                          MemoryCache._get_cost(self.obj_infos[0]))
+        self.assertTrue(cache.get_used_size() > self.cost + 100000)
+
+    def test_add_again_keeps_cost_of_unchanged_object(self):
+        cache = MemoryCache()
+        cache.add(self.obj_infos[0])
+        # Changing the list in place doesn't change the variable.
+        self.objs[0].data.append("x" * 100000)
+        cache.add(self.obj_infos[0])
+        self.assertEquals(cache.get_used_size(), self.cost)
+
+    def test_add_again_after_remove_estimates_cost_again(self):
+        cache = MemoryCache()
+        cache.add(self.obj_infos[0])
+        cache.remove(self.obj_infos[0])
+        self.objs[0].data = ["x" * 1000 for i in range(100)]
+        cache.add(self.obj_infos[0])
+        self.assertEquals(cache.get_used_size(),
+                          MemoryCache._get_cost(self.obj_infos[0]))
+
+    def test_add_again_drops_object_larger_than_size(self):
+        cache = MemoryCache(self.cost * 5)
+        cache.add(self.obj_infos[0])
+        self.objs[0].data = ["x" * 1000 for i in range(100)]
+        cache.add(self.obj_infos[0])
+        self.assertEquals(cache.get_cached(), [])
+        self.assertEquals(cache.get_used_size(), 0)
+
+    def test_evicts_least_recently_used_until_under_size(self):
+        cache = MemoryCache(self.cost * 5)
+        for obj_info in self.obj_infos:
+            cache.add(obj_info)
+        self.assertEquals(cache.get_cached(), self.obj_infos[:4:-1])
+        self.assertEquals(cache.get_used_size(), self.cost * 5)
+
+    def test_large_object_evicts_several_small_ones(self):
+        cache = MemoryCache(self.cost * 5)
+        for obj_info in self.obj_infos[:5]:
+            cache.add(obj_info)
+        self.objs[5].data = "x" * (self.cost * 2)
+        cache.add(self.obj_infos[5])
+        cached = cache.get_cached()
+        self.assertEquals(cached[0], self.obj_infos[5])
+        self.assertTrue(len(cached) < 4)
+        self.assertTrue(cache.get_used_size() <= self.cost * 5)
+
+    def test_object_larger_than_size_isnt_held(self):
+        cache = MemoryCache(self.cost * 5)
+        cache.add(self.obj_infos[0])
+        self.objs[1].data = ["x" * 1000 for i in range(100)]
+        cache.add(self.obj_infos[1])
+        self.assertEquals(cache.get_cached(), [self.obj_infos[0]])
+
+    def test_holds_objects(self):
+        cache = MemoryCache()
+        obj_info = self.obj_infos[0]
+        cache.add(obj_info)
+        del self.objs[:]
+        self.assertEquals(obj_info.get_obj().id, 0)
+
+    def test_remove(self):
+        cache = MemoryCache()
+        cache.add(self.obj_infos[0])
+        cache.add(self.obj_infos[1])
+        self.assertEquals(cache.remove(self.obj_infos[0]), True)
+        self.assertEquals(cache.remove(self.obj_infos[0]), False)
+        self.assertEquals(cache.get_cached(), [self.obj_infos[1]])
+        self.assertEquals(cache.get_used_size(), self.cost)
+
+    def test_clear(self):
+        cache = MemoryCache()
+        cache.add(self.obj_infos[0])
+        cache.clear()
+        self.assertEquals(cache.get_cached(), [])
+        self.assertEquals(cache.get_used_size(), 0)
+
+    def test_evictions(self):
+        cache = MemoryCache(self.cost * 5)
+        for obj_info in self.obj_infos:
+            cache.add(obj_info)
+        cache.remove(self.obj_infos[9])
+        self.assertEquals(cache.evictions, 5)
+
+    def test_reduce_size(self):
+        cache = MemoryCache()
+        for obj_info in self.obj_infos:
+            cache.add(obj_info)
+        cache.set_size(self.cost * 3)
+        self.assertEquals(cache.get_cached(), self.obj_infos[:6:-1])
+
+    def test_size_zero(self):
+        cache = MemoryCache(0)
+        cache.add(self.obj_infos[0])
+        self.assertEquals(cache.get_cached(), [])
+        cache = MemoryCache()
+        cache.add(self.obj_infos[0])
+        cache.set_size(0)
+        self.assertEquals(cache.get_cached(), [])
+        self.assertEquals(cache.get_used_size(), 0)
+
+
+class PartitionedCacheTest(TestHelper):
+
+    def setUp(self):
+        super(PartitionedCacheTest, self).setUp()
+        self.stubs = [StubClass() for i in range(5)]
+        self.stub_infos = [get_obj_info(obj) for obj in self.stubs]
+        self.pickles = [PickleClass() for i in range(5)]
+        self.pickle_infos = [get_obj_info(obj) for obj in self.pickles]
+
+    def test_shared_cache(self):
+        cache = PartitionedCache(Cache(3))
+        for obj_info in self.stub_infos[:2] + self.pickle_infos[:2]:
+            cache.add(obj_info)
+        self.assertEquals(cache.get_cached(),
+                          [self.pickle_infos[1], self.pickle_infos[0],
+                           self.stub_infos[1]])
+        self.assertEquals(cache.evictions, 1)
+
+    def test_default_shared_cache(self):
+        cache = PartitionedCache()
+        self.assertEquals(type(cache._shared), Cache)
+
+    def test_quota(self):
+        cache = PartitionedCache(Cache(3))
+        cache.set_quota(StubClass, 2)
+        for obj_info in self.stub_infos + self.pickle_infos[:3]:
+            cache.add(obj_info)
+        self.assertEquals(cache.get_cached(),
+                          [self.stub_infos[4], self.stub_infos[3],
+                           self.pickle_infos[2], self.pickle_infos[1],
+                           self.pickle_infos[0]])
+        self.assertEquals(cache.evictions, 3)
+        cache.evictions = 0
+        self.assertEquals(cache.evictions, 0)
+
+    def test_quota_moves_cached_objects(self):
+        cache = PartitionedCache(Cache(10))
+        for obj_info in self.stub_infos[:3] + self.pickle_infos[:1]:
+            cache.add(obj_info)
+        cache.set_quota(StubClass, 2)
+        self.assertEquals(cache.get_cached(),
+                          [self.stub_infos[2], self.stub_infos[1],
+                           self.pickle_infos[0]])
+        cache.set_quota(StubClass, None)
+        self.assertEquals(cache.get_cached(),
+                          [self.stub_infos[2], self.stub_infos[1],
+                           self.pickle_infos[0]])
+        cache.add(self.stub_infos[3])
+        cache.add(self.stub_infos[4])
+        self.assertEquals(len(cache.get_cached()), 5)
+
+    def test_pin(self):
+        cache = PartitionedCache(Cache(2))
+        cache.add(self.stub_infos[0])
+        cache.pin(StubClass)
+        for obj_info in self.stub_infos[1:] + self.pickle_infos:
+            cache.add(obj_info)
+        self.assertEquals(sorted(map(id, cache.get_cached()[:5])),
+                          sorted(map(id, self.stub_infos)))
+        self.assertEquals(cache.get_cached()[5:],
+                          [self.pickle_infos[4], self.pickle_infos[3]])
+
+    def test_pin_holds_objects(self):
+        cache = PartitionedCache(Cache(2))
+        cache.pin(StubClass)
+        for obj_info in self.stub_infos:
+            cache.add(obj_info)
+        del self.stubs[:]
+        for obj_info in self.stub_infos:
+            self.assertNotEquals(obj_info.get_obj(), None)
+
+    def test_unpin(self):
+        cache = PartitionedCache(Cache(2))
+        cache.pin(StubClass)
+        cache.add(self.stub_infos[0])
+        cache.unpin(StubClass)
+        self.assertEquals(cache.get_cached(), [])
+        cache.add(self.stub_infos[0])
+        self.assertEquals(cache.get_cached(), [self.stub_infos[0]])
+
+    def test_unpin_with_quota(self):
+        cache = PartitionedCache(Cache(2))
+        cache.set_quota(StubClass, 3)
+        cache.pin(StubClass)
+        cache.add(self.stub_infos[0])
+        cache.unpin(StubClass)
+        self.assertEquals(cache.get_cached(), [self.stub_infos[0]])
+
+    def test_remove(self):
+        cache = PartitionedCache()
+        cache.pin(StubClass)
+        cache.set_quota(PickleClass, 2)
+        cache.add(self.stub_infos[0])
+        cache.add(self.pickle_infos[0])
+        self.assertEquals(cache.remove(self.stub_infos[0]), True)
+        self.assertEquals(cache.remove(self.stub_infos[0]), False)
+        self.assertEquals(cache.remove(self.pickle_infos[0]), True)
+        self.assertEquals(cache.remove(self.pickle_infos[0]), False)
+        self.assertEquals(cache.get_cached(), [])
+
+    def test_clear(self):
+        cache = PartitionedCache()
+        cache.pin(StubClass)
+        cache.set_quota(PickleClass, 2)
+        cache.add(self.stub_infos[0])
+        cache.add(self.pickle_infos[0])
+        cache.clear()
+        self.assertEquals(cache.get_cached(), [])
+        # The configuration is kept.
+        cache.add(self.stub_infos[0])
+        self.assertTrue(StubClass in cache._pinned)
+
+    def test_set_size(self):
+        cache = PartitionedCache(Cache(5))
+        cache.set_quota(StubClass, 2)
+        for obj_info in self.stub_infos + self.pickle_infos:
+            cache.add(obj_info)
+        cache.set_size(1)
+        self.assertEquals(cache.get_cached(),
+                          [self.stub_infos[4], self.stub_infos[3],
+                           self.pickle_infos[4]])
+
+
+class OtherStubClass(object):
+
+    __storm_table__ = "stub_class"
+
+    id = Int(primary=True)
+
+
+class FakeTime(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class RowCacheTest(TestHelper):
+
+    def setUp(self):
+        super(RowCacheTest, self).setUp()
+        self.cls_info = get_cls_info(StubClass)
+
+    def test_get_missing(self):
+        cache = RowCache()
+        self.assertEquals(cache.get(self.cls_info, (1,)), None)
+
+    def test_set_and_get(self):
+        cache = RowCache()
+        cache.set(self.cls_info, (1,), [1])
+        self.assertEquals(cache.get(self.cls_info, (1,)), (1,))
+
+    def test_other_class_with_same_table(self):
+        cache = RowCache()
+        cache.set(self.cls_info, (1,), (1,))
+        self.assertEquals(cache.get(get_cls_info(OtherStubClass), (1,)), None)
+
+    def test_size(self):
+        cache = RowCache(2)
+        cache.set(self.cls_info, (1,), (1,))
+        cache.set(self.cls_info, (2,), (2,))
+        cache.get(self.cls_info, (1,))
+        cache.set(self.cls_info, (3,), (3,))
+        self.assertEquals(cache.get(self.cls_info, (1,)), (1,))
+        self.assertEquals(cache.get(self.cls_info, (2,)), None)
+        self.assertEquals(cache.get(self.cls_info, (3,)), (3,))
+
+    def test_invalidate(self):
+        cache = RowCache()
+        cache.set(self.cls_info, (1,), (1,))
+        cache.set(self.cls_info, (2,), (2,))
+        cache.invalidate("stub_class", (1,))
+        self.assertEquals(cache.get(self.cls_info, (1,)), None)
+        self.assertEquals(cache.get(self.cls_info, (2,)), (2,))
+
+    def test_invalidate_table(self):
+        cache = RowCache()
+        cache.set(self.cls_info, (1,), (1,))
+        cache.set(get_cls_info(PickleClass), (1,), (1, None))
+        cache.invalidate_table("stub_class")
+        self.assertEquals(cache.get(self.cls_info, (1,)), None)
+        self.assertEquals(cache.get(get_cls_info(PickleClass), (1,)),
+                          (1, None))
+
+    def test_clear(self):
+        cache = RowCache()
+        cache.set(self.cls_info, (1,), (1,))
+        cache.clear()
+        self.assertEquals(cache.get(self.cls_info, (1,)), None)
+
+    def test_ttl(self):
+        fake_time = FakeTime()
+        self.addCleanup(setattr, cache_module, "time", cache_module.time)
+        cache_module.time = fake_time
+        cache = RowCache(ttl=10)
+        cache.set_ttl(PickleClass, 20)
+        cache.set(self.cls_info, (1,), (1,))
+        cache.set(get_cls_info(PickleClass), (1,), (1, None))
+        fake_time.now += 15
+        self.assertEquals(cache.get(self.cls_info, (1,)), None)
+        self.assertEquals(cache.get(get_cls_info(PickleClass), (1,)),
+                          (1, None))
+        fake_time.now += 10
+        self.assertEquals(cache.get(get_cls_info(PickleClass), (1,)), None)
+
+    def test_ttl_zero(self):
+        cache = RowCache()
+        cache.set_ttl(StubClass, 0)
+        cache.set(self.cls_info, (1,), (1,))
+        self.assertEquals(cache.get(self.cls_info, (1,)), None)
+
+    def test_set_since_invalidate(self):
+        cache = RowCache()
+        since = cache.get_clock()
+        cache.invalidate("stub_class", (1,))
+        cache.set(self.cls_info, (1,), (1,), since=since)
+        cache.set(self.cls_info, (2,), (2,), since=since)
+        self.assertEquals(cache.get(self.cls_info, (1,)), None)
+        self.assertEquals(cache.get(self.cls_info, (2,)), (2,))
+        cache.set(self.cls_info, (1,), (1,), since=cache.get_clock())
+        self.assertEquals(cache.get(self.cls_info, (1,)), (1,))
+
+    def test_set_since_invalidate_table(self):
+        cache = RowCache()
+        since = cache.get_clock()
+        cache.invalidate_table("stub_class")
+        cache.set(self.cls_info, (1,), (1,), since=since)
+        cache.set(get_cls_info(PickleClass), (1,), (1, None), since=since)
+        self.assertEquals(cache.get(self.cls_info, (1,)), None)
+        self.assertEquals(cache.get(get_cls_info(PickleClass), (1,)),
+                          (1, None))
+
+    def test_set_since_clear(self):
+        cache = RowCache()
+        since = cache.get_clock()
+        cache.clear()
+        cache.set(self.cls_info, (1,), (1,), since=since)
+        self.assertEquals(cache.get(self.cls_info, (1,)), None)
+
+    def test_set_since_forgotten_invalidation(self):
+        cache = RowCache(size=2)
+        since = cache.get_clock()
+        for i in range(101):
+            cache.invalidate("stub_class", (i,))
+        # The invalidation of key 0 is no longer known, so rows loaded
+        # since before the oldest known one are refused.
+        cache.set(self.cls_info, (0,), (0,), since=since)
+        self.assertEquals(cache.get(self.cls_info, (0,)), None)
+
+
 def test_suite():
     return defaultTestLoader.loadTestsFromName(__name__)
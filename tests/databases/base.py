@@ -27,13 +27,16 @@ import sys
 import os
 
 from storm.uri import URI
-from storm.expr import Select, Column, SQLToken, SQLRaw, Count, Alias
-from storm.variables import (Variable, PickleVariable, RawStrVariable,
+from storm.expr import (
+    Select, Insert, Column, SQLToken, SQLRaw, Count, Alias, Eq)
+from storm.variables import (Variable, IntVariable, PickleVariable,
+                             RawStrVariable, UnicodeVariable,
                              DecimalVariable, DateTimeVariable, DateVariable,
                              TimeVariable, TimeDeltaVariable)
 from storm.database import *
 from storm.xid import Xid
 from storm.event import EventSystem
+from storm.tracer import install_tracer, remove_tracer
 from storm.exceptions import (
     DatabaseError, DatabaseModuleError, ConnectionBlockedError,
     DisconnectionError, Error, OperationalError, ProgrammingError)
@@ -213,6 +216,80 @@ class DatabaseTest(object):
         result = self.connection.execute(select)
         self.assertEquals(result.get_one(), ("Title 30",))
 
+    def test_insert_many(self):
+        id_column = Column("id", SQLToken("test"))
+        title_column = Column("title", SQLToken("test"))
+        insert = Insert((title_column,), SQLToken("test"),
+                        primary_columns=(id_column,),
+                        values=[(u"Title 30",), (u"Title 40",)])
+        primary_variables = [(IntVariable(),), (IntVariable(),)]
+        results = self.connection.insert_many(insert, primary_variables)
+        self.assertEquals(len(results), 2)
+        titles = []
+        for variables, result in zip(primary_variables, results):
+            if variables[0].is_defined():
+                where = Eq(id_column, variables[0])
+            else:
+                where = result.get_insert_identity((id_column,), variables)
+            select = Select(title_column, where)
+            titles.append(self.connection.execute(select).get_one())
+        self.assertEquals(titles, [("Title 30",), ("Title 40",)])
+
+    def test_insert_many_with_primary_key(self):
+        id_column = Column("id", SQLToken("test"))
+        title_column = Column("title", SQLToken("test"))
+        insert = Insert((id_column, title_column), SQLToken("test"),
+                        primary_columns=(id_column,),
+                        values=[(30, u"Title 30"), (40, u"Title 40")])
+        primary_variables = [(IntVariable(30),), (IntVariable(40),)]
+        results = self.connection.insert_many(insert, primary_variables)
+        self.assertEquals(results, [None, None])
+        result = self.connection.execute("SELECT id, title FROM test "
+                                         "WHERE id > 20 ORDER BY id")
+        self.assertEquals(result.get_all(),
+                          [(30, "Title 30"), (40, "Title 40")])
+
+    def test_execute_many(self):
+        self.connection.execute_many("UPDATE test SET title=? WHERE id=?",
+                                     [(u"Title 11", 10), (u"Title 21", 20)])
+        result = self.connection.execute("SELECT id, title FROM test "
+                                         "ORDER BY id")
+        self.assertEquals(result.get_all(),
+                          [(10, "Title 11"), (20, "Title 21")])
+
+    def test_execute_many_with_variables(self):
+        self.connection.execute_many(
+            "UPDATE test SET title=? WHERE id=?",
+            [(UnicodeVariable(u"Title 11"), IntVariable(10)),
+             (UnicodeVariable(u"Title 21"), IntVariable(20))])
+        result = self.connection.execute("SELECT id, title FROM test "
+                                         "ORDER BY id")
+        self.assertEquals(result.get_all(),
+                          [(10, "Title 11"), (20, "Title 21")])
+
+    def test_execute_many_traces_each_params(self):
+        calls = []
+
+        class Tracer(object):
+            def connection_raw_execute(self, connection, raw_cursor,
+                                       statement, params):
+                calls.append(("execute", params))
+
+            def connection_raw_execute_success(self, connection, raw_cursor,
+                                               statement, params):
+                calls.append(("success", params))
+
+        tracer = Tracer()
+        install_tracer(tracer)
+        self.addCleanup(remove_tracer, tracer)
+        params_list = [(u"Title 11", 10), (u"Title 21", 20)]
+        self.connection.execute_many("UPDATE test SET title=? WHERE id=?",
+                                     params_list)
+        self.assertEquals(calls, [("execute", params_list[0]),
+                                  ("execute", params_list[1]),
+                                  ("success", params_list[0]),
+                                  ("success", params_list[1])])
+
     def test_datetime(self):
         value = datetime(1977, 4, 5, 12, 34, 56, 78)
         self.connection.execute("INSERT INTO datetime_test (dt) VALUES (?)",
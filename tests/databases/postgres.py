@@ -30,8 +30,8 @@ from storm.variables import ListVariable, IntVariable, Variable
 from storm.properties import Int
 from storm.exceptions import DisconnectionError, OperationalError
 from storm.expr import (Union, Select, Insert, Update, Alias, SQLRaw, State,
-                        Sequence, Like, Column, COLUMN)
-from storm.tracer import install_tracer, TimeoutError
+                        Sequence, Like, Column, COLUMN, Eq)
+from storm.tracer import install_tracer, remove_tracer, TimeoutError
 from storm.uri import URI
 
 # We need the info to register the 'type' compiler.  In normal
@@ -431,6 +431,36 @@ class PostgresTest(DatabaseTest, TestHelper):
         result = self.connection.execute("SELECT * FROM returning_test")
         self.assertEquals(result.get_one(), (123, 456))
 
+    def test_insert_many_matches_primary_keys_to_rows(self):
+        id_column = Column("id", "test")
+        title_column = Column("title", "test")
+        titles = ["Title %d" % i for i in range(30, 80, 10)]
+        insert = Insert((title_column,), "test",
+                        primary_columns=(id_column,),
+                        values=[(unicode(title),) for title in titles])
+        primary_variables = [(IntVariable(),) for title in titles]
+        statements = []
+
+        class Tracer(object):
+            def connection_raw_execute(self, connection, raw_cursor,
+                                       statement, params):
+                statements.append(statement)
+
+        tracer = Tracer()
+        install_tracer(tracer)
+        self.addCleanup(remove_tracer, tracer)
+        self.connection.insert_many(insert, primary_variables)
+        remove_tracer(tracer)
+
+        self.assertEquals(len(statements), 2)
+        self.assertEquals(len(set(variables[0].get()
+                                  for variables in primary_variables)), 5)
+        for variables, title in zip(primary_variables, titles):
+            self.assertTrue(variables[0].is_defined())
+            result = self.connection.execute(
+                Select(title_column, Eq(id_column, variables[0])))
+            self.assertEquals(result.get_one(), (title,))
+
     def test_wb_execute_insert_returning_not_used_with_old_postgres(self):
         """Shouldn't try to use RETURNING with PostgreSQL < 8.2."""
         column1 = Column("id1", "returning_test")
@@ -438,6 +438,7 @@ class StateTest(TestHelper):
     def test_attrs(self):
         self.assertEquals(self.state.parameters, [])
         self.assertEquals(self.state.auto_tables, [])
+        self.assertEquals(self.state.seen_tables, None)
         self.assertEquals(self.state.context, None)
 
     def test_push_pop(self):
@@ -1061,6 +1062,46 @@ class CompileTest(TestHelper):
         statement = compile(expr)
         self.assertEquals(statement, "ROW(column1, column2)")
 
+    def test_tuple(self):
+        expr = Tuple(column1, column2)
+        statement = compile(expr)
+        self.assertEquals(statement, "(column1, column2)")
+
+    def test_tuple_in(self):
+        expr = In(Tuple(column1, column2),
+                  [Tuple(Variable(1), Variable(2)),
+                   Tuple(Variable(3), Variable(4))])
+        state = State()
+        statement = compile(expr, state)
+        self.assertEquals(statement,
+                          "(column1, column2) IN ((?, ?), (?, ?))")
+        self.assertVariablesEqual(state.parameters,
+                                  [Variable(1), Variable(2),
+                                   Variable(3), Variable(4)])
+
+    def test_compare_columns_in(self):
+        expr = compare_columns_in([Column("a")], [[IntVariable(1)],
+                                                  [IntVariable(2)]])
+        state = State()
+        statement = compile(expr, state)
+        self.assertEquals(statement, "a IN (?, ?)")
+        self.assertVariablesEqual(state.parameters,
+                                  [IntVariable(1), IntVariable(2)])
+
+    def test_compare_columns_in_composite(self):
+        expr = compare_columns_in([Column("a"), Column("b")],
+                                  [[IntVariable(1), IntVariable(2)],
+                                   [IntVariable(3), IntVariable(4)]])
+        state = State()
+        statement = compile(expr, state)
+        self.assertEquals(statement, "(a, b) IN ((?, ?), (?, ?))")
+        self.assertVariablesEqual(state.parameters,
+                                  [IntVariable(1), IntVariable(2),
+                                   IntVariable(3), IntVariable(4)])
+
+    def test_compare_columns_in_empty(self):
+        self.assertEquals(compare_columns_in([Column("a")], []), False)
+
     def test_variable(self):
         expr = Variable("value")
         state = State()
@@ -1619,6 +1660,14 @@ class CompileTest(TestHelper):
         self.assertEquals(state.parameters, [])
         self.assertEquals(expr.compile_cache, '"table 1"')
 
+    def test_table_seen_tables(self):
+        expr = Select(column1, In(column2, Select(column3, tables=Table("t2"))),
+                      tables=Table("t1"))
+        state = State()
+        state.seen_tables = set()
+        compile(expr, state)
+        self.assertEquals(state.seen_tables, set(["t1", "t2"]))
+
     def test_alias(self):
         expr = Alias(Table(table1), "name")
         state = State()
@@ -26,6 +26,7 @@ from storm.properties import Property
 from storm.variables import Variable
 from storm.expr import Undef, Select, compile
 from storm.info import *
+from storm.info import LazyVariables
 
 from tests.helper import TestHelper
 
@@ -168,6 +169,44 @@ class ClassInfoTest(TestHelper):
         cls_info = ClassInfo(Class)
         self.assertEquals(cls_info.primary_key_pos, (2, 0))
 
+    def test_without_lazy_columns(self):
+        self.assertEquals(self.cls_info.lazy_groups, {})
+        self.assertTrue(self.cls_info.eager_columns is self.cls_info.columns)
+        self.assertEquals(self.cls_info.eager_primary_key_pos,
+                          self.cls_info.primary_key_pos)
+
+    def test_lazy_columns(self):
+        class Class(object):
+            __storm_table__ = "table"
+            prop1 = Property("column1", variable_kwargs={"lazy_group": 1})
+            prop2 = Property("column2", primary=True)
+            prop3 = Property("column3")
+        cls_info = ClassInfo(Class)
+        self.assertEquals(cls_info.lazy_groups, {id(Class.prop1): 1})
+        self.assertEquals(len(cls_info.eager_columns), 2)
+        self.assertTrue(cls_info.eager_columns[0] is Class.prop2)
+        self.assertTrue(cls_info.eager_columns[1] is Class.prop3)
+        self.assertEquals(cls_info.primary_key_pos, (1,))
+        self.assertEquals(cls_info.eager_primary_key_pos, (0,))
+
+    def test_unique_columns(self):
+        class Class(object):
+            __storm_table__ = "table"
+            prop1 = Property("column1", primary=True,
+                             variable_kwargs={"unique": True})
+            prop2 = Property("column2", variable_kwargs={"unique": True})
+            prop3 = Property("column3")
+        cls_info = ClassInfo(Class)
+        self.assertEquals(len(cls_info.unique_columns), 1)
+        self.assertTrue(cls_info.unique_columns[0] is Class.prop2)
+
+    def test_lazy_primary_key(self):
+        class Class(object):
+            __storm_table__ = "table"
+            prop1 = Property("column1", primary=True,
+                             variable_kwargs={"lazy_group": 1})
+        self.assertRaises(ClassInfoError, ClassInfo, Class)
+
 
 class ObjectInfoTest(TestHelper):
 
@@ -236,6 +275,49 @@ class ObjectInfoTest(TestHelper):
         self.assertEquals(len(self.obj_info.primary_vars),
                           len(self.cls_info.primary_key))
 
+    def create_compact_obj_info(self, obj, row):
+        converters = tuple(column.variable_factory()
+                           for column in self.cls_info.eager_columns)
+        obj_info = ObjectInfo(obj, row, converters)
+        set_obj_info(obj, obj_info)
+        return obj_info
+
+    def test_compact_variables(self):
+        obj = self.Class()
+        obj_info = self.create_compact_obj_info(obj, (1, 2))
+        self.assertTrue(isinstance(obj_info.variables, LazyVariables))
+        self.assertEquals([id(column) for column in obj_info.variables],
+                          [id(self.Class.prop1)])
+        self.assertEquals(obj_info.primary_vars[0].get(), 1)
+
+    def test_compact_variables_read(self):
+        obj = self.Class()
+        obj_info = self.create_compact_obj_info(obj, (1, 2))
+        self.assertEquals(obj.prop2, 2)
+        self.assertEquals(obj_info.variables.get_value(self.Class.prop2), 2)
+        self.assertEquals(len(obj_info.variables), 1)
+
+    def test_compact_variables_created_on_lookup(self):
+        obj = self.Class()
+        obj_info = self.create_compact_obj_info(obj, (1, 2))
+        variable = obj_info.variables[self.Class.prop2]
+        self.assertTrue(obj_info.variables[self.Class.prop2] is variable)
+        self.assertTrue(variable.column is self.Class.prop2)
+        self.assertTrue(variable.event is obj_info.event)
+        self.assertEquals(variable.get(), 2)
+        self.assertFalse(variable.has_changed())
+        obj.prop2 = 3
+        self.assertTrue(variable.has_changed())
+        self.assertEquals(obj.prop2, 3)
+
+    def test_compact_variables_unknown_column(self):
+        obj_info = self.create_compact_obj_info(self.Class(), (1, 2))
+        class Other(object):
+            __storm_table__ = "other"
+            prop = Property(primary=True)
+        self.assertRaises(KeyError,
+                          obj_info.variables.__getitem__, Other.prop)
+
     def test_checkpoint(self):
         self.obj.prop1 = 10
         self.obj_info.checkpoint()
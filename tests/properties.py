@@ -128,6 +128,37 @@ class PropertyTest(TestHelper):
         self.assertEquals(self.Class.prop1.table, self.Class)
         self.assertEquals(self.Class.prop2.table, self.Class)
 
+    def test_auto_lazy_group(self):
+        self.assertEquals(self.Class.prop2.lazy_group, None)
+
+    def test_lazy(self):
+        class Class(object):
+            __storm_table__ = "mytable"
+            prop1 = Custom(primary=True)
+            prop2 = Custom(lazy=True)
+        prop2 = Class.__dict__["prop2"]
+        self.assertTrue(Class.prop2.lazy_group is prop2)
+
+    def test_lazy_group(self):
+        group = LazyGroup()
+        class Class(object):
+            __storm_table__ = "mytable"
+            prop1 = Custom(primary=True)
+            prop2 = Custom(lazy_group=group)
+            prop3 = Custom(lazy=True, lazy_group=1)
+        self.assertTrue(Class.prop2.lazy_group is group)
+        self.assertEquals(Class.prop3.lazy_group, 1)
+
+    def test_lazy_group_in_subclass(self):
+        class Class(object):
+            __storm_table__ = "mytable"
+            prop1 = Custom(primary=True)
+            prop2 = Custom(lazy_group=1)
+        class SubClass(Class):
+            pass
+        self.assertEquals(Class.prop2.lazy_group, 1)
+        self.assertEquals(SubClass.prop2.lazy_group, 1)
+
     def test_auto_table_subclass(self):
         self.assertEquals(self.Class.prop1.table, self.Class)
         self.assertEquals(self.Class.prop2.table, self.Class)
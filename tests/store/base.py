@@ -31,20 +31,23 @@ from storm.references import Reference, ReferenceSet, Proxy
 from storm.database import Result, STATE_DISCONNECTED
 from storm.properties import (
     Int, Float, RawStr, Unicode, Property, Pickle, UUID)
-from storm.properties import PropertyPublisherMeta, Decimal
+from storm.properties import PropertyPublisherMeta, Decimal, LazyGroup
 from storm.variables import PickleVariable
 from storm.expr import (
-    Asc, Desc, Select, LeftJoin, SQL, Count, Sum, Avg, And, Or, Eq, Lower)
+    Asc, Desc, Select, LeftJoin, SQL, Count, Sum, Avg, And, Or, Eq, Lower,
+    Insert)
 from storm.variables import Variable, UnicodeVariable, IntVariable
-from storm.info import get_obj_info, ClassAlias
+from storm.info import get_cls_info, get_obj_info, ClassAlias
 from storm.exceptions import (
     ClosedError, ConnectionBlockedError, FeatureError, LostObjectError,
-    NoStoreError, NotFlushedError, NotOneError, OrderLoopError, UnorderedError,
-    WrongStoreError, DisconnectionError)
-from storm.cache import Cache
+    NoStoreError, NotFlushedError, NotOneError, OrderLoopError, StoreError,
+    UnorderedError, WrongStoreError, DisconnectionError, ReadOnlyError)
+from storm.cache import Cache, RowCache
 from storm.store import AutoReload, EmptyResultSet, Store, ResultSet
 from storm.tracer import debug
+import storm.store as store_module
 
+from tests.cache import FakeTime
 from tests.info import Wrapper
 from tests.helper import TestHelper
 
@@ -61,6 +64,11 @@ class Bar(object):
     foo_id = Int()
     foo = Reference(foo_id, Foo.id)
 
+class UniqueTitleFoo(object):
+    __storm_table__ = "foo"
+    id = Int(primary=True)
+    title = Unicode(unique=True)
+
 class UniqueID(object):
     __storm_table__ = "unique_id"
     id = UUID(primary=True)
@@ -549,6 +557,790 @@ class StoreTest(object):
         foo = self.store.get(MyFoo, (u"Title 20", 10))
         self.assertEquals(foo, None)
 
+    def test_get_many(self):
+        foos = self.store.get_many(Foo, [30, 40, 10, 20])
+        self.assertEquals([foo and foo.id for foo in foos],
+                          [30, None, 10, 20])
+        for foo in foos:
+            if foo is not None:
+                self.assertTrue(self.store.get(Foo, foo.id) is foo)
+
+    def test_get_many_uses_alive_objects(self):
+        foo10 = self.store.get(Foo, 10)
+        foo20 = self.store.get(Foo, 20)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        foos = self.store.get_many(Foo, [20, 10])
+        debug(False)
+
+        self.assertEquals(foos, [foo20, foo10])
+        self.assertEquals(stream.getvalue().count("SELECT"), 0)
+
+    def test_get_many_queries_missing_keys_once(self):
+        foo10 = self.store.get(Foo, 10)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        foos = self.store.get_many(Foo, [10, 20, 30, 20])
+        debug(False)
+
+        self.assertTrue(foos[0] is foo10)
+        self.assertEquals([foo.id for foo in foos], [10, 20, 30, 20])
+        self.assertTrue(foos[1] is foos[3])
+        self.assertEquals(stream.getvalue().count("SELECT"), 1)
+
+    def test_get_many_chunks_queries(self):
+        self.store._get_many_max_parameters = 2
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        foos = self.store.get_many(Foo, [10, 20, 30])
+        debug(False)
+
+        self.assertEquals([foo.id for foo in foos], [10, 20, 30])
+        self.assertEquals(stream.getvalue().count("SELECT"), 2)
+
+    def test_get_many_invalidated(self):
+        foo = self.store.get(Foo, 20)
+        self.store.execute("UPDATE foo SET title='New title' WHERE id=20")
+        self.store.invalidate(foo)
+        foos = self.store.get_many(Foo, [20])
+        self.assertTrue(foos[0] is foo)
+        self.assertEquals(foo.title, "New title")
+
+    def test_get_many_flushes(self):
+        foo = Foo()
+        foo.id = 40
+        foo.title = u"Title 40"
+        self.store.add(foo)
+        self.assertEquals(self.store.get_many(Foo, [40]), [foo])
+        self.assertEquals(self.get_items()[-1], (40, "Title 40"))
+
+    def test_get_many_tuple(self):
+        foos = self.store.get_many(Link, [(10, 100), (10, 400), (20, 200)])
+        self.assertEquals([link and (link.foo_id, link.bar_id)
+                           for link in foos],
+                          [(10, 100), None, (20, 200)])
+
+    def test_get_many_chunks_queries_by_parameters(self):
+        self.store._get_many_max_parameters = 4
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        links = self.store.get_many(Link, [(10, 100), (10, 200), (20, 200)])
+        debug(False)
+
+        self.assertEquals([(link.foo_id, link.bar_id) for link in links],
+                          [(10, 100), (10, 200), (20, 200)])
+        self.assertEquals(stream.getvalue().count("SELECT"), 2)
+
+    def test_get_many_empty(self):
+        self.assertEquals(self.store.get_many(Foo, []), [])
+
+    def test_negative_cache_disabled_by_default(self):
+        self.assertEquals(self.store.get(Foo, 40), None)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals(self.store.get(Foo, 40), None)
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("SELECT"), 1)
+
+    def test_negative_cache(self):
+        self.store.set_negative_cache(True)
+        self.assertEquals(self.store.get(Foo, 40), None)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals(self.store.get(Foo, 40), None)
+        self.assertEquals(self.store.get_many(Foo, [40]), [None])
+        debug(False)
+
+        self.assertEquals(stream.getvalue(), "")
+
+    def test_negative_cache_get_many(self):
+        self.store.set_negative_cache(True)
+        self.assertEquals(self.store.get_many(Foo, [10, 40]),
+                          [self.store.get(Foo, 10), None])
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals(self.store.get(Foo, 40), None)
+        debug(False)
+
+        self.assertEquals(stream.getvalue(), "")
+
+    def test_negative_cache_is_per_class(self):
+        self.store.set_negative_cache(True)
+        self.assertEquals(self.store.get(Foo, 40), None)
+        self.store.execute("INSERT INTO bar VALUES (40, 10, 'Title 40')")
+        self.assertNotEquals(self.store.get(Bar, 40), None)
+
+    def test_negative_cache_forgets_added_key(self):
+        self.store.set_negative_cache(True)
+        self.assertEquals(self.store.get(Foo, 40), None)
+        foo = Foo()
+        foo.id = 40
+        self.store.add(foo)
+        self.assertTrue(self.store.get(Foo, 40) is foo)
+
+    def test_negative_cache_forgets_added_key_of_other_class(self):
+        self.store.set_negative_cache(True)
+        self.assertEquals(self.store.get(Foo, 40), None)
+        foo = FooRef()
+        foo.id = 40
+        self.store.add(foo)
+        self.store.flush()
+        self.assertNotEquals(self.store.get(Foo, 40), None)
+
+    def test_negative_cache_forgets_changed_key(self):
+        self.store.set_negative_cache(True)
+        self.assertEquals(self.store.get(Foo, 40), None)
+        foo = self.store.get(Foo, 30)
+        foo.id = 40
+        self.assertTrue(self.store.get(Foo, 40) is foo)
+
+    def test_negative_cache_cleared_on_invalidate(self):
+        self.store.set_negative_cache(True)
+        self.assertEquals(self.store.get(Foo, 40), None)
+        # Bypass the store, so that it can't notice the insertion.
+        self.store._connection.execute(
+            "INSERT INTO foo VALUES (40, 'Title 40')")
+        self.assertEquals(self.store.get(Foo, 40), None)
+        self.store.invalidate()
+        self.assertEquals(self.store.get(Foo, 40).title, "Title 40")
+
+    def test_negative_cache_cleared_on_raw_sql(self):
+        self.store.set_negative_cache(True)
+        self.assertEquals(self.store.get(Foo, 40), None)
+        self.store.execute("INSERT INTO foo VALUES (40, 'Title 40')")
+        self.assertEquals(self.store.get(Foo, 40).title, "Title 40")
+
+    def test_negative_cache_forgets_table_on_insert(self):
+        self.store.set_negative_cache(True)
+        self.assertEquals(self.store.get(Foo, 40), None)
+        self.assertEquals(self.store.get(Bar, 50), None)
+        self.store.execute(Insert({Foo.id: 40, Foo.title: u"Title 40"}))
+        self.assertEquals(self.store.get(Foo, 40).title, "Title 40")
+        self.assertTrue(self.store._is_known_missing(get_cls_info(Bar), (50,)))
+
+    def test_negative_cache_cleared_on_commit(self):
+        self.store.set_negative_cache(True)
+        self.assertEquals(self.store.get(Foo, 40), None)
+        self.store.execute("INSERT INTO foo VALUES (40, 'Title 40')")
+        self.store.commit()
+        self.assertEquals(self.store.get(Foo, 40).title, "Title 40")
+
+    def test_negative_cache_cleared_on_rollback(self):
+        self.store.set_negative_cache(True)
+        self.assertEquals(self.store.get(Foo, 40), None)
+        self.store.rollback()
+        self.store.execute("INSERT INTO foo VALUES (40, 'Title 40')")
+        self.assertEquals(self.store.get(Foo, 40).title, "Title 40")
+
+    def test_negative_cache_disable(self):
+        self.store.set_negative_cache(True)
+        self.assertEquals(self.store.get(Foo, 40), None)
+        self.store.execute("INSERT INTO foo VALUES (40, 'Title 40')")
+        self.store.set_negative_cache(False)
+        self.assertEquals(self.store.get(Foo, 40).title, "Title 40")
+
+    def test_get_stats_initially_zero(self):
+        self.assertEquals(self.store.get_stats(),
+                          {"get_hits": 0, "get_misses": 0,
+                           "load_hits": 0, "load_misses": 0,
+                           "cache_evictions": 0, "invalidations": 0,
+                           "lazy_resolutions": 0})
+
+    def test_get_stats_get(self):
+        self.store.get(Foo, 10)
+        self.store.get(Foo, 10)
+        self.store.get(Foo, 40)
+        self.store.get_many(Foo, [10, 20])
+        stats = self.store.get_stats()
+        self.assertEquals(stats["get_hits"], 2)
+        self.assertEquals(stats["get_misses"], 3)
+        self.assertEquals(stats["load_misses"], 2)
+
+    def test_get_stats_get_by_unique_attribute(self):
+        self.store.get(UniqueTitleFoo, u"Title 20",
+                       attribute=UniqueTitleFoo.title)
+        self.store.get(UniqueTitleFoo, u"Title 20",
+                       attribute=UniqueTitleFoo.title)
+        stats = self.store.get_stats()
+        self.assertEquals(stats["get_hits"], 1)
+        self.assertEquals(stats["get_misses"], 1)
+
+    def test_get_stats_negative_cache_hit(self):
+        self.store.set_negative_cache(True)
+        self.store.get(Foo, 40)
+        self.store.get(Foo, 40)
+        stats = self.store.get_stats()
+        self.assertEquals(stats["get_hits"], 1)
+        self.assertEquals(stats["get_misses"], 1)
+
+    def test_get_stats_load(self):
+        foo = self.store.get(Foo, 10)
+        list(self.store.find(Foo))
+        stats = self.store.get_stats()
+        self.assertEquals(stats["load_hits"], 1)
+        self.assertEquals(stats["load_misses"], 3)
+
+    def test_get_stats_invalidations(self):
+        foo1 = self.store.get(Foo, 10)
+        foo2 = self.store.get(Foo, 20)
+        self.store.invalidate(foo1)
+        self.assertEquals(self.store.get_stats()["invalidations"], 1)
+        self.store.commit()
+        foo1.title
+        foo2.title
+        self.assertEquals(self.store.get_stats()["invalidations"], 3)
+
+    def test_get_stats_lazy_resolutions(self):
+        foo = self.store.get(Foo, 10)
+        self.store.invalidate(foo)
+        foo.title
+        foo.title
+        self.assertEquals(self.store.get_stats()["lazy_resolutions"], 1)
+
+    def test_get_stats_cache_evictions(self):
+        self.store._cache.set_size(2)
+        foos = list(self.store.find(Foo))
+        self.assertEquals(self.store.get_stats()["cache_evictions"], 1)
+
+    def test_get_stats_reset(self):
+        self.store._cache.set_size(2)
+        foos = list(self.store.find(Foo))
+        self.store.get(Foo, 10)
+        self.assertNotEquals(self.store.get_stats(reset=True)["get_hits"], 0)
+        self.assertEquals(set(self.store.get_stats().values()), set([0]))
+
+    def create_row_cache_store(self, row_cache):
+        store = Store(self.database, row_cache=row_cache)
+        self.stores.append(store)
+        return store
+
+    def test_row_cache_shared_by_stores(self):
+        row_cache = RowCache()
+        store1 = self.create_row_cache_store(row_cache)
+        store2 = self.create_row_cache_store(row_cache)
+        foo1 = store1.get(Foo, 10)
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        foo2 = store2.get(Foo, 10)
+        debug(False)
+        self.assertEquals(stream.getvalue(), "")
+        self.assertNotIdentical(foo2, foo1)
+        self.assertEquals(foo2.id, 10)
+        self.assertEquals(foo2.title, "Title 30")
+        self.assertIdentical(store2.get(Foo, 10), foo2)
+        self.assertEquals(store2.get_stats()["get_hits"], 2)
+
+    def test_row_cache_filled_by_find(self):
+        row_cache = RowCache()
+        store = self.create_row_cache_store(row_cache)
+        list(store.find(Foo))
+        cls_info = get_cls_info(Foo)
+        self.assertEquals(row_cache.get(cls_info, (20,)), (20, "Title 20"))
+
+    def test_row_cache_invalidated_by_flush(self):
+        row_cache = RowCache()
+        store = self.create_row_cache_store(row_cache)
+        cls_info = get_cls_info(Foo)
+        foo = store.get(Foo, 10)
+        foo.title = u"New title"
+        store.flush()
+        self.assertEquals(row_cache.get(cls_info, (10,)), None)
+        # The row isn't cached again until committed, as other stores
+        # don't see the change yet.
+        store.find(Foo, id=10).one()
+        self.assertEquals(row_cache.get(cls_info, (10,)), None)
+        store.commit()
+        store.find(Foo, id=10).one()
+        self.assertEquals(row_cache.get(cls_info, (10,)), (10, "New title"))
+
+    def test_row_cache_not_used_for_written_rows(self):
+        row_cache = RowCache()
+        store1 = self.create_row_cache_store(row_cache)
+        foo = store1.get(Foo, 10)
+        foo.title = u"New title"
+        store1.flush()
+        del foo
+        store1._cache.clear()
+        gc.collect()
+        # Another store, starting after the flush, caches the committed
+        # row.
+        store2 = self.create_row_cache_store(row_cache)
+        store2.get(Foo, 10)
+        self.assertEquals(row_cache.get(get_cls_info(Foo), (10,)),
+                          (10, "Title 30"))
+        self.assertEquals(store1.get(Foo, 10).title, u"New title")
+
+    def test_row_cache_not_used_for_written_tables(self):
+        row_cache = RowCache()
+        store1 = self.create_row_cache_store(row_cache)
+        store2 = self.create_row_cache_store(row_cache)
+        store1.find(Foo, id=10).set(title=u"New title")
+        store1._cache.clear()
+        gc.collect()
+        store2.get(Foo, 10)
+        self.assertEquals(store1.get(Foo, 10).title, u"New title")
+
+    def test_row_cache_invalidated_by_commit(self):
+        row_cache = RowCache()
+        store = self.create_row_cache_store(row_cache)
+        cls_info = get_cls_info(Foo)
+        foo = store.get(Foo, 10)
+        foo.title = u"New title"
+        store.flush()
+        # Another store may cache the committed row in the meantime.
+        row_cache.set(cls_info, (10,), (10, u"Title 30"))
+        store.commit()
+        self.assertEquals(row_cache.get(cls_info, (10,)), None)
+
+    def test_row_cache_rollback(self):
+        row_cache = RowCache()
+        store = self.create_row_cache_store(row_cache)
+        cls_info = get_cls_info(Foo)
+        foo = store.get(Foo, 10)
+        foo.title = u"New title"
+        store.flush()
+        store.rollback()
+        store.find(Foo, id=10).one()
+        self.assertEquals(row_cache.get(cls_info, (10,)), (10, "Title 30"))
+
+    def test_row_cache_invalidated_by_remove(self):
+        row_cache = RowCache()
+        store = self.create_row_cache_store(row_cache)
+        foo = store.get(Foo, 10)
+        store.remove(foo)
+        store.flush()
+        self.assertEquals(row_cache.get(get_cls_info(Foo), (10,)), None)
+        self.assertEquals(store.get(Foo, 10), None)
+
+    def test_row_cache_invalidated_by_primary_key_change(self):
+        row_cache = RowCache()
+        store = self.create_row_cache_store(row_cache)
+        foo = store.get(Foo, 10)
+        foo.id = 40
+        store.flush()
+        self.assertEquals(row_cache.get(get_cls_info(Foo), (10,)), None)
+        self.assertEquals(store.get(Foo, 10), None)
+
+    def test_row_cache_invalidated_by_set(self):
+        row_cache = RowCache()
+        store = self.create_row_cache_store(row_cache)
+        store.get(Foo, 10)
+        store.find(Foo, id=10).set(title=u"New title")
+        self.assertEquals(row_cache.get(get_cls_info(Foo), (10,)), None)
+
+    def test_row_cache_invalidated_by_result_set_remove(self):
+        row_cache = RowCache()
+        store = self.create_row_cache_store(row_cache)
+        store.get(Foo, 10)
+        store.find(Foo, id=10).remove()
+        self.assertEquals(row_cache.get(get_cls_info(Foo), (10,)), None)
+
+    def test_row_cache_invalidate_object(self):
+        row_cache = RowCache()
+        store = self.create_row_cache_store(row_cache)
+        foo = store.get(Foo, 10)
+        store.invalidate(foo)
+        self.assertEquals(row_cache.get(get_cls_info(Foo), (10,)), None)
+
+    def test_row_cache_not_filled_by_older_transactions(self):
+        row_cache = RowCache()
+        store1 = self.create_row_cache_store(row_cache)
+        store2 = self.create_row_cache_store(row_cache)
+        cls_info = get_cls_info(Foo)
+        foo = store1.get(Foo, 10)
+        foo.title = u"New title"
+        store1.commit()
+        # The transaction of store2 may have started before the commit,
+        # and see the row as it was.
+        store2.get(Foo, 10)
+        self.assertEquals(row_cache.get(cls_info, (10,)), None)
+        store2.commit()
+        store2.find(Foo, id=10).one()
+        self.assertEquals(row_cache.get(cls_info, (10,)), (10, "New title"))
+
+    def test_row_cache_holds_converted_values(self):
+        row_cache = RowCache()
+        store1 = self.create_row_cache_store(row_cache)
+        store2 = self.create_row_cache_store(row_cache)
+        store1.get(Blob, 10)
+        values = row_cache.get(get_cls_info(Blob), (10,))
+        self.assertEquals(values, ("Blob 30", 10))
+        self.assertEquals(type(values[0]), str)
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals(store2.get(Blob, 10).bin, "Blob 30")
+        debug(False)
+        self.assertEquals(stream.getvalue(), "")
+
+    def test_row_cache_copies_mutable_values(self):
+        class PickleBlob(Blob):
+            bin = Pickle()
+
+        blob = self.store.get(Blob, 20)
+        blob.bin = "\x80\x02}q\x01U\x01aK\x01s."
+        self.store.commit()
+
+        row_cache = RowCache()
+        store1 = self.create_row_cache_store(row_cache)
+        store2 = self.create_row_cache_store(row_cache)
+        pickle_blob1 = store1.get(PickleBlob, 20)
+        pickle_blob2 = store2.get(PickleBlob, 20)
+        self.assertEquals(pickle_blob2.bin, {"a": 1})
+        self.assertNotIdentical(pickle_blob2.bin, pickle_blob1.bin)
+        pickle_blob2.bin["b"] = 2
+        store2.flush()
+        self.assertEquals(pickle_blob1.bin, {"a": 1})
+        result = store2.execute("SELECT bin FROM bin WHERE id=20")
+        self.assertEquals(str(result.get_one()[0]),
+                          "\x80\x02}q\x01(U\x01aK\x01U\x01bK\x02u.")
+
+    def test_row_cache_class_ttl_zero(self):
+        row_cache = RowCache()
+        row_cache.set_ttl(Foo, 0)
+        store = self.create_row_cache_store(row_cache)
+        store.get(Foo, 10)
+        store.get(Bar, 100)
+        self.assertEquals(row_cache.get(get_cls_info(Foo), (10,)), None)
+        self.assertNotEquals(row_cache.get(get_cls_info(Bar), (100,)), None)
+
+    def test_compact_objects(self):
+        self.store.set_compact_objects(True)
+        foo = self.store.get(Foo, 20)
+        variables = get_obj_info(foo).variables
+        self.assertEquals(foo.title, u"Title 20")
+        self.assertEquals([id(column) for column in variables],
+                          [id(Foo.id)])
+        foos = self.store.find(Foo).order_by(Foo.id)
+        self.assertEquals([foo.title for foo in foos],
+                          [u"Title 30", u"Title 20", u"Title 10"])
+        self.assertEquals(len(variables), 1)
+
+    def test_compact_objects_disabled(self):
+        self.store.set_compact_objects(True)
+        self.store.set_compact_objects(False)
+        foo = self.store.get(Foo, 20)
+        self.assertEquals(len(get_obj_info(foo).variables),
+                          len(get_cls_info(Foo).columns))
+
+    def test_compact_objects_change(self):
+        self.store.set_compact_objects(True)
+        foo = self.store.get(Foo, 20)
+        foo.title = u"New title"
+        self.assertEquals(foo.title, u"New title")
+        self.store.flush()
+        self.assertEquals(self.store.execute("SELECT title FROM foo "
+                                             "WHERE id=20").get_one(),
+                          (u"New title",))
+        self.assertEquals(len(get_obj_info(foo).variables), 2)
+
+    def test_compact_objects_find_keeps_changes(self):
+        self.store.set_compact_objects(True)
+        foo = self.store.get(Foo, 20)
+        foo.title = u"New title"
+        self.store.block_implicit_flushes()
+        self.assertTrue(self.store.find(Foo, id=20).one() is foo)
+        self.assertEquals(foo.title, u"New title")
+
+    def test_compact_objects_invalidated(self):
+        self.store.set_compact_objects(True)
+        foo = self.store.get(Foo, 20)
+        self.store.execute("UPDATE foo SET title='New title' WHERE id=20")
+        self.store.invalidate(foo)
+        self.assertEquals(foo.title, u"New title")
+
+    def test_compact_objects_mutable_value(self):
+        class PickleBlob(Blob):
+            bin = Pickle()
+
+        blob = self.store.get(Blob, 20)
+        blob.bin = "\x80\x02}q\x01U\x01aK\x01s."
+        self.store.flush()
+
+        self.store.set_compact_objects(True)
+        pickle_blob = self.store.get(PickleBlob, 20)
+        pickle_blob.bin["b"] = 2
+        self.store.flush()
+        self.store.reload(blob)
+        self.assertEquals(blob.bin, "\x80\x02}q\x01(U\x01aK\x01U\x01bK\x02u.")
+
+    def test_compact_objects_lazy_columns(self):
+        class LazyFoo(Foo):
+            title = Unicode(lazy=True)
+
+        self.store.set_compact_objects(True)
+        foo = self.store.get(LazyFoo, 20)
+        self.assertEquals(foo.title, u"Title 20")
+
+    def test_find_untracked(self):
+        result = self.store.find(Foo).order_by(Foo.id).config(track=False)
+        foos = list(result)
+        self.assertEquals([(foo.id, foo.title) for foo in foos],
+                          [(10, u"Title 30"), (20, u"Title 20"),
+                           (30, u"Title 10")])
+        for foo in foos:
+            self.assertEquals(Store.of(foo), None)
+            self.assertTrue(self.store.get(Foo, foo.id) is not foo)
+
+    def test_find_untracked_not_alive(self):
+        foo = self.store.find(Foo, id=20).config(track=False).one()
+        self.assertEquals(foo.title, u"Title 20")
+        self.assertEquals(self.store.get_stats()["load_misses"], 0)
+        self.assertEquals(self.store._alive.get((Foo, (20,))), None)
+        self.assertEquals(self.store._cache.get_cached(), [])
+
+    def test_find_untracked_is_read_only(self):
+        foo = self.store.find(Foo, id=20).config(track=False).one()
+        self.assertRaises(ReadOnlyError, setattr, foo, "title", u"New")
+        self.assertRaises(ReadOnlyError, delattr, foo, "title")
+        self.assertEquals(foo.title, u"Title 20")
+
+    def test_find_untracked_reference_is_read_only(self):
+        bar = self.store.find(Bar, id=100).config(track=False).one()
+        self.assertRaises(ReadOnlyError, setattr, bar, "foo",
+                          self.store.get(Foo, 20))
+
+    def test_find_untracked_reference_cant_be_resolved(self):
+        bar = self.store.find(Bar, id=100).config(track=False).one()
+        self.assertEquals(bar.foo_id, 10)
+        self.assertRaises(NoStoreError, getattr, bar, "foo")
+
+    def test_find_untracked_reference_to_nothing(self):
+        self.store.execute("UPDATE bar SET foo_id=NULL WHERE id=100")
+        bar = self.store.find(Bar, id=100).config(track=False).one()
+        self.assertEquals(bar.foo, None)
+
+    def test_find_untracked_loaded_hook(self):
+        loaded = []
+        class MyFoo(Foo):
+            def __storm_loaded__(self):
+                loaded.append(self.id)
+        list(self.store.find(MyFoo).order_by(MyFoo.id).config(track=False))
+        self.assertEquals(loaded, [10, 20, 30])
+
+    def test_find_untracked_tuple(self):
+        result = self.store.find((Foo, Bar), Bar.foo_id == Foo.id)
+        foo, bar = result.order_by(Bar.id).config(track=False).first()
+        self.assertEquals((foo.id, bar.id), (10, 100))
+        self.assertEquals(Store.of(foo), None)
+        self.assertEquals(Store.of(bar), None)
+
+    def test_find_untracked_with_prefetch(self):
+        result = self.store.find(Bar).config(track=False)
+        result.prefetch(Bar.foo)
+        self.assertRaises(FeatureError, list, result)
+
+    def test_find_untracked_with_lazy_columns(self):
+        class LazyFoo(Foo):
+            title = Unicode(lazy=True)
+        result = self.store.find(LazyFoo).config(track=False)
+        self.assertRaises(FeatureError, list, result)
+
+    def count_selects(self, function, *args):
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        try:
+            result = function(*args)
+        finally:
+            debug(False)
+        return result, stream.getvalue().count("SELECT")
+
+    def test_cache_results(self):
+        result = self.store.find(Foo).order_by(Foo.id).cache_results()
+        foos, selects = self.count_selects(list, result)
+        self.assertEquals([foo.id for foo in foos], [10, 20, 30])
+        self.assertEquals(selects, 1)
+        cached_foos, selects = self.count_selects(list, result)
+        self.assertEquals(selects, 0)
+        self.assertEquals([id(foo) for foo in cached_foos],
+                          [id(foo) for foo in foos])
+
+    def test_cache_results_shared_by_result_sets(self):
+        list(self.store.find(Foo, id=10).cache_results())
+        foos, selects = self.count_selects(
+            list, self.store.find(Foo, id=10).cache_results())
+        self.assertEquals(selects, 0)
+        self.assertEquals([foo.id for foo in foos], [10])
+        foos, selects = self.count_selects(
+            list, self.store.find(Foo, id=20).cache_results())
+        self.assertEquals(selects, 1)
+        self.assertEquals([foo.id for foo in foos], [20])
+
+    def test_cache_results_loads_dead_objects(self):
+        result = self.store.find(Foo).order_by(Foo.id).cache_results()
+        list(result)
+        self.store._cache.clear()
+        gc.collect()
+        foos, selects = self.count_selects(list, result)
+        self.assertEquals([foo.id for foo in foos], [10, 20, 30])
+        self.assertEquals(selects, 1)
+
+    def test_cache_results_values(self):
+        result = self.store.find(Foo).order_by(Foo.id).cache_results()
+        values, selects = self.count_selects(
+            list, result.values(Foo.id, Foo.title))
+        self.assertEquals(selects, 1)
+        cached_values, selects = self.count_selects(
+            list, result.values(Foo.id, Foo.title))
+        self.assertEquals(selects, 0)
+        self.assertEquals(cached_values, values)
+        self.assertEquals(cached_values, [(10, u"Title 30"),
+                                          (20, u"Title 20"),
+                                          (30, u"Title 10")])
+        self.assertEquals(list(result.values(Foo.id)), [10, 20, 30])
+
+    def test_cache_results_invalidated_by_flush(self):
+        result = self.store.find(Foo).order_by(Foo.id).cache_results()
+        list(result.values(Foo.title))
+        self.store.get(Foo, 10).title = u"New title"
+        self.store.flush()
+        self.assertEquals(list(result.values(Foo.title)),
+                          [u"New title", u"Title 20", u"Title 10"])
+
+    def test_cache_results_invalidated_by_add(self):
+        result = self.store.find(Foo).order_by(Foo.id).cache_results()
+        list(result)
+        foo = Foo()
+        foo.id = 40
+        self.store.add(foo)
+        self.assertEquals([foo.id for foo in
+                           self.store.find(Foo).order_by(Foo.id)
+                           .cache_results()],
+                          [10, 20, 30, 40])
+
+    def test_cache_results_invalidated_by_result_set_changes(self):
+        result = self.store.find(Foo).order_by(Foo.id).cache_results()
+        list(result.values(Foo.title))
+        self.store.find(Foo, id=10).set(title=u"New title")
+        self.assertEquals(list(result.values(Foo.title)),
+                          [u"New title", u"Title 20", u"Title 10"])
+        self.store.find(Foo, id=10).remove()
+        self.assertEquals(list(result.values(Foo.title)),
+                          [u"Title 20", u"Title 10"])
+
+    def test_cache_results_invalidated_by_execute(self):
+        result = self.store.find(Foo).order_by(Foo.id).cache_results()
+        list(result.values(Foo.title))
+        self.store.execute("UPDATE foo SET title='New title' WHERE id=10")
+        self.assertEquals(list(result.values(Foo.title)),
+                          [u"New title", u"Title 20", u"Title 10"])
+
+    def test_cache_results_other_tables_changed(self):
+        result = self.store.find(Foo).order_by(Foo.id).cache_results()
+        list(result.values(Foo.title))
+        self.store.get(Bar, 100).title = u"New title"
+        self.store.flush()
+        self.store.execute("SELECT 1")
+        values, selects = self.count_selects(list, result.values(Foo.title))
+        self.assertEquals(selects, 0)
+
+    def test_cache_results_ttl(self):
+        fake_time = FakeTime()
+        self.addCleanup(setattr, store_module, "time", store_module.time)
+        store_module.time = fake_time
+        result = self.store.find(Foo).order_by(Foo.id).cache_results(ttl=10)
+        list(result.values(Foo.title))
+        fake_time.now += 5
+        values, selects = self.count_selects(list, result.values(Foo.title))
+        self.assertEquals(selects, 0)
+        fake_time.now += 10
+        values, selects = self.count_selects(list, result.values(Foo.title))
+        self.assertEquals(selects, 1)
+
+    def test_cache_results_cleared_by_rollback(self):
+        result = self.store.find(Foo).order_by(Foo.id).cache_results()
+        self.store.get(Foo, 10).title = u"New title"
+        list(result.values(Foo.title))
+        self.store.rollback()
+        self.assertEquals(list(result.values(Foo.title)),
+                          [u"Title 30", u"Title 20", u"Title 10"])
+
+    def test_cache_results_with_tuple_find(self):
+        result = self.store.find((Foo, Bar))
+        self.assertRaises(FeatureError, result.cache_results)
+
+    def test_get_by_unique_attribute(self):
+        foo = self.store.get(UniqueTitleFoo, u"Title 20",
+                             attribute=UniqueTitleFoo.title)
+        self.assertEquals(foo.id, 20)
+        self.assertTrue(self.store.get(UniqueTitleFoo, 20) is foo)
+
+    def test_get_by_unique_attribute_not_found(self):
+        self.assertEquals(self.store.get(UniqueTitleFoo, u"Title 40",
+                                         attribute=UniqueTitleFoo.title),
+                          None)
+
+    def test_get_by_unique_attribute_uses_alive_objects(self):
+        foo = self.store.get(UniqueTitleFoo, 20)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertTrue(self.store.get(UniqueTitleFoo, u"Title 20",
+                                       attribute=UniqueTitleFoo.title)
+                        is foo)
+        debug(False)
+
+        self.assertEquals(stream.getvalue(), "")
+
+    def test_get_by_unique_attribute_after_change(self):
+        foo = self.store.get(UniqueTitleFoo, 20)
+        foo.title = u"Title 40"
+        self.assertTrue(self.store.get(UniqueTitleFoo, u"Title 40",
+                                       attribute=UniqueTitleFoo.title)
+                        is foo)
+        self.assertEquals(self.store.get(UniqueTitleFoo, u"Title 20",
+                                         attribute=UniqueTitleFoo.title),
+                          None)
+
+    def test_get_by_unique_attribute_with_unflushed_change(self):
+        foo = self.store.get(UniqueTitleFoo, 20)
+        self.store.block_implicit_flushes()
+        foo.title = u"Title 40"
+        self.assertNotEquals(
+            self.store.get(UniqueTitleFoo, u"Title 20",
+                           attribute=UniqueTitleFoo.title),
+            None)
+
+    def test_get_by_unique_attribute_after_remove(self):
+        foo = self.store.get(UniqueTitleFoo, 20)
+        self.store.remove(foo)
+        self.assertEquals(self.store.get(UniqueTitleFoo, u"Title 20",
+                                         attribute=UniqueTitleFoo.title),
+                          None)
+
+    def test_get_by_unique_attribute_after_invalidate(self):
+        foo = self.store.get(UniqueTitleFoo, 20)
+        self.store.execute("UPDATE foo SET title='Title 40' WHERE id=20")
+        self.store.invalidate(foo)
+        self.assertEquals(self.store.get(UniqueTitleFoo, u"Title 20",
+                                         attribute=UniqueTitleFoo.title),
+                          None)
+        self.assertTrue(self.store.get(UniqueTitleFoo, u"Title 40",
+                                       attribute=UniqueTitleFoo.title)
+                        is foo)
+
+    def test_get_by_non_unique_attribute(self):
+        self.assertRaises(FeatureError, self.store.get, Foo, u"Title 20",
+                          attribute=Foo.title)
+
     def test_of(self):
         foo = self.store.get(Foo, 10)
         self.assertEquals(Store.of(foo), self.store)
@@ -1178,6 +1970,25 @@ class StoreTest(object):
         self.assertEquals(self.store.find(Foo, title=u"Title 20").cached(),
                           [foo2])
 
+    def test_find_cached_changed_primary_key(self):
+        foo = self.store.get(Foo, 20)
+        foo.id = 40
+        self.store.flush()
+        self.assertEquals(self.store.find(Foo).cached(), [foo])
+        self.assertEquals(self.store.find(Foo, id=40).cached(), [foo])
+
+    def test_find_cached_removed(self):
+        foo = self.store.get(Foo, 20)
+        self.store.remove(foo)
+        self.store.flush()
+        self.assertEquals(self.store.find(Foo).cached(), [])
+
+    def test_find_cached_visits_only_class(self):
+        foo = self.store.get(Foo, 20)
+        bar = self.store.get(Bar, 200)
+        self.assertEquals(self.store._iter_alive(Foo), [get_obj_info(foo)])
+        self.assertEquals(self.store._iter_alive(Link), [])
+
     def test_find_cached_invalidated(self):
         foo = self.store.get(Foo, 20)
         self.store.invalidate(foo)
@@ -2017,6 +2828,37 @@ class StoreTest(object):
         self.store.reload(bar)
         self.assertEquals(bar.title, "Title 500")
 
+    def test_wb_update_tracks_changed_columns(self):
+        bar = self.store.get(Bar, 200)
+        bar.title = u"Title 400"
+        obj_info = get_obj_info(bar)
+        self.assertEquals(obj_info["changed_columns"], set([Bar.title]))
+        self.store.flush()
+        self.assertFalse("changed_columns" in obj_info)
+
+    def test_update_reverted_change(self):
+        bar = self.store.get(Bar, 200)
+        bar.title = u"Title 400"
+        bar.title = u"Title 200"
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.flush()
+        debug(False)
+
+        self.assertEquals(stream.getvalue(), "")
+
+    def test_update_only_changed_columns(self):
+        bar = self.store.get(Bar, 200)
+        bar.title = u"Title 400"
+        self.store.flush()
+        bar.foo_id = 40
+        self.store.flush()
+        self.assertEquals(self.store.execute("SELECT foo_id, title FROM bar "
+                                             "WHERE id=200").get_one(),
+                          (40, "Title 400"))
+
     def test_update_primary_key(self):
         foo = self.store.get(Foo, 20)
         foo.id = 25
@@ -2511,30 +3353,122 @@ class StoreTest(object):
         self.store.unblock_implicit_flushes()
         self.assertRaises(RuntimeError, self.store.get, Foo, 20)
 
-    def test_block_access(self):
-        """Access to the store is blocked by block_access()."""
-        # The set_blocked() method blocks access to the connection.
-        self.store.block_access()
-        self.assertRaises(ConnectionBlockedError,
-                          self.store.execute, "SELECT 1")
-        self.assertRaises(ConnectionBlockedError, self.store.commit)
-        # The rollback method is not blocked.
-        self.store.rollback()
-        self.store.unblock_access()
-        self.store.execute("SELECT 1")
-
-    def test_reload(self):
+    def test_implicit_flush_flushes_everything_by_default(self):
         foo = self.store.get(Foo, 20)
-        self.store.execute("UPDATE foo SET title='Title 40' WHERE id=20")
-        self.assertEquals(foo.title, "Title 20")
-        self.store.reload(foo)
-        self.assertEquals(foo.title, "Title 40")
+        foo.title = u"New title"
 
-    def test_reload_not_changed(self):
-        foo = self.store.get(Foo, 20)
-        self.store.execute("UPDATE foo SET title='Title 40' WHERE id=20")
-        self.store.reload(foo)
-        for variable in get_obj_info(foo).variables.values():
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.find(Bar, Bar.id == 100).one()
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("UPDATE foo"), 1)
+
+    def test_scoped_implicit_flush_skips_other_tables(self):
+        self.store.set_scoped_implicit_flush(True)
+        foo = self.store.get(Foo, 20)
+        foo.title = u"New title"
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.find(Bar, Bar.id == 100).one()
+        self.store.get(Bar, 200)
+        self.store.get_many(Bar, [300])
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("UPDATE"), 0)
+        self.assertEquals(foo.title, "New title")
+        self.assertTrue(get_obj_info(foo) in self.store._dirty)
+
+    def test_scoped_implicit_flush_with_find(self):
+        self.store.set_scoped_implicit_flush(True)
+        foo = self.store.get(Foo, 20)
+        foo.title = u"New title"
+        self.assertEquals(self.store.find(Foo, title=u"New title").one(), foo)
+
+    def test_scoped_implicit_flush_with_get(self):
+        self.store.set_scoped_implicit_flush(True)
+        foo = Foo()
+        foo.id = 40
+        foo.title = u"New title"
+        self.store.add(foo)
+        self.store.invalidate()
+        self.assertEquals(self.store.get(Foo, 40), foo)
+        self.assertEquals(self.store.find(Foo, id=40).one(), foo)
+
+    def test_scoped_implicit_flush_with_table_in_where(self):
+        self.store.set_scoped_implicit_flush(True)
+        foo = self.store.get(Foo, 20)
+        foo.title = u"New title"
+        result = self.store.find(Bar, Bar.foo_id == Foo.id,
+                                 Foo.title == u"New title")
+        self.assertEquals([bar.id for bar in result], [200])
+
+    def test_scoped_implicit_flush_with_subselect(self):
+        self.store.set_scoped_implicit_flush(True)
+        foo = self.store.get(Foo, 20)
+        foo.title = u"New title"
+        subselect = Select(Foo.id, Foo.title == u"New title")
+        result = self.store.find(Bar, Bar.foo_id.is_in(subselect))
+        self.assertEquals([bar.id for bar in result], [200])
+
+    def test_scoped_implicit_flush_with_using(self):
+        self.store.set_scoped_implicit_flush(True)
+        foo = self.store.get(Foo, 20)
+        foo.title = u"New title"
+        join = LeftJoin(Foo, Bar.foo_id == Foo.id)
+        result = self.store.using(Bar, join).find(
+            Bar, Foo.title == u"New title")
+        self.assertEquals([bar.id for bar in result], [200])
+
+    def test_scoped_implicit_flush_flushes_predecessors(self):
+        self.store.set_scoped_implicit_flush(True)
+        foo = Foo()
+        foo.title = u"New title"
+        bar = Bar()
+        bar.id = 400
+        bar.title = u"Title 400"
+        bar.foo = foo
+        self.store.add(bar)
+        result = self.store.find(Bar, Bar.title == u"Title 400")
+        self.assertEquals(result.one(), bar)
+        self.assertEquals(bar.foo_id, foo.id)
+        self.assertTrue(get_obj_info(foo) not in self.store._dirty)
+
+    def test_scoped_implicit_flush_disabled(self):
+        self.store.set_scoped_implicit_flush(True)
+        self.store.set_scoped_implicit_flush(False)
+        foo = self.store.get(Foo, 20)
+        foo.title = u"New title"
+        self.store.find(Bar, Bar.id == 100).one()
+        self.assertEquals(self.store._dirty, {})
+
+    def test_block_access(self):
+        """Access to the store is blocked by block_access()."""
+        # The set_blocked() method blocks access to the connection.
+        self.store.block_access()
+        self.assertRaises(ConnectionBlockedError,
+                          self.store.execute, "SELECT 1")
+        self.assertRaises(ConnectionBlockedError, self.store.commit)
+        # The rollback method is not blocked.
+        self.store.rollback()
+        self.store.unblock_access()
+        self.store.execute("SELECT 1")
+
+    def test_reload(self):
+        foo = self.store.get(Foo, 20)
+        self.store.execute("UPDATE foo SET title='Title 40' WHERE id=20")
+        self.assertEquals(foo.title, "Title 20")
+        self.store.reload(foo)
+        self.assertEquals(foo.title, "Title 40")
+
+    def test_reload_not_changed(self):
+        foo = self.store.get(Foo, 20)
+        self.store.execute("UPDATE foo SET title='Title 40' WHERE id=20")
+        self.store.reload(foo)
+        for variable in get_obj_info(foo).variables.values():
             self.assertFalse(variable.has_changed())
 
     def test_reload_new(self):
@@ -3641,6 +4575,223 @@ class StoreTest(object):
         ref1.selfref = None
         self.assertRaises(OrderLoopError, self.store.flush)
 
+    def test_prefetch_reference(self):
+        bars = self.store.find(Bar).order_by(Bar.id).prefetch(Bar.foo)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        bars = list(bars)
+        self.assertEquals(stream.getvalue().count("SELECT"), 2)
+        self.assertEquals([bar.foo.id for bar in bars], [10, 20, 30])
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("SELECT"), 2)
+
+    def test_prefetch_reference_keeps_remote_alive(self):
+        bars = list(self.store.find(Bar).prefetch(Bar.foo))
+        self.store._cache.clear()
+        gc.collect()
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        [bar.foo for bar in bars]
+        debug(False)
+
+        self.assertEquals(stream.getvalue(), "")
+
+    def test_prefetch_reference_none(self):
+        bar = self.store.get(Bar, 100)
+        bar.foo_id = None
+        bars = list(self.store.find(Bar).order_by(Bar.id).prefetch(Bar.foo))
+        self.assertEquals([bar.foo and bar.foo.id for bar in bars],
+                          [None, 20, 30])
+
+    def test_prefetch_reference_on_remote(self):
+        foos = self.store.find(FooRef).order_by(FooRef.id)
+        foos.prefetch(FooRef.bar)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals([foo.bar.id for foo in foos], [100, 200, 300])
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("SELECT"), 2)
+
+    def test_prefetch_reference_path(self):
+        class LinkWithRef(Link):
+            bar = Reference(Link.bar_id, Bar.id)
+
+        links = self.store.find(LinkWithRef).order_by(LinkWithRef.foo_id,
+                                                      LinkWithRef.bar_id)
+        links.prefetch((LinkWithRef.bar, Bar.foo))
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        titles = [link.bar.foo.title for link in links]
+        debug(False)
+
+        self.assertEquals(titles, ["Title 30", "Title 20", "Title 10",
+                                   "Title 30", "Title 20", "Title 10"])
+        self.assertEquals(stream.getvalue().count("SELECT"), 3)
+
+    def test_prefetch_reference_with_tuples(self):
+        result = self.store.find((Bar, Link), Bar.id == Link.bar_id)
+        result.order_by(Bar.id, Link.foo_id).prefetch(Bar.foo)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        ids = [bar.foo.id for bar, link in result]
+        debug(False)
+
+        self.assertEquals(ids, [10, 10, 20, 20, 30, 30])
+        self.assertEquals(stream.getvalue().count("SELECT"), 2)
+
+    def test_prefetch_copied_result_set(self):
+        result = self.store.find(Bar).prefetch(Bar.foo)
+        copy = result.copy()
+        copy.prefetch(Bar.foo)
+        self.assertEquals(result._prefetch, ((Bar.foo,),))
+        self.assertEquals(copy._prefetch, ((Bar.foo,), (Bar.foo,)))
+
+    def test_prefetch_reference_set(self):
+        self.add_reference_set_bar_400()
+        foos = self.store.find(FooRefSetOrderID).order_by(FooRefSetOrderID.id)
+        foos.prefetch(FooRefSetOrderID.bars)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        foos = list(foos)
+        bars = [[bar.id for bar in foo.bars] for foo in foos]
+        counts = [foo.bars.count() for foo in foos]
+        any_ids = [foo.bars.any().id for foo in foos]
+        debug(False)
+
+        self.assertEquals(bars, [[100], [200, 400], [300]])
+        self.assertEquals(counts, [1, 2, 1])
+        self.assertEquals(any_ids, [100, 200, 300])
+        self.assertEquals(stream.getvalue().count("SELECT"), 2)
+
+    def test_prefetch_reference_set_empty(self):
+        self.store.find(Bar, Bar.foo_id == 20).remove()
+        foos = self.store.find(FooRefSet).prefetch(FooRefSet.bars)
+        foos = dict((foo.id, foo) for foo in foos)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals(list(foos[20].bars), [])
+        self.assertEquals(foos[20].bars.count(), 0)
+        self.assertEquals(foos[20].bars.any(), None)
+        debug(False)
+
+        self.assertEquals(stream.getvalue(), "")
+
+    def test_prefetch_reference_set_forgotten_on_add(self):
+        [foo] = self.store.find(FooRefSet, id=20).prefetch(FooRefSet.bars)
+        bar = Bar()
+        bar.id = 400
+        bar.title = u"Title 400"
+        foo.bars.add(bar)
+        self.assertEquals(sorted(bar.id for bar in foo.bars), [200, 400])
+
+    def test_prefetch_reference_set_forgotten_on_flush(self):
+        [foo] = self.store.find(FooRefSet, id=20).prefetch(FooRefSet.bars)
+        self.add_reference_set_bar_400()
+        self.assertEquals(foo.bars.count(), 2)
+        self.assertEquals(sorted(bar.id for bar in foo.bars), [200, 400])
+
+    def test_prefetch_reference_set_kept_on_select(self):
+        [foo] = self.store.find(FooRefSet, id=20).prefetch(FooRefSet.bars)
+        self.store.execute("SELECT 1").get_one()
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals([bar.id for bar in foo.bars], [200])
+        debug(False)
+
+        self.assertEquals(stream.getvalue(), "")
+
+    def test_prefetch_reference_set_flushes_only_owner(self):
+        [foo] = self.store.find(FooRefSet, id=20).prefetch(FooRefSet.bars)
+        other_foo = self.store.get(Foo, 10)
+        other_foo.title = u"New title"
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals([bar.id for bar in foo.bars], [200])
+        debug(False)
+
+        self.assertEquals(stream.getvalue(), "")
+        self.assertTrue(get_obj_info(other_foo) in self.store._dirty)
+
+    def test_prefetch_reference_set_forgotten_on_dirty_member(self):
+        [foo] = self.store.find(FooRefSet, id=20).prefetch(FooRefSet.bars)
+        bar = self.store.get(Bar, 100)
+        bar.foo_id = 20
+        self.assertEquals(sorted(bar.id for bar in foo.bars), [100, 200])
+
+    def test_prefetch_reference_set_forgotten_on_invalidate(self):
+        [foo] = self.store.find(FooRefSet, id=20).prefetch(FooRefSet.bars)
+        self.store.execute("UPDATE bar SET foo_id=20 WHERE id=100")
+        self.store.invalidate()
+        self.assertEquals(sorted(bar.id for bar in foo.bars), [100, 200])
+
+    def test_prefetch_indirect_reference_set(self):
+        foos = self.store.find(FooIndRefSetOrderID)
+        foos.order_by(FooIndRefSetOrderID.id)
+        foos.prefetch(FooIndRefSetOrderID.bars)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        foos = list(foos)
+        bars = [[bar.id for bar in foo.bars] for foo in foos]
+        counts = [foo.bars.count() for foo in foos]
+        debug(False)
+
+        self.assertEquals(bars, [[100, 200, 300], [100, 200], [300]])
+        self.assertEquals(counts, [3, 2, 1])
+        self.assertEquals(stream.getvalue().count("SELECT"), 2)
+
+    def test_prefetch_indirect_reference_set_forgotten_on_remove(self):
+        [foo] = self.store.find(FooIndRefSet, id=20).prefetch(
+            FooIndRefSet.bars)
+        foo.bars.remove(self.store.get(Bar, 100))
+        self.assertEquals([bar.id for bar in foo.bars], [200])
+
+    def test_prefetch_indirect_reference_set_default_order(self):
+        class MyBar(Bar):
+            __storm_order__ = "title"
+
+        class MyFoo(Foo):
+            bars = ReferenceSet(Foo.id, Link.foo_id, Link.bar_id, MyBar.id)
+
+        foo = self.store.get(MyFoo, 10)
+        bar_ids = [bar.id for bar in foo.bars]
+        self.assertEquals(bar_ids, [300, 200, 100])
+        [foo] = self.store.find(MyFoo, id=10).prefetch(MyFoo.bars)
+        self.assertEquals([bar.id for bar in foo.bars], bar_ids)
+
+    def test_prefetch_reference_set_path(self):
+        foos = self.store.find(FooRefSet).prefetch((FooRefSet.bars, Bar.foo))
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        titles = sorted(bar.foo.title for foo in foos for bar in foo.bars)
+        debug(False)
+
+        self.assertEquals(titles, ["Title 10", "Title 20", "Title 30"])
+        self.assertEquals(stream.getvalue().count("SELECT"), 3)
+
     def add_reference_set_bar_400(self):
         bar = Bar()
         bar.id = 400
@@ -4552,6 +5703,475 @@ class StoreTest(object):
         self.assertTrue(foo1.id < foo3.id)
         self.assertTrue(foo3.id < foo5.id)
 
+    def test_flush_order_reversed_chain(self):
+        foos = []
+        for i in range(20):
+            foo = Foo()
+            foo.title = u"Object %d" % i
+            self.store.add(foo)
+            foos.append(foo)
+        for before, after in zip(foos[1:], foos):
+            self.store.add_flush_order(before, after)
+        self.store.flush()
+        ids = [foo.id for foo in foos]
+        self.assertEquals(ids, sorted(ids, reverse=True))
+
+    def test_flush_order_prefers_dirty_order(self):
+        foo1 = Foo()
+        foo2 = Foo()
+        foo3 = Foo()
+        for foo in [foo1, foo2, foo3]:
+            self.store.add(foo)
+        self.store.add_flush_order(foo2, foo1)
+        self.store.flush()
+        # foo1 becomes ready after foo2, but before foo3 since it got
+        # dirty earlier.
+        self.assertTrue(foo2.id < foo1.id < foo3.id)
+
+    def test_flush_objects(self):
+        foo1 = self.store.get(Foo, 10)
+        foo2 = self.store.get(Foo, 20)
+        foo1.title = u"New title 10"
+        foo2.title = u"New title 20"
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.flush(foo1)
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("UPDATE foo"), 1)
+        self.assertEquals(self.store.execute("SELECT title FROM foo "
+                                             "WHERE id=10").get_one(),
+                          ("New title 10",))
+        self.assertEquals(self.store.execute("SELECT title FROM foo "
+                                             "WHERE id=20").get_one(),
+                          ("New title 20",))
+
+    def test_flush_objects_leaves_others_dirty(self):
+        foo1 = self.store.get(Foo, 10)
+        foo2 = self.store.get(Foo, 20)
+        foo1.title = u"New title 10"
+        foo2.title = u"New title 20"
+        self.store.flush(foo1)
+        self.store.rollback()
+        self.assertEquals(foo2.title, "Title 20")
+        self.assertEquals(self.store.get(Foo, 20).title, "Title 20")
+
+    def test_flush_objects_respects_flush_order(self):
+        foo1 = Foo()
+        foo2 = Foo()
+        foo3 = Foo()
+        for i, foo in enumerate([foo1, foo2, foo3]):
+            foo.title = u"Object %d" % (i+1)
+            self.store.add(foo)
+        self.store.add_flush_order(foo2, foo1)
+        self.store.add_flush_order(foo3, foo2)
+
+        self.store.flush(foo1)
+
+        self.assertTrue(foo3.id < foo2.id)
+        self.assertTrue(foo2.id < foo1.id)
+
+    def test_flush_objects_with_ordering_loop(self):
+        foo1 = Foo()
+        foo2 = Foo()
+        self.store.add(foo1)
+        self.store.add(foo2)
+        self.store.add_flush_order(foo1, foo2)
+        self.store.add_flush_order(foo2, foo1)
+        self.assertRaises(OrderLoopError, self.store.flush, foo1)
+
+    def test_flush_objects_ignores_unrelated_ordering_loop(self):
+        foo1 = Foo()
+        foo2 = Foo()
+        foo3 = Foo()
+        self.store.add(foo1)
+        self.store.add(foo2)
+        self.store.add(foo3)
+        self.store.add_flush_order(foo1, foo2)
+        self.store.add_flush_order(foo2, foo1)
+        self.store.flush(foo3)
+        self.assertNotEquals(foo3.id, None)
+        self.assertRaises(OrderLoopError, self.store.flush)
+
+    def test_flush_objects_flushes_referenced_object_first(self):
+        foo = Foo()
+        foo.title = u"Foo"
+        bar = Bar()
+        bar.id = 400
+        bar.foo = foo
+        other_foo = self.store.get(Foo, 10)
+        other_foo.title = u"New title 10"
+        self.store.add(bar)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.flush(bar)
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("INSERT INTO foo"), 1)
+        self.assertEquals(stream.getvalue().count("INSERT INTO bar"), 1)
+        self.assertEquals(stream.getvalue().count("UPDATE foo"), 0)
+        self.assertEquals(bar.foo_id, foo.id)
+
+    def test_resolve_lazy_value_flushes_only_the_object(self):
+        foo1 = self.store.get(Foo, 10)
+        foo2 = self.store.get(Foo, 20)
+        foo1.title = AutoReload
+        foo2.title = u"New title 20"
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals(foo1.title, "Title 30")
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("UPDATE foo"), 0)
+        self.assertEquals(stream.getvalue().count("SELECT"), 1)
+
+    def test_set_flush_batch_size_must_be_positive(self):
+        self.assertRaises(ValueError, self.store.set_flush_batch_size, 0)
+
+    def test_flush_batch_inserts(self):
+        self.store.set_flush_batch_size(10)
+        foos = []
+        for i in range(3):
+            foo = Foo()
+            foo.title = u"Batch %d" % i
+            foos.append(self.store.add(foo))
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.flush()
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("INSERT INTO"), 1)
+        self.assertEquals(len(set(foo.id for foo in foos)), 3)
+        for foo in foos:
+            self.assertTrue(self.store.get(Foo, foo.id) is foo)
+        self.assertEquals(self.get_items()[3:],
+                          [(foo.id, foo.title) for foo in foos])
+
+    def test_flush_batch_inserts_respects_batch_size(self):
+        self.store.set_flush_batch_size(2)
+        for i in range(5):
+            foo = Foo()
+            foo.title = u"Batch %d" % i
+            self.store.add(foo)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.flush()
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("INSERT INTO"), 3)
+        self.assertEquals(self.store.find(Foo, Foo.id > 30).count(), 5)
+
+    def test_flush_batch_inserts_respects_max_parameters(self):
+        self.store.set_flush_batch_size(10)
+        self.store._get_many_max_parameters = 5
+        for i in range(5):
+            foo = Foo()
+            foo.id = 40 + i
+            foo.title = u"Batch %d" % i
+            self.store.add(foo)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.flush()
+        debug(False)
+
+        # Two rows of two parameters per statement.
+        self.assertEquals(stream.getvalue().count("INSERT INTO"), 3)
+        self.assertEquals(self.store.find(Foo, Foo.id >= 40).count(), 5)
+
+    def test_flush_batch_inserts_groups_columns(self):
+        self.store.set_flush_batch_size(10)
+        foo1 = Foo()
+        foo1.id = 40
+        foo1.title = u"Forty"
+        foo2 = Foo()
+        foo2.title = u"No id"
+        foo3 = Foo()
+        self.store.add(foo1)
+        self.store.add(foo2)
+        self.store.add(foo3)
+        self.store.flush()
+
+        self.assertEquals(foo1.id, 40)
+        self.assertEquals(foo2.title, u"No id")
+        self.assertEquals(foo3.title, u"Default Title")
+        self.assertEquals(len(set([foo1.id, foo2.id, foo3.id])), 3)
+
+    def test_flush_batch_inserts_respects_flush_order(self):
+        self.store.set_flush_batch_size(10)
+        foo1 = Foo()
+        foo2 = Foo()
+        foo3 = Foo()
+        for i, foo in enumerate([foo1, foo2, foo3]):
+            foo.title = u"Object %d" % (i+1)
+            self.store.add(foo)
+
+        self.store.add_flush_order(foo3, foo2)
+        self.store.add_flush_order(foo2, foo1)
+        self.store.flush()
+
+        self.assertTrue(foo3.id < foo2.id)
+        self.assertTrue(foo2.id < foo1.id)
+
+    def test_flush_batch_inserts_with_references(self):
+        self.store.set_flush_batch_size(10)
+        bars = []
+        for i in range(3):
+            foo = Foo()
+            foo.title = u"Foo %d" % i
+            bar = Bar()
+            bar.id = 400 + i
+            bar.title = u"Bar %d" % i
+            bar.foo = foo
+            self.store.add(bar)
+            bars.append(bar)
+        self.store.flush()
+
+        for bar in bars:
+            self.assertNotEquals(bar.foo_id, None)
+            self.assertEquals(bar.foo.id, bar.foo_id)
+            self.assertEquals(self.store.get(Foo, bar.foo_id).title,
+                              bar.foo.title)
+
+    def test_flush_batch_inserts_run_hooks(self):
+        flushed = []
+
+        class MyFoo(Foo):
+            def __storm_flushed__(self):
+                flushed.append(self)
+
+        self.store.set_flush_batch_size(10)
+        foo1 = self.store.add(MyFoo())
+        foo2 = self.store.add(MyFoo())
+        self.store.flush()
+
+        self.assertEquals(sorted(flushed), sorted([foo1, foo2]))
+
+    def test_flush_batch_removes(self):
+        self.store.set_flush_batch_size(10)
+        foos = list(self.store.find(Foo))
+        for foo in foos:
+            self.store.remove(foo)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.flush()
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("DELETE FROM"), 1)
+        self.assertEquals(self.get_items(), [])
+        for foo in foos:
+            self.assertEquals(Store.of(foo), None)
+            self.assertEquals(self.store.get(Foo, foo.id), None)
+
+    def test_flush_batch_removes_respects_batch_size(self):
+        self.store.set_flush_batch_size(2)
+        for foo in self.store.find(Foo):
+            self.store.remove(foo)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.flush()
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("DELETE FROM"), 2)
+        self.assertEquals(self.get_items(), [])
+
+    def test_flush_batch_removes_with_composite_key(self):
+        self.store.set_flush_batch_size(10)
+        link1 = self.store.get(Link, (10, 100))
+        link2 = self.store.get(Link, (20, 200))
+        self.store.remove(link1)
+        self.store.remove(link2)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.flush()
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("DELETE FROM"), 1)
+        self.assertEquals(self.store.get(Link, (10, 100)), None)
+        self.assertEquals(self.store.get(Link, (20, 200)), None)
+        self.assertNotEquals(self.store.get(Link, (10, 200)), None)
+        self.assertNotEquals(self.store.get(Link, (20, 100)), None)
+
+    def test_flush_batch_removes_respects_max_parameters(self):
+        self.store.set_flush_batch_size(10)
+        self.store._get_many_max_parameters = 5
+        for link in self.store.find(Link):
+            self.store.remove(link)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.store.flush()
+        debug(False)
+
+        # Two keys of two columns per statement.
+        self.assertEquals(stream.getvalue().count("DELETE FROM"), 3)
+        self.assertEquals(self.store.find(Link).count(), 0)
+
+    def test_flush_batch_removes_run_hooks(self):
+        flushed = []
+
+        class MyFoo(Foo):
+            def __storm_flushed__(self):
+                flushed.append(self)
+
+        self.store.set_flush_batch_size(10)
+        foos = list(self.store.find(MyFoo))
+        for foo in foos:
+            self.store.remove(foo)
+        self.store.flush()
+
+        self.assertEquals(sorted(flushed), sorted(foos))
+
+    def test_flush_batch_updates(self):
+        self.store.set_flush_batch_size(10)
+        foos = list(self.store.find(Foo).order_by(Foo.id))
+        for foo in foos:
+            foo.title = u"New %d" % foo.id
+
+        connection = self.store._connection
+        calls = []
+        execute_many = connection.execute_many
+
+        def counting_execute_many(statement, params_list):
+            calls.append(len(params_list))
+            return execute_many(statement, params_list)
+
+        connection.execute_many = counting_execute_many
+        self.store.flush()
+
+        self.assertEquals(calls, [3])
+        self.assertEquals(self.get_items(), [(10, "New 10"),
+                                             (20, "New 20"),
+                                             (30, "New 30")])
+
+    def test_flush_batch_updates_compiles_once(self):
+        self.store.set_flush_batch_size(10)
+        foos = list(self.store.find(Foo))
+        for foo in foos:
+            foo.title = u"New %d" % foo.id
+
+        connection = self.store._connection
+        compiled = []
+        compile = connection.compile
+
+        def counting_compile(expr, *args, **kwargs):
+            compiled.append(expr)
+            return compile(expr, *args, **kwargs)
+
+        connection.compile = counting_compile
+        self.store.flush()
+
+        self.assertEquals(len(compiled), 1)
+
+    def test_flush_batch_updates_groups_columns(self):
+        self.store.set_flush_batch_size(10)
+        foo1 = self.store.get(Foo, 10)
+        foo2 = self.store.get(Foo, 20)
+        foo3 = self.store.get(Foo, 30)
+        foo1.title = u"New 10"
+        foo2.title = u"New 20"
+        foo3.id = 40
+        self.store.flush()
+
+        self.assertEquals(self.get_items(), [(10, "New 10"),
+                                             (20, "New 20"),
+                                             (40, "Title 10")])
+        self.assertTrue(self.store.get(Foo, 40) is foo3)
+
+    def test_flush_batch_updates_with_primary_key(self):
+        self.store.set_flush_batch_size(10)
+        foo1 = self.store.get(Foo, 10)
+        foo2 = self.store.get(Foo, 20)
+        foo1.id = 11
+        foo2.id = 21
+        self.store.flush()
+
+        self.assertEquals(self.get_items(), [(11, "Title 30"),
+                                             (21, "Title 20"),
+                                             (30, "Title 10")])
+        self.assertTrue(self.store.get(Foo, 11) is foo1)
+        self.assertTrue(self.store.get(Foo, 21) is foo2)
+
+    def test_flush_batch_updates_with_expression(self):
+        self.store.set_flush_batch_size(10)
+        foo1 = self.store.get(Foo, 10)
+        foo2 = self.store.get(Foo, 20)
+        foo1.title = SQL("'New 10'")
+        foo2.title = u"New 20"
+        self.store.flush()
+
+        self.assertEquals(foo1.title, u"New 10")
+        self.assertEquals(self.get_items(), [(10, "New 10"),
+                                             (20, "New 20"),
+                                             (30, "Title 10")])
+
+    def test_flush_batch_updates_with_values_compiled_differently(self):
+        # Like lists on PostgreSQL, these values are bound through a
+        # variable of their own, or compiled as a literal NULL.
+        class CopiedVariable(UnicodeVariable):
+            pass
+
+        compile = self.store._connection.compile.create_child()
+
+        @compile.when(CopiedVariable)
+        def compile_copied_variable(compile, variable, state):
+            value = variable.get()
+            if value is None:
+                return "NULL"
+            state.parameters.append(UnicodeVariable(value))
+            return "?"
+
+        self.store._connection.compile = compile
+
+        class CopiedFoo(object):
+            __storm_table__ = "foo"
+            id = Int(primary=True)
+            title = Property(variable_class=CopiedVariable)
+
+        self.store.set_flush_batch_size(10)
+        foos = list(self.store.find(CopiedFoo).order_by(CopiedFoo.id))
+        foos[0].title = u"New 10"
+        foos[1].title = None
+        foos[2].title = u"New 30"
+        self.store.flush()
+
+        self.assertEquals(self.get_items(), [(10, "New 10"),
+                                             (20, None),
+                                             (30, "New 30")])
+
+    def test_flush_batch_updates_run_hooks(self):
+        flushed = []
+
+        class MyFoo(Foo):
+            def __storm_flushed__(self):
+                flushed.append(self)
+
+        self.store.set_flush_batch_size(10)
+        foos = list(self.store.find(MyFoo))
+        for foo in foos:
+            foo.title = u"New"
+        self.store.flush()
+
+        self.assertEquals(sorted(flushed), sorted(foos))
+
     def test_variable_filter_on_load(self):
         foo = self.store.get(FooVariable, 20)
         self.assertEquals(foo.title, "to_py(from_db(Title 20))")
@@ -5223,6 +6843,127 @@ class StoreTest(object):
         bar.foo_id = Bar.id+1
         self.assertEquals(bar.foo_id, 201)
 
+    def test_lazy_columns_not_selected(self):
+        class LazyFooValue(object):
+            __storm_table__ = "foovalue"
+            id = Int(primary=True)
+            foo_id = Int()
+            value1 = Int(lazy=True)
+            value2 = Int(lazy=True)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        foo_values = list(self.store.find(LazyFooValue, foo_id=10))
+        foo_value = self.store.get(LazyFooValue, 5)
+        debug(False)
+
+        self.assertEquals(len(foo_values), 4)
+        self.assertEquals(stream.getvalue().count("SELECT"), 2)
+        self.assertTrue("value1" not in stream.getvalue())
+        self.assertTrue("value2" not in stream.getvalue())
+        self.assertEquals(foo_value.foo_id, 20)
+
+    def test_lazy_column_loaded_on_access(self):
+        class LazyFooValue(object):
+            __storm_table__ = "foovalue"
+            id = Int(primary=True)
+            foo_id = Int()
+            value1 = Int(lazy=True)
+            value2 = Int(lazy=True)
+
+        foo_value = self.store.get(LazyFooValue, 7)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals(foo_value.value1, 1)
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("SELECT"), 1)
+        self.assertTrue("value1" in stream.getvalue())
+        self.assertTrue("value2" not in stream.getvalue())
+        self.assertEquals(foo_value.value2, 4)
+
+    def test_lazy_group_loaded_together(self):
+        group = LazyGroup()
+
+        class LazyFooValue(object):
+            __storm_table__ = "foovalue"
+            id = Int(primary=True)
+            foo_id = Int()
+            value1 = Int(lazy_group=group)
+            value2 = Int(lazy_group=group)
+
+        foo_value = self.store.get(LazyFooValue, 7)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals(foo_value.value1, 1)
+        self.assertEquals(foo_value.value2, 4)
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("SELECT"), 1)
+
+    def test_lazy_columns_not_loaded_with_eager_ones(self):
+        class LazyFooValue(object):
+            __storm_table__ = "foovalue"
+            id = Int(primary=True)
+            foo_id = Int()
+            value1 = Int(lazy_group=1)
+            value2 = Int(lazy_group=1)
+
+        foo_value = self.store.get(LazyFooValue, 7)
+        self.assertEquals(foo_value.value1, 1)
+        self.store.invalidate(foo_value)
+
+        stream = StringIO()
+        self.addCleanup(debug, False)
+        debug(True, stream)
+        self.assertEquals(foo_value.foo_id, 20)
+        debug(False)
+
+        self.assertEquals(stream.getvalue().count("SELECT"), 1)
+        self.assertTrue("value1" not in stream.getvalue())
+        self.assertEquals(foo_value.value2, 4)
+
+    def test_lazy_column_set_without_loading(self):
+        class LazyFooValue(object):
+            __storm_table__ = "foovalue"
+            id = Int(primary=True)
+            foo_id = Int()
+            value1 = Int(lazy=True)
+            value2 = Int(lazy=True)
+
+        foo_value = self.store.get(LazyFooValue, 7)
+        foo_value.value1 = 42
+        self.store.flush()
+
+        result = self.store.execute("SELECT value1, value2 FROM foovalue "
+                                    "WHERE id=7")
+        self.assertEquals(result.get_one(), (42, 4))
+        self.assertEquals(foo_value.value1, 42)
+
+    def test_lazy_column_in_added_object(self):
+        class LazyFooValue(object):
+            __storm_table__ = "foovalue"
+            id = Int(primary=True)
+            foo_id = Int()
+            value1 = Int(lazy=True)
+            value2 = Int(lazy=True)
+
+        foo_value = LazyFooValue()
+        foo_value.id = 10
+        foo_value.foo_id = 30
+        foo_value.value1 = 5
+        foo_value.value2 = 6
+        self.store.add(foo_value)
+        self.store.flush()
+        self.store.invalidate(foo_value)
+
+        self.assertEquals((foo_value.value1, foo_value.value2), (5, 6))
+
     def test_autoreload_attribute(self):
         foo = self.store.get(Foo, 20)
         self.store.execute("UPDATE foo SET title='New Title' WHERE id=20")
@@ -5426,6 +7167,123 @@ class StoreTest(object):
         self.store.invalidate()
         self.assertEquals(called, [True, True])
 
+    def test_invalidate_all_is_lazy(self):
+        foo1 = self.store.get(Foo, 10)
+        self.store.invalidate()
+        obj_info = get_obj_info(foo1)
+        self.assertEquals(obj_info.get("invalidated"), None)
+        self.assertEquals(obj_info.variables[Foo.title].get_lazy(), None)
+        self.store.execute("UPDATE foo SET title='New title' WHERE id=10")
+        self.assertEquals(foo1.title, "New title")
+
+    def test_invalidate_all_then_set(self):
+        foo1 = self.store.get(Foo, 10)
+        self.store.invalidate()
+        foo1.title = u"New title"
+        self.store.flush()
+        self.assertEquals(foo1.title, "New title")
+        self.assertEquals(self.store.execute("SELECT title FROM foo "
+                                             "WHERE id=10").get_one(),
+                          ("New title",))
+
+    def test_invalidate_all_then_get_validates(self):
+        foo1 = self.store.get(Foo, 10)
+        self.store.invalidate()
+        self.store.execute("DELETE FROM foo WHERE id=10")
+        self.assertEquals(self.store.get(Foo, 10), None)
+
+    def test_invalidate_all_then_load(self):
+        foo1 = self.store.get(Foo, 10)
+        self.store.invalidate()
+        self.store.execute("UPDATE foo SET title='New title' WHERE id=10")
+        self.assertIdentical(self.store.find(Foo, id=10).one(), foo1)
+        self.assertEquals(foo1.title, "New title")
+        self.assertEquals(get_obj_info(foo1).get("invalidated"), None)
+
+    def test_invalidate_all_then_cached(self):
+        foo1 = self.store.get(Foo, 10)
+        self.store.invalidate()
+        self.store.execute("UPDATE foo SET title='New title' WHERE id=10")
+        self.assertEquals(self.store.find(Foo, title=u"New title").cached(),
+                          [foo1])
+
+    def test_invalidate_all_then_reference(self):
+        bar = self.store.get(Bar, 100)
+        self.assertEquals(bar.foo.id, 10)
+        self.store.commit()
+        self.store.execute("UPDATE bar SET foo_id=20 WHERE id=100")
+        self.assertEquals(bar.foo.id, 20)
+
+    def test_invalidate_all_then_reference_set(self):
+        class BarFoos(Bar):
+            foos = ReferenceSet(Bar.foo_id, Foo.id)
+
+        bar = self.store.get(BarFoos, 100)
+        self.assertEquals([foo.id for foo in bar.foos], [10])
+        self.store.commit()
+        self.store.execute("UPDATE bar SET foo_id=20 WHERE id=100")
+        self.assertEquals([foo.id for foo in bar.foos], [20])
+
+    def test_invalidate_all_then_reference_to_removed_object(self):
+        bar = self.store.get(Bar, 100)
+        self.assertEquals(bar.foo.id, 10)
+        self.store.commit()
+        self.store.execute("DELETE FROM foo WHERE id=10")
+        self.store.execute("UPDATE bar SET foo_id=NULL WHERE id=100")
+        self.assertEquals(bar.foo, None)
+
+    def test_invalidate_all_keeps_dirty_object_behaviour(self):
+        foo1 = self.store.get(Foo, 10)
+        self.store.block_implicit_flushes()
+        foo1.title = u"New title"
+        self.store.invalidate()
+        self.assertEquals(get_obj_info(foo1).get("invalidated"), True)
+
+    def test_invalidate_all_many_objects(self):
+        foos = list(self.store.find(Foo))
+        self.store.invalidate()
+        for foo in foos:
+            self.assertEquals(get_obj_info(foo).get("invalidated"), None)
+        self.assertEquals(sorted(foo.title for foo in foos),
+                          ["Title 10", "Title 20", "Title 30"])
+        for foo in foos:
+            self.assertEquals(get_obj_info(foo).get("invalidated"), None)
+
+    def test_invalidate_class(self):
+        foo1 = self.store.get(Foo, 10)
+        foo2 = self.store.get(Foo, 20)
+        bar = self.store.get(Bar, 100)
+        self.store.invalidate_class(Foo)
+        self.assertEquals(get_obj_info(foo1).get("invalidated"), True)
+        self.assertEquals(get_obj_info(foo2).get("invalidated"), True)
+        self.assertEquals(get_obj_info(bar).get("invalidated"), None)
+        cached = self.get_cache(self.store).get_cached()
+        self.assertFalse(get_obj_info(foo1) in cached)
+        self.assertTrue(get_obj_info(bar) in cached)
+
+    def test_invalidate_class_reloads_values(self):
+        foo1 = self.store.get(Foo, 10)
+        self.store.execute("UPDATE foo SET title='New title' WHERE id=10")
+        self.store.invalidate_class(Foo)
+        self.assertEquals(foo1.title, "New title")
+
+    def test_invalidate_class_calls_hook(self):
+        called = []
+        class MyFoo(Foo):
+            def __storm_invalidated__(self):
+                called.append(self.id)
+        foo1 = self.store.get(MyFoo, 10)
+        foo2 = self.store.get(Foo, 20)
+        self.store.invalidate_class(MyFoo)
+        self.assertEquals(called, [10])
+
+    def test_invalidate_class_after_invalidate_all(self):
+        foo1 = self.store.get(Foo, 10)
+        self.store.invalidate()
+        self.store.invalidate_class(Foo)
+        self.assertEquals(self.store.get_stats()["invalidations"], 1)
+        self.assertEquals(get_obj_info(foo1).get("invalidated"), True)
+
     def test_reset_recreates_objects(self):
         """
         After resetting the store, all queries return fresh objects, even if
@@ -5468,6 +7326,55 @@ class StoreTest(object):
         self.store.reset()
         self.assertIdentical(Store.of(foo1), None)
 
+    def test_evict(self):
+        cache = self.get_cache(self.store)
+        foo1 = self.store.get(Foo, 10)
+        obj_info = get_obj_info(foo1)
+        self.store.evict(foo1)
+        self.assertIdentical(Store.of(foo1), None)
+        self.assertFalse(obj_info in cache.get_cached())
+        new_foo1 = self.store.get(Foo, 10)
+        self.assertNotIdentical(new_foo1, foo1)
+        self.assertEquals(new_foo1.title, "Title 30")
+
+    def test_evict_doesnt_change_database(self):
+        foo1 = self.store.get(Foo, 10)
+        self.store.evict(foo1)
+        foo1.title = u"New title"
+        self.store.flush()
+        self.assertEquals(self.store.get(Foo, 10).title, "Title 30")
+
+    def test_evict_by_unique_attribute(self):
+        foo = self.store.get(UniqueTitleFoo, u"Title 20",
+                             attribute=UniqueTitleFoo.title)
+        self.store.evict(foo)
+        new_foo = self.store.get(UniqueTitleFoo, u"Title 20",
+                                 attribute=UniqueTitleFoo.title)
+        self.assertNotIdentical(new_foo, foo)
+
+    def test_evict_dirty_object(self):
+        foo1 = self.store.get(Foo, 10)
+        foo1.title = u"New title"
+        self.assertRaises(StoreError, self.store.evict, foo1)
+        self.assertIdentical(Store.of(foo1), self.store)
+
+    def test_evict_wrong_store(self):
+        foo = Foo()
+        self.assertRaises(WrongStoreError, self.store.evict, foo)
+
+    def test_evict_class(self):
+        foo1 = self.store.get(Foo, 10)
+        foo2 = self.store.get(Foo, 20)
+        bar = self.store.get(Bar, 100)
+        foo2.title = u"New title"
+        self.store.evict_class(Foo)
+        self.assertIdentical(Store.of(foo1), None)
+        self.assertIdentical(Store.of(foo2), self.store)
+        self.assertIdentical(Store.of(bar), self.store)
+        self.assertNotIdentical(self.store.get(Foo, 10), foo1)
+        self.assertIdentical(self.store.get(Foo, 20), foo2)
+        self.assertIdentical(self.store.get(Bar, 100), bar)
+
     def test_result_find(self):
         result1 = self.store.find(Foo, Foo.id <= 20)
         result2 = result1.find(Foo.id > 10)
@@ -6117,6 +8024,11 @@ class EmptyResultSetTest(object):
         self.empty.config(distinct=True, offset=1, limit=1)
         self.assertEquals(list(self.result), list(self.empty))
 
+    def test_prefetch(self):
+        self.assertTrue(self.result.prefetch(FooRef.bar) is self.result)
+        self.assertTrue(self.empty.prefetch(FooRef.bar) is self.empty)
+        self.assertEquals(list(self.result), list(self.empty))
+
     def test_slice(self):
         self.assertEquals(list(self.result[:]), [])
         self.assertEquals(list(self.empty[:]), [])
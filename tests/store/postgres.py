@@ -178,6 +178,19 @@ class PostgresStoreTest(TestHelper, StoreTest):
         # get() would just pick the object from the cache.
         self.assertEquals(self.store.find(FooWithSchema, id=foo.id).one(), foo)
 
+    def test_flush_batch_inserts_match_keys_to_objects(self):
+        self.store.set_flush_batch_size(10)
+        foos = []
+        for i in range(5):
+            foo = Foo()
+            foo.title = u"Batch %d" % i
+            foos.append(self.store.add(foo))
+        self.store.flush()
+        for foo in foos:
+            result = self.store.execute("SELECT title FROM foo WHERE id=?",
+                                        (foo.id,))
+            self.assertEquals(result.get_one(), (foo.title,))
+
     def test_wb_currval_based_identity(self):
         """
         Ensure that the currval()-based identity retrieval continues
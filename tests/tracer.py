@@ -550,13 +550,13 @@ class TimelineTracerTest(TestHelper):
         """Check that multiple TimelineTracer's could be used at once."""
         tracer1 = TimelineTracer(self.factory)
         tracer2 = TimelineTracer(self.factory)
-        tracer1.threadinfo.action = 'foo'
-        self.assertEqual(None, getattr(tracer2.threadinfo, 'action', None))
+        tracer1.threadinfo.actions = ['foo']
+        self.assertEqual(None, getattr(tracer2.threadinfo, 'actions', None))
 
     def test_error_finishes_action(self):
         tracer = TimelineTracer(self.factory)
         action = timeline.Timeline().start('foo', 'bar')
-        tracer.threadinfo.action = action
+        tracer.threadinfo.actions = [action]
         tracer.connection_raw_execute_error(
             'conn', 'cursor', 'statement', 'params', 'error')
         self.assertNotEqual(None, action.duration)
@@ -564,11 +564,21 @@ class TimelineTracerTest(TestHelper):
     def test_success_finishes_action(self):
         tracer = TimelineTracer(self.factory)
         action = timeline.Timeline().start('foo', 'bar')
-        tracer.threadinfo.action = action
+        tracer.threadinfo.actions = [action]
         tracer.connection_raw_execute_success(
             'conn', 'cursor', 'statement', 'params')
         self.assertNotEqual(None, action.duration)
 
+    def test_success_finishes_all_actions(self):
+        tracer = TimelineTracer(self.factory)
+        tracer._expanded_raw_execute('conn', 'cursor', 'statement 1')
+        tracer._expanded_raw_execute('conn', 'cursor', 'statement 2')
+        tracer.connection_raw_execute_success(
+            'conn', 'cursor', 'statement', 'params')
+        self.assertEqual(2, len(self.timeline.actions))
+        for action in self.timeline.actions:
+            self.assertNotEqual(None, action.duration)
+
     def test_finds_timeline_from_factory(self):
         factory_result = timeline.Timeline()
         tracer = TimelineTracer(lambda: factory_result)